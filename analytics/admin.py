@@ -1,10 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from .models import AnalyticsData, Promotion, Report
+from utils.admin import LargeTableAdminMixin
+
+from .models import AnalyticsData, AnalyticsRollup, ExchangeRate, Promotion, Report
+from .reports import generate_report
 
 
 @admin.register(Promotion)
-class PromotionAdmin(admin.ModelAdmin):
+class PromotionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "title",
         "promotion_type",
@@ -73,7 +76,7 @@ class PromotionAdmin(admin.ModelAdmin):
 
 
 @admin.register(AnalyticsData)
-class AnalyticsDataAdmin(admin.ModelAdmin):
+class AnalyticsDataAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "metric_type",
         "value",
@@ -86,7 +89,7 @@ class AnalyticsDataAdmin(admin.ModelAdmin):
     search_fields = ["destination__name", "service__name", "provider__company_name"]
     readonly_fields = ["created_at"]
     raw_id_fields = ["destination", "service", "provider"]
-    date_hierarchy = "date_recorded"
+    list_select_related = ["service__provider"]
 
     fieldsets = (
         ("Metric Information", {"fields": ("metric_type", "value", "date_recorded")}),
@@ -96,8 +99,42 @@ class AnalyticsDataAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(AnalyticsRollup)
+class AnalyticsRollupAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = [
+        "metric_type",
+        "period",
+        "period_start",
+        "value_sum",
+        "value_count",
+        "destination",
+        "service",
+        "provider",
+    ]
+    list_filter = ["period", "metric_type", "period_start"]
+    search_fields = ["destination__name", "service__name", "provider__company_name"]
+    readonly_fields = [
+        "period",
+        "period_start",
+        "destination",
+        "service",
+        "provider",
+        "metric_type",
+        "value_sum",
+        "value_count",
+        "value_min",
+        "value_max",
+        "value_average",
+        "updated_at",
+    ]
+    list_select_related = ["service__provider"]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Report)
-class ReportAdmin(admin.ModelAdmin):
+class ReportAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "title",
         "report_type",
@@ -122,7 +159,42 @@ class ReportAdmin(admin.ModelAdmin):
         ),
     )
 
+    actions = ["regenerate_reports"]
+
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.generated_by = request.user
+        scope_fields = {
+            "report_type",
+            "destination",
+            "provider",
+            "start_date",
+            "end_date",
+        }
+        if not change or not obj.data or scope_fields & set(form.changed_data):
+            generate_report(obj)
         super().save_model(request, obj, form, change)
+
+    @admin.action(description="Regenerate report data")
+    def regenerate_reports(self, request, queryset):
+        incomplete = set()
+        for report in queryset:
+            generate_report(report)
+            report.save(update_fields=["data"])
+            incomplete.update(report.data.get("incomplete_currencies", ()))
+        self.message_user(request, f"{queryset.count()} reports regenerated.")
+        if incomplete:
+            self.message_user(
+                request,
+                "No exchange rate yet for "
+                f"{', '.join(sorted(incomplete))}: those amounts are left out of "
+                "the totals and listed separately.",
+                messages.WARNING,
+            )
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["currency", "date", "rate", "source", "updated_at"]
+    list_filter = ["currency", "source"]
+    readonly_fields = ["updated_at"]
@@ -0,0 +1,243 @@
+"""
+Write-buffered Promotion performance counters.
+
+Ad renders and clicks increment a CounterBuffer instead of the promotion row,
+and flush_counters() folds the accumulated increments into the database with
+one batched UPDATE per chunk of promotions. This keeps the hot promotion rows
+out of lock contention and turns thousands of WAL writes into one.
+
+Delivery is at-least-once: a batch is only discarded after the UPDATE commits,
+so a crash between commit and acknowledgement replays it rather than losing it.
+The batch being flushed still counts as pending until its transaction starts
+committing; from then on it is read from the promotion rows, so live counts
+never include it twice.
+
+flush_promotion_counters --interval runs the flush loop; in production the
+promotion-counters worker (k8s/base/workers) keeps it running.
+"""
+
+import atexit
+import threading
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils.module_loading import import_string
+
+COUNTER_FIELDS = ("impressions", "clicks", "conversions")
+
+
+class LocalCounterBuffer:
+    """
+    In-process buffer for development and tests. Flushes itself every
+    PROMOTION_COUNTER_FLUSH_INTERVAL seconds and once more at interpreter exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(Counter)
+        self._in_flight = None
+        self._committing = False
+        self._timer = None
+        atexit.register(flush_counters)
+
+    def _schedule_flush(self):
+        interval = settings.PROMOTION_COUNTER_FLUSH_INTERVAL
+        if self._timer is None and interval:
+            self._timer = threading.Timer(interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        from django.db import connection
+
+        with self._lock:
+            self._timer = None
+        try:
+            flush_counters(self)
+        finally:
+            connection.close()
+
+    def increment(self, promotion_id, field, amount=1):
+        with self._lock:
+            self._pending[promotion_id][field] += amount
+            self._schedule_flush()
+
+    def pending(self, promotion_id):
+        with self._lock:
+            counts = Counter(self._pending.get(promotion_id, {}))
+            if self._in_flight and not self._committing:
+                counts.update(self._in_flight.get(promotion_id, {}))
+            return counts
+
+    def drain(self):
+        with self._lock:
+            if self._in_flight is None:
+                self._in_flight, self._pending = self._pending, defaultdict(Counter)
+            self._committing = False
+            return {pk: dict(counts) for pk, counts in self._in_flight.items()}
+
+    def committing(self):
+        """The batch is about to commit: stop counting it as pending"""
+        with self._lock:
+            self._committing = True
+
+    def ack(self):
+        with self._lock:
+            self._in_flight = None
+            self._committing = False
+
+    def retry_later(self):
+        """Flush failed: keep the batch in flight for the next attempt"""
+        with self._lock:
+            self._committing = False
+            self._schedule_flush()
+
+
+class RedisCounterBuffer:
+    """
+    Redis buffer shared by every worker. Increments are HINCRBYs on a pending
+    hash; drain() renames it to an in-flight hash (atomic hand-off), which is
+    only deleted by ack(), so a crashed flush is picked up by the next one.
+    The committing flag hides the in-flight hash from pending() from just
+    before the flush commits until ack() deletes both.
+    """
+
+    PENDING = "promotion-counters:pending"
+    IN_FLIGHT = "promotion-counters:in-flight"
+    COMMITTING = "promotion-counters:committing"
+    LOCK = "promotion-counters:flush-lock"
+    LOCK_SECONDS = 300
+
+    def __init__(self, url=None):
+        import redis
+
+        self._redis = redis.Redis.from_url(url or settings.PROMOTION_COUNTER_REDIS_URL)
+        self._response_error = redis.ResponseError
+        self._lock_token = None
+
+    def increment(self, promotion_id, field, amount=1):
+        self._redis.hincrby(self.PENDING, f"{promotion_id}:{field}", amount)
+
+    def pending(self, promotion_id):
+        fields = [f"{promotion_id}:{field}" for field in COUNTER_FIELDS]
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hmget(self.PENDING, fields)
+        pipe.hmget(self.IN_FLIGHT, fields)
+        pipe.exists(self.COMMITTING)
+        pending, in_flight, committing = pipe.execute()
+        if committing:
+            in_flight = [None] * len(fields)  # already in the promotion rows
+        return Counter(
+            {
+                field: int(a or 0) + int(b or 0)
+                for field, a, b in zip(COUNTER_FIELDS, pending, in_flight)
+            }
+        )
+
+    def drain(self):
+        token = uuid.uuid4().hex
+        if not self._redis.set(self.LOCK, token, nx=True, ex=self.LOCK_SECONDS):
+            return None  # another worker is flushing
+        self._lock_token = token
+        # A flush that died while committing may not have committed: replay it
+        self._redis.delete(self.COMMITTING)
+        if not self._redis.exists(self.IN_FLIGHT):
+            try:
+                self._redis.rename(self.PENDING, self.IN_FLIGHT)
+            except self._response_error:
+                pass  # nothing pending: RENAME of a missing key fails
+
+        drained = defaultdict(dict)
+        for key, value in self._redis.hgetall(self.IN_FLIGHT).items():
+            promotion_id, field = key.decode().split(":")
+            drained[int(promotion_id)][field] = int(value)
+        return dict(drained)
+
+    def _unlock(self):
+        token, self._lock_token = self._lock_token, None
+        if token and self._redis.get(self.LOCK) == token.encode():
+            self._redis.delete(self.LOCK)
+
+    def committing(self):
+        self._redis.set(self.COMMITTING, 1, ex=self.LOCK_SECONDS)
+
+    def ack(self):
+        self._redis.delete(self.IN_FLIGHT, self.COMMITTING)
+        self._unlock()
+
+    def retry_later(self):
+        self._redis.delete(self.COMMITTING)
+        self._unlock()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = import_string(settings.PROMOTION_COUNTER_BUFFER)()
+    return _buffer
+
+
+def record_impression(promotion_id, count=1):
+    get_buffer().increment(promotion_id, "impressions", count)
+
+
+def record_click(promotion_id, count=1):
+    get_buffer().increment(promotion_id, "clicks", count)
+
+
+def record_conversion(promotion_id, count=1):
+    get_buffer().increment(promotion_id, "conversions", count)
+
+
+def pending_counts(promotion_id):
+    """Increments recorded but not yet flushed, keyed by counter field"""
+    return get_buffer().pending(promotion_id)
+
+
+def flush_counters(buffer=None, batch_size=500):
+    """
+    Apply buffered increments with one UPDATE per chunk of promotions.
+    Returns the number of promotions updated.
+    """
+    from .models import Promotion
+
+    buffer = buffer or get_buffer()
+    drained = buffer.drain()
+    if drained is None:
+        return 0  # another worker holds the flush
+    if not drained:
+        buffer.ack()
+        return 0
+
+    promotion_ids = sorted(drained)
+    try:
+        with transaction.atomic():
+            for start in range(0, len(promotion_ids), batch_size):
+                chunk = promotion_ids[start : start + batch_size]
+                updates = {}
+                for field in COUNTER_FIELDS:
+                    whens = [
+                        When(pk=pk, then=Value(drained[pk][field]))
+                        for pk in chunk
+                        if drained[pk].get(field)
+                    ]
+                    if whens:
+                        updates[field] = F(field) + Case(
+                            *whens, default=Value(0), output_field=IntegerField()
+                        )
+                Promotion.objects.filter(pk__in=chunk).update(**updates)
+            buffer.committing()
+    except Exception:
+        buffer.retry_later()
+        raise
+    buffer.ack()
+    return len(promotion_ids)
@@ -0,0 +1,206 @@
+"""
+Currency normalisation for revenue reporting.
+
+ExchangeRate rows give, per currency and day, the value of one unit in
+REPORTING_CURRENCY. An amount dated D uses the latest rate on or before D
+(the earliest one for days before the first rate); the reporting currency
+itself is always 1.
+
+Two ways to convert:
+
+- in the database: converted(amount, currency, day) is an expression with a
+  correlated rate lookup, so Sum(converted(...)) totals mixed currencies in
+  one grouped query (see analytics.reports.destination_revenue);
+- in bulk: rate_table() is the whole rate history held in memory per process
+  (ExchangeRate is small: currencies x days), so rows already aggregated per
+  (day, currency) convert without further queries.
+
+Amounts in a currency that has no rate at all are left out of converted
+figures rather than failing or being counted at face value: converted() is
+NULL for them, and convert_rows() hands them back per currency. Callers
+report them separately (see missing_currencies()).
+
+The in-memory table is reloaded after FX_RATES_TTL seconds, or as soon as a
+rate changes: saving one bumps a version key in the shared cache, which every
+process compares before using its copy.
+"""
+
+import time
+import uuid
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import ExchangeRate, ReportDay
+
+VERSION_KEY = "fx:rates:version"
+CENT = Decimal("0.01")
+ONE = Decimal("1")
+
+
+class MissingRate(LookupError):
+    def __init__(self, currency):
+        super().__init__(f"No exchange rate for {currency}")
+        self.currency = currency
+
+
+class RateTable:
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._dates, self._rates = {}, {}
+        for currency, day, rate in rows:  # sorted by currency, date
+            self._dates.setdefault(currency, []).append(day)
+            self._rates.setdefault(currency, []).append(rate)
+
+    def rate(self, currency, day, to=None):
+        """Units of `to` (the reporting currency) per unit of `currency` on `day`"""
+        rate = self._rate(currency, day)
+        if to and to != settings.REPORTING_CURRENCY:
+            rate /= self._rate(to, day)
+        return rate
+
+    def _rate(self, currency, day):
+        if currency == settings.REPORTING_CURRENCY:
+            return ONE
+        dates = self._dates.get(currency)
+        if not dates:
+            raise MissingRate(currency)
+        return self._rates[currency][max(bisect_right(dates, day) - 1, 0)]
+
+    def convert(self, amount, currency, day, to=None):
+        return (Decimal(amount) * self.rate(currency, day, to)).quantize(CENT)
+
+
+_table = None
+
+
+def rate_table():
+    """This process's RateTable, reloaded when stale"""
+    global _table
+    version = cache.get(VERSION_KEY)
+    if (
+        _table is None
+        or _table.version != version
+        or time.monotonic() - _table.loaded_at > settings.FX_RATES_TTL
+    ):
+        rows = ExchangeRate.objects.order_by("currency", "date").values_list(
+            "currency", "date", "rate"
+        )
+        _table = RateTable(rows, version)
+    return _table
+
+
+def forget_rates():
+    """Make every process reload its rate table"""
+    global _table
+    _table = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def set_rates(day, rates, source=""):
+    """
+    Store {currency: rate} for `day` in one upsert (no signals), then reload
+    rate tables and drop the cached report days from `day` on
+    """
+    ExchangeRate.objects.bulk_create(
+        [
+            ExchangeRate(currency=currency, date=day, rate=rate, source=source)
+            for currency, rate in rates.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["currency", "date"],
+        update_fields=["rate", "source", "updated_at"],
+    )
+    forget_rates()
+    ReportDay.objects.filter(date__gte=day).delete()
+
+
+def convert(amount, currency, day, to=None):
+    """`amount` in `currency` on `day`, in `to` (the reporting currency)"""
+    return rate_table().convert(amount, currency, day, to)
+
+
+def convert_rows(
+    rows,
+    amount_keys,
+    currency_key="currency",
+    day_key="day",
+    to=None,
+    unconverted=None,
+):
+    """
+    Convert the `amount_keys` present in aggregated rows (dicts with a
+    currency and a day) in place, one table lookup per row, and return them.
+    Rows in a currency without any rate get None amounts instead; their
+    amounts are added up in `unconverted` ({(day, currency): {key: amount}})
+    when given.
+    """
+    table = rate_table()
+    for row in rows:
+        try:
+            rate = table.rate(row[currency_key], row[day_key], to)
+        except MissingRate:
+            amounts = {}
+            if unconverted is not None:
+                key = row[day_key], row[currency_key]
+                amounts = unconverted.setdefault(key, {})
+            for key in amount_keys:
+                if row.get(key) is not None:
+                    amounts[key] = amounts.get(key, Decimal("0")) + Decimal(row[key])
+                    row[key] = None
+            continue
+        for key in amount_keys:
+            if row.get(key) is not None:
+                row[key] = (Decimal(row[key]) * rate).quantize(CENT)
+    return rows
+
+
+def rate_expression(currency, day):
+    """The rate of the row's `currency` on its `day` (field names/expressions)"""
+    rates = ExchangeRate.objects.filter(currency=OuterRef(currency)).values("rate")
+    latest = rates.filter(date__lte=OuterRef(day)).order_by("-date")[:1]
+    earliest = rates.order_by("date")[:1]
+    return Coalesce(
+        Subquery(latest),
+        Subquery(earliest),
+        output_field=DecimalField(max_digits=20, decimal_places=10),
+    )
+
+
+def converted(amount, currency, day):
+    """
+    `amount` of each row in the reporting currency, as SQL: NULL (left out
+    of sums) for rows in a currency without any rate
+    """
+    return Case(
+        When(**{currency: settings.REPORTING_CURRENCY}, then=F(amount)),
+        default=ExpressionWrapper(
+            F(amount) * rate_expression(currency, day),
+            output_field=DecimalField(max_digits=30, decimal_places=10),
+        ),
+        output_field=DecimalField(max_digits=30, decimal_places=10),
+    )
+
+
+def missing_currencies(queryset, currency="currency"):
+    """Currencies of `queryset` rows that have no rate at all, sorted"""
+    return sorted(
+        queryset.exclude(**{currency: settings.REPORTING_CURRENCY})
+        .exclude(**{f"{currency}__in": ExchangeRate.objects.values("currency")})
+        .order_by()
+        .values_list(currency, flat=True)
+        .distinct()
+    )
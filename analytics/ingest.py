@@ -0,0 +1,302 @@
+"""
+Bulk ingestion of AnalyticsData from CSV or JSON Lines.
+
+Records are streamed, validated and loaded in fixed-size batches, so memory
+stays flat however large the file is. Loads are upserts on (scope, metric,
+date): re-running a backfill replaces values instead of duplicating rows, and
+within one load the last record for a key wins.
+
+Every batch also refreshes the weekly/monthly/yearly rollups it touches
+(analytics.rollups) unless disabled, e.g. for a large backfill followed by
+rebuild_analytics_rollups.
+
+Records are parsed into plain tuples, not model instances. On PostgreSQL each
+batch is COPYed into a temporary table and merged with one INSERT ... ON
+CONFLICT; SQLite (or PostgreSQL without COPY) gets the same upsert through
+executemany(), and any other backend falls back to bulk_create().
+
+Accepted columns/keys: destination, service, provider (ids, optionally with an
+_id suffix), metric_type, value, date_recorded (or date) and metadata (a JSON
+object, or a JSON string in CSV files).
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from utils.enums import MetricType
+
+from .models import AnalyticsData
+from .rollups import refresh_rollups
+
+FORMATS = ("csv", "jsonl")
+METRIC_TYPES = frozenset(MetricType.values)
+MAX_REPORTED_ERRORS = 100
+CENT = Decimal("0.01")
+
+ROW_COLUMNS = (
+    "destination_id",
+    "service_id",
+    "provider_id",
+    "scope_key",
+    "metric_type",
+    "value",
+    "date_recorded",
+    "metadata",
+)
+
+
+@dataclass
+class IngestResult:
+    rows: int = 0  # rows written, after collapsing duplicates within a batch
+    skipped: int = 0
+    duplicates: int = 0  # records replaced by a later one in the same batch
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _open(source):
+    if hasattr(source, "read"):
+        return source
+    if source == "-":
+        return sys.stdin
+    if str(source).endswith(".gz"):
+        return gzip.open(source, "rt", encoding="utf-8", newline="")
+    return open(source, encoding="utf-8", newline="")
+
+
+def _detect_format(source):
+    name = str(getattr(source, "name", source)).removesuffix(".gz")
+    return "csv" if name.endswith(".csv") else "jsonl"
+
+
+def read_records(source, format=None):
+    """
+    Yield (line number, record) pairs from a CSV or JSONL file. JSONL records
+    are yielded undecoded so a malformed line fails on its own.
+    """
+    format = format or _detect_format(source)
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format {format!r}, expected one of {FORMATS}")
+
+    stream = _open(source)
+    try:
+        if format == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(stream, start=1):
+                if line.strip():
+                    yield line_no, line
+    finally:
+        if stream is not source and stream is not sys.stdin:
+            stream.close()
+
+
+def _foreign_key(record, name):
+    value = record.get(name, record.get(f"{name}_id"))
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def parse_record(record):
+    """Validate one record (a dict or JSON text) into a ROW_COLUMNS tuple"""
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    metric_type = record.get("metric_type")
+    if metric_type not in METRIC_TYPES:
+        raise ValueError(f"Unknown metric_type {metric_type!r}")
+
+    try:
+        value = Decimal(str(record["value"])).quantize(CENT)
+    except (KeyError, InvalidOperation):
+        raise ValueError(f"Invalid value {record.get('value')!r}")
+
+    day = record.get("date_recorded") or record.get("date")
+    try:
+        day = day if isinstance(day, date) else date.fromisoformat(day)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date {day!r}")
+
+    metadata = record.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    if not isinstance(metadata, dict):
+        raise ValueError("metadata must be a JSON object")
+
+    destination_id = _foreign_key(record, "destination")
+    service_id = _foreign_key(record, "service")
+    provider_id = _foreign_key(record, "provider")
+    return (
+        destination_id,
+        service_id,
+        provider_id,
+        AnalyticsData.make_scope_key(destination_id, service_id, provider_id),
+        metric_type,
+        value,
+        day,
+        metadata,
+    )
+
+
+def _batches(records, batch_size, skip_invalid, result):
+    """Group valid rows into batches keyed by (scope, metric, date)"""
+    batch = {}
+    for line_no, record in records:
+        try:
+            row = parse_record(record)
+        except (ValueError, TypeError) as exc:
+            if not skip_invalid:
+                raise ValueError(f"Line {line_no}: {exc}") from exc
+            result.skipped += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(f"Line {line_no}: {exc}")
+            continue
+
+        key = row[3], row[4], row[6]
+        if key in batch:
+            result.duplicates += 1
+        batch[key] = row
+        if len(batch) >= batch_size:
+            result.rows += len(batch)
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        result.rows += len(batch)
+        yield list(batch.values())
+
+
+def _load_bulk_create(rows):
+    AnalyticsData.objects.bulk_create(
+        [AnalyticsData(**dict(zip(ROW_COLUMNS, row))) for row in rows],
+        update_conflicts=True,
+        unique_fields=["scope_key", "metric_type", "date_recorded"],
+        update_fields=["value", "metadata"],
+    )
+
+
+def _load_executemany(rows):
+    table = AnalyticsData._meta.db_table
+    placeholders = ", ".join(["%s"] * (len(ROW_COLUMNS) + 1))
+    sql = f"""
+        INSERT INTO {table} ({", ".join(ROW_COLUMNS)}, created_at)
+        VALUES ({placeholders})
+        ON CONFLICT (scope_key, metric_type, date_recorded) DO UPDATE
+            SET value = excluded.value, metadata = excluded.metadata
+    """
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (*row[:5], str(row[5]), row[6].isoformat(), json.dumps(row[7]), now)
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _copy_rows(cursor, table, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((*row[:6], row[6].isoformat(), json.dumps(row[7])))
+    sql = f"COPY {table} ({', '.join(ROW_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    buffer.seek(0)
+    if hasattr(cursor, "copy_expert"):  # psycopg2
+        cursor.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _ingest_postgresql(batches, after_load):
+    table = AnalyticsData._meta.db_table
+    staging = "analytics_ingest"
+    columns = ", ".join(ROW_COLUMNS)
+    merge = f"""
+        INSERT INTO {table} ({columns}, created_at)
+        SELECT {columns}, %s FROM {staging}
+        ON CONFLICT (scope_key, metric_type, date_recorded) DO UPDATE
+            SET value = EXCLUDED.value, metadata = EXCLUDED.metadata
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TEMPORARY TABLE IF NOT EXISTS {staging} (
+                destination_id bigint,
+                service_id bigint,
+                provider_id bigint,
+                scope_key varchar(64),
+                metric_type varchar(20),
+                value numeric(15, 2),
+                date_recorded date,
+                metadata jsonb
+            )
+            """
+        )
+        try:
+            for rows in batches:
+                with transaction.atomic():
+                    _copy_rows(cursor, staging, rows)
+                    cursor.execute(merge, [timezone.now()])
+                    cursor.execute(f"TRUNCATE {staging}")
+                    after_load(rows)
+        finally:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+
+
+def ingest_analytics(
+    source,
+    format=None,
+    batch_size=10_000,
+    use_copy=None,
+    skip_invalid=False,
+    update_rollups=True,
+):
+    """
+    Load AnalyticsData records from `source` (a path, "-" for stdin, or an
+    open text file). Invalid records raise ValueError unless `skip_invalid`
+    is set, in which case they are counted and the first few reported.
+    COPY is used on PostgreSQL unless `use_copy` is False. Returns an
+    IngestResult.
+    """
+    result = IngestResult()
+    started = time.perf_counter()
+    batches = _batches(read_records(source, format), batch_size, skip_invalid, result)
+
+    def after_load(rows):
+        if update_rollups:
+            refresh_rollups((row[3], row[4], row[6]) for row in rows)
+
+    if use_copy is None:
+        use_copy = connection.vendor == "postgresql"
+    if use_copy:
+        _ingest_postgresql(batches, after_load)
+    else:
+        load = (
+            _load_executemany
+            if connection.vendor in ("postgresql", "sqlite")
+            else _load_bulk_create
+        )
+        for rows in batches:
+            with transaction.atomic():
+                load(rows)
+                after_load(rows)
+
+    result.seconds = time.perf_counter() - started
+    return result
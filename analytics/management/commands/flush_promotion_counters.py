@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.counters import flush_counters
+
+
+class Command(BaseCommand):
+    help = "Flush buffered promotion impressions/clicks/conversions to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep flushing every N seconds (0 = run once)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_counters()
+            self.stdout.write(f"Flushed counters for {flushed} promotions")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
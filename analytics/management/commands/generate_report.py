@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.models import Report
+from analytics.reports import build_report, report_period
+from utils.dates import date_option
+
+
+class Command(BaseCommand):
+    help = "Generate a destination/provider report, reusing cached days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            dest="report_type",
+            default="monthly",
+            choices=[choice for choice, _ in Report.REPORT_TYPE_CHOICES],
+        )
+        parser.add_argument(
+            "--date", help="Day inside the period (YYYY-MM-DD), default today"
+        )
+        parser.add_argument("--start", help="Custom period start (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Custom period end (YYYY-MM-DD)")
+        parser.add_argument("--destination", type=int)
+        parser.add_argument("--provider", type=int)
+        parser.add_argument("--title", help="Save the result as a Report")
+
+    def handle(self, *args, **options):
+        if options["report_type"] == "custom":
+            if not options["start"] or not options["end"]:
+                raise CommandError("Custom reports need --start and --end")
+            start_date = date_option(options, "start")
+            end_date = date_option(options, "end")
+            if start_date > end_date:
+                raise CommandError("--start must not be after --end")
+        else:
+            day = date_option(options, "date")
+            start_date, end_date = report_period(
+                options["report_type"], day or timezone.localdate()
+            )
+
+        data = build_report(
+            start_date,
+            end_date,
+            destination=options["destination"],
+            provider=options["provider"],
+        )
+        if options["title"]:
+            Report.objects.create(
+                title=options["title"],
+                report_type=options["report_type"],
+                destination_id=options["destination"],
+                provider_id=options["provider"],
+                start_date=start_date,
+                end_date=end_date,
+                data=data,
+            )
+
+        self.stdout.write(json.dumps(data["totals"], indent=2))
+        generation = data["generation"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{start_date} to {end_date}: {generation['cached_days']} cached "
+                f"days, {generation['computed_days']} computed, "
+                f"{generation['seconds']:.3f}s"
+            )
+        )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.ingest import FORMATS, ingest_analytics
+
+
+class Command(BaseCommand):
+    help = "Bulk load AnalyticsData from CSV/JSONL, upserting on scope/metric/date"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV/JSONL file, optionally .gz; - for stdin")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even on PostgreSQL",
+        )
+        parser.add_argument(
+            "--no-rollups",
+            action="store_true",
+            help="Skip rollup maintenance (run rebuild_analytics_rollups after)",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Skip invalid records instead of aborting",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = ingest_analytics(
+                options["path"],
+                format=options["format"],
+                batch_size=options["batch_size"],
+                use_copy=False if options["no_copy"] else None,
+                skip_invalid=options["skip_invalid"],
+                update_rollups=not options["no_rollups"],
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {result.rows} rows ({result.skipped} skipped, "
+                f"{result.duplicates} duplicates replaced) in "
+                f"{result.seconds:.1f}s: {result.rows_per_second:,.0f} rows/sec"
+            )
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import rebuild_rollups
+from utils.dates import date_option
+
+
+class Command(BaseCommand):
+    help = "Recompute weekly/monthly/yearly AnalyticsData rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First date (YYYY-MM-DD), default all")
+        parser.add_argument("--end", help="Last date (YYYY-MM-DD), default all")
+
+    def handle(self, *args, **options):
+        start_date = date_option(options, "start")
+        end_date = date_option(options, "end")
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start must not be after --end")
+        started = time.perf_counter()
+        written = rebuild_rollups(start_date, end_date)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {written} rollup buckets in {elapsed:.1f}s")
+        )
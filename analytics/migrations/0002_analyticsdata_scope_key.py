@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:51
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+# Metrics that are rates, not counts: duplicates are averaged, not summed
+AVERAGED_METRICS = {"conversion_rate"}
+CENT = Decimal("0.01")
+
+
+def fill_scope_keys(apps, schema_editor):
+    """
+    Backfill scope_key and merge rows that now share (scope, metric, date)
+    into the newest one: counts are summed, rates averaged, and the number
+    of rows merged is kept in its metadata
+    """
+    AnalyticsData = apps.get_model("analytics", "AnalyticsData")
+    parts = []
+    for field in ("destination_id", "service_id", "provider_id"):
+        if parts:
+            parts.append(Value(":"))
+        parts.append(Coalesce(Cast(field, models.CharField()), Value("")))
+    AnalyticsData.objects.update(scope_key=Concat(*parts))
+
+    duplicates = (
+        AnalyticsData.objects.values("scope_key", "metric_type", "date_recorded")
+        .annotate(
+            rows=Count("id"), keep=Max("id"), total=Sum("value"), mean=Avg("value")
+        )
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in list(duplicates):
+        averaged = group["metric_type"] in AVERAGED_METRICS
+        value = Decimal(str(group["mean"] if averaged else group["total"]))
+        kept = AnalyticsData.objects.get(pk=group["keep"])
+        kept.value = value.quantize(CENT)
+        kept.metadata = {**(kept.metadata or {}), "merged_rows": group["rows"]}
+        kept.save(update_fields=["value", "metadata"])
+        AnalyticsData.objects.filter(
+            scope_key=group["scope_key"],
+            metric_type=group["metric_type"],
+            date_recorded=group["date_recorded"],
+        ).exclude(pk=kept.pk).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0001_initial"),
+        ("destinations", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analyticsdata",
+            name="scope_key",
+            field=models.CharField(default="", editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_scope_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="analyticsdata",
+            constraint=models.UniqueConstraint(
+                fields=("scope_key", "metric_type", "date_recorded"),
+                name="analytics_data_unique_scope_metric_date",
+            ),
+        ),
+    ]
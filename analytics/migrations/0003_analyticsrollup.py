@@ -0,0 +1,114 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0002_analyticsdata_scope_key"),
+        ("destinations", "0001_initial"),
+        ("services", "0005_providerstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("week", "Weekly"),
+                            ("month", "Monthly"),
+                            ("year", "Yearly"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("scope_key", models.CharField(editable=False, max_length=64)),
+                (
+                    "metric_type",
+                    models.CharField(
+                        choices=[
+                            ("bookings", "Total Bookings"),
+                            ("revenue", "Total Revenue"),
+                            ("users", "New Users"),
+                            ("page_views", "Page Views"),
+                            ("conversion_rate", "Conversion Rate"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "value_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                ("value_count", models.PositiveIntegerField(default=0)),
+                (
+                    "value_min",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=15, null=True
+                    ),
+                ),
+                (
+                    "value_max",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=15, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "destination",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_rollups",
+                        to="destinations.destination",
+                    ),
+                ),
+                (
+                    "provider",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_rollups",
+                        to="services.serviceprovider",
+                    ),
+                ),
+                (
+                    "service",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analytics_rollups",
+                        to="services.tourservice",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Analytics Rollup",
+                "verbose_name_plural": "Analytics Rollups",
+                "ordering": ["-period_start"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("period", "scope_key", "metric_type", "period_start"),
+                        name="analytics_rollup_unique_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0003_analyticsrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scope_key", models.CharField(max_length=40)),
+                ("date", models.DateField()),
+                ("data", models.JSONField(default=dict)),
+                ("computed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Report Day",
+                "verbose_name_plural": "Report Days",
+                "unique_together": {("scope_key", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def clear_report_days(apps, schema_editor):
+    # Cached days summed amounts across currencies; recompute them converted
+    apps.get_model("analytics", "ReportDay").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("analytics", "0004_reportday"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.CharField(
+                        choices=[
+                            ("USD", "US Dollar"),
+                            ("EUR", "Euro"),
+                            ("GBP", "British Pound"),
+                            ("KES", "Kenyan Shilling"),
+                            ("TZS", "Tanzanian Shilling"),
+                            ("ZAR", "South African Rand"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "rate",
+                    models.DecimalField(
+                        decimal_places=10,
+                        help_text=(
+                            "Units of the reporting currency per unit of this currency"
+                        ),
+                        max_digits=20,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+                ("source", models.CharField(blank=True, max_length=50)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Exchange Rate",
+                "verbose_name_plural": "Exchange Rates",
+                "ordering": ["-date", "currency"],
+                "unique_together": {("currency", "date")},
+            },
+        ),
+        migrations.RunPython(clear_report_days, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 
-from utils.enums import MetricType, PromotionType
+from utils.enums import Currency, MetricType, PromotionType, RollupPeriod
 
 
 class Promotion(models.Model):
@@ -83,18 +83,32 @@ class Promotion(models.Model):
         now = timezone.now()
         return self.is_active and self.start_date <= now <= self.end_date
 
+    @property
+    def live_counts(self):
+        """Flushed counters plus increments still waiting in the counter buffer"""
+        from .counters import pending_counts
+
+        pending = pending_counts(self.pk) if self.pk else {}
+        return {
+            "impressions": self.impressions + pending.get("impressions", 0),
+            "clicks": self.clicks + pending.get("clicks", 0),
+            "conversions": self.conversions + pending.get("conversions", 0),
+        }
+
     @property
     def click_through_rate(self):
         """Calculate CTR (Click Through Rate)"""
-        if self.impressions > 0:
-            return (self.clicks / self.impressions) * 100
+        counts = self.live_counts
+        if counts["impressions"] > 0:
+            return (counts["clicks"] / counts["impressions"]) * 100
         return 0
 
     @property
     def conversion_rate(self):
         """Calculate conversion rate"""
-        if self.clicks > 0:
-            return (self.conversions / self.clicks) * 100
+        counts = self.live_counts
+        if counts["clicks"] > 0:
+            return (counts["conversions"] / counts["clicks"]) * 100
         return 0
 
 
@@ -125,6 +139,9 @@ class AnalyticsData(models.Model):
         related_name="analytics",
     )
 
+    # "<destination>:<service>:<provider>" ids, so upserts can key on the scope
+    scope_key = models.CharField(max_length=64, editable=False)
+
     # Metric Details
     metric_type = models.CharField(max_length=20, choices=MetricType.choices)
     value = models.DecimalField(max_digits=15, decimal_places=2)
@@ -148,12 +165,99 @@ class AnalyticsData(models.Model):
             models.Index(fields=["provider", "metric_type"]),
         ]
         ordering = ["-date_recorded"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope_key", "metric_type", "date_recorded"],
+                name="analytics_data_unique_scope_metric_date",
+            ),
+        ]
+
+    @staticmethod
+    def make_scope_key(destination_id=None, service_id=None, provider_id=None):
+        return ":".join(
+            str(pk) if pk else "" for pk in (destination_id, service_id, provider_id)
+        )
+
+    def save(self, *args, **kwargs):
+        self.scope_key = self.make_scope_key(
+            self.destination_id, self.service_id, self.provider_id
+        )
+        super().save(*args, **kwargs)
 
     def __str__(self):
         target = self.destination or self.service or self.provider
         return f"{target} - {self.get_metric_type_display()} - {self.date_recorded}"
 
 
+class AnalyticsRollup(models.Model):
+    """
+    Weekly/monthly/yearly aggregate of AnalyticsData for one scope and metric,
+    maintained by analytics.rollups
+    """
+
+    period = models.CharField(max_length=10, choices=RollupPeriod.choices)
+    period_start = models.DateField()
+    destination = models.ForeignKey(
+        "destinations.Destination",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="analytics_rollups",
+    )
+    service = models.ForeignKey(
+        "services.TourService",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="analytics_rollups",
+    )
+    provider = models.ForeignKey(
+        "services.ServiceProvider",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="analytics_rollups",
+    )
+    scope_key = models.CharField(max_length=64, editable=False)
+    metric_type = models.CharField(max_length=20, choices=MetricType.choices)
+
+    # Aggregates of the daily values in the period
+    value_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    value_count = models.PositiveIntegerField(default=0)
+    value_min = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True
+    )
+    value_max = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Analytics Rollup"
+        verbose_name_plural = "Analytics Rollups"
+        ordering = ["-period_start"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "scope_key", "metric_type", "period_start"],
+                name="analytics_rollup_unique_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        target = self.destination or self.service or self.provider
+        return (
+            f"{target} - {self.get_metric_type_display()} - "
+            f"{self.get_period_display()} {self.period_start}"
+        )
+
+    @property
+    def value_average(self):
+        if self.value_count:
+            return self.value_sum / self.value_count
+        return None
+
+
 class Report(models.Model):
     """
     Generated reports for DMOs and service providers
@@ -208,3 +312,51 @@ class Report(models.Model):
 
     def __str__(self):
         return f"{self.title} - {self.start_date} to {self.end_date}"
+
+
+class ReportDay(models.Model):
+    """
+    One day of report figures for a scope, cached by analytics.reports so
+    reports only compute the days they have not seen before
+    """
+
+    # "destination:<id>", "provider:<id>" or "platform"
+    scope_key = models.CharField(max_length=40)
+    date = models.DateField()
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Report Day"
+        verbose_name_plural = "Report Days"
+        unique_together = ["scope_key", "date"]
+
+    def __str__(self):
+        return f"{self.scope_key} - {self.date}"
+
+
+class ExchangeRate(models.Model):
+    """
+    Daily exchange rate of a currency into REPORTING_CURRENCY, used by
+    analytics.fx to report amounts in different currencies as one total
+    """
+
+    currency = models.CharField(max_length=3, choices=Currency.choices)
+    date = models.DateField()
+    rate = models.DecimalField(
+        max_digits=20,
+        decimal_places=10,
+        validators=[MinValueValidator(0)],
+        help_text="Units of the reporting currency per unit of this currency",
+    )
+    source = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Exchange Rate"
+        verbose_name_plural = "Exchange Rates"
+        unique_together = ["currency", "date"]
+        ordering = ["-date", "currency"]
+
+    def __str__(self):
+        return f"{self.currency} {self.date}: {self.rate}"
@@ -0,0 +1,456 @@
+"""
+Report generation for destinations and service providers.
+
+A report is the sum of per-day figures (bookings made, payments collected and
+refunded, AnalyticsData metrics, per-service breakdown). Each past day is
+computed once with grouped queries and cached as a ReportDay row; generating
+or extending any report only computes the days missing from the cache, so
+overlapping reports (a quarter and its months, this year and last) share work.
+Today and future days are always computed live and never cached.
+
+Money figures are in REPORTING_CURRENCY: bookings and payments are grouped
+per currency as well and converted with the day's rate (see analytics.fx).
+Amounts in a currency with no rate yet are left out of those figures and
+reported per currency under "unconverted" (the currencies are also listed in
+"incomplete_currencies"); such days are not cached, so they are converted
+once a rate arrives.
+
+Booking, Payment, AnalyticsData and ExchangeRate signals drop the cached days
+they affect.
+
+Reports are read from a replica (see utils.db). A day changed within the
+last DATABASE_PRIMARY_PIN_SECONDS may not have reached it yet, so such days
+are computed but not cached.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from utils.db import read_only
+from utils.enums import BookingStatus, MetricType, PaymentStatus, RollupPeriod
+
+from .fx import convert_rows, converted, missing_currencies
+from .models import AnalyticsData, ReportDay
+from .rollups import period_end, period_start
+
+ONE_DAY = timedelta(days=1)
+CENT = Decimal("0.01")
+MONEY_FIELDS = {
+    "booking_value",
+    "payment_amount",
+    "commission",
+    "provider_payout",
+    "refund_amount",
+    *(f"metric_{metric}" for metric in MetricType.values),
+}
+PAYMENT_AMOUNTS = {"payment_amount", "commission", "provider_payout", "refund_amount"}
+TOP_SERVICES = 10
+CHANGED_KEY = "reports:changed:{day}"
+
+
+def scope_key(destination=None, provider=None):
+    if destination is not None:
+        return f"destination:{getattr(destination, 'pk', destination)}"
+    if provider is not None:
+        return f"provider:{getattr(provider, 'pk', provider)}"
+    return "platform"
+
+
+def report_period(report_type, day):
+    """(start_date, end_date) of the daily/weekly/.../annual period containing day"""
+    if report_type == "daily":
+        return day, day
+    if report_type == "quarterly":
+        start = day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+        end = start
+        for _ in range(3):
+            end = period_end(RollupPeriod.MONTH, end)
+        return start, end - ONE_DAY
+    period = {
+        "weekly": RollupPeriod.WEEK,
+        "monthly": RollupPeriod.MONTH,
+        "annual": RollupPeriod.YEAR,
+    }.get(report_type)
+    if period is None:
+        raise ValueError(f"Report type {report_type!r} has no fixed period")
+    start = period_start(period, day)
+    return start, period_end(period, start) - ONE_DAY
+
+
+def _runs(days):
+    """Collapse sorted dates into (first, last) runs of consecutive days"""
+    runs = []
+    for day in days:
+        if runs and runs[-1][1] + ONE_DAY == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _day_filter(field, days):
+    return reduce(or_, (Q(**{f"{field}__range": run}) for run in _runs(days)))
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _moment_filter(field, runs, fallback=None):
+    """
+    Rows whose `field` datetime (or `fallback` where it is NULL) falls within
+    the (first, last) day runs, as range bounds an index on the column serves
+    """
+
+    def within(name):
+        return reduce(
+            or_,
+            (
+                Q(
+                    **{
+                        f"{name}__gte": _day_start(first),
+                        f"{name}__lt": _day_start(last + ONE_DAY),
+                    }
+                )
+                for first, last in runs
+            ),
+        )
+
+    if fallback is None:
+        return within(field)
+    return within(field) | (Q(**{f"{field}__isnull": True}) & within(fallback))
+
+
+def _scope_filter(destination, provider, prefix):
+    if destination is not None:
+        return Q(**{f"{prefix}destination": destination})
+    if provider is not None:
+        return Q(**{f"{prefix}provider": provider})
+    if not prefix:
+        # Platform-wide metrics are the AnalyticsData rows without a scope
+        return Q(scope_key=AnalyticsData.make_scope_key())
+    return Q()
+
+
+def _compute_days(days, destination, provider):
+    """Figures for each of `days` (sorted dates), with grouped queries"""
+    from bookings.models import Booking, Payment
+
+    figures = {day: defaultdict(int) for day in days}
+    services = {day: {} for day in days}
+    runs = _runs(days)
+
+    bookings = (
+        Booking.objects.filter(
+            _scope_filter(destination, provider, "service__"),
+            _moment_filter("booking_date", runs),
+        )
+        .annotate(day=TruncDate("booking_date"))
+        .values("day", "service_id", "currency")
+        .annotate(
+            bookings=Count("id"),
+            guests=Sum(F("number_of_adults") + F("number_of_children")),
+            booking_value=Sum("final_amount"),
+            **{
+                f"bookings_{status}": Count("id", filter=Q(status=status))
+                for status in BookingStatus.values
+            },
+        )
+        .order_by()
+    )
+    unconverted = {}
+    for row in convert_rows(list(bookings), {"booking_value"}, unconverted=unconverted):
+        day, service_id = row.pop("day"), row.pop("service_id")
+        row.pop("currency")
+        row["booking_value"] = row["booking_value"] or Decimal("0")
+        for name, value in row.items():
+            figures[day][name] += value or 0
+        service = services[day].setdefault(
+            str(service_id), {"bookings": 0, "booking_value": Decimal("0")}
+        )
+        service["bookings"] += row["bookings"]
+        service["booking_value"] += row["booking_value"]
+
+    payments = Payment.objects.filter(
+        _scope_filter(destination, provider, "booking__service__")
+    )
+    collected = (
+        payments.filter(
+            _moment_filter("completed_at", runs, fallback="created_at"),
+            status__in=[PaymentStatus.COMPLETED, PaymentStatus.REFUNDED],
+        )
+        .annotate(day=TruncDate(Coalesce("completed_at", "created_at")))
+        .values("day", "currency")
+        .annotate(
+            payments=Count("id"),
+            payment_amount=Sum("amount"),
+            commission=Sum("commission_amount"),
+            provider_payout=Sum("provider_payout"),
+        )
+        .order_by()
+    )
+    refunded = (
+        payments.filter(
+            _moment_filter("refund_date", runs, fallback="created_at"),
+            refund_amount__gt=0,
+        )
+        .annotate(day=TruncDate(Coalesce("refund_date", "created_at")))
+        .values("day", "currency")
+        .annotate(refunds=Count("id"), refund_amount=Sum("refund_amount"))
+        .order_by()
+    )
+    for rows in (collected, refunded):
+        for row in convert_rows(list(rows), PAYMENT_AMOUNTS, unconverted=unconverted):
+            day = row.pop("day")
+            row.pop("currency")
+            for name, value in row.items():
+                figures[day][name] += value or 0
+
+    metrics = (
+        AnalyticsData.objects.filter(
+            _scope_filter(destination, provider, ""),
+            _day_filter("date_recorded", days),
+        )
+        .values("date_recorded", "metric_type")
+        .annotate(total=Sum("value"))
+        .order_by()
+    )
+    for row in metrics:
+        figures[row["date_recorded"]][f"metric_{row['metric_type']}"] += row["total"]
+
+    for (day, currency), amounts in unconverted.items():
+        figures[day].setdefault("unconverted", {})[currency] = amounts
+
+    return {
+        day: {
+            **_serialise(figures[day]),
+            "services": {
+                service_id: _serialise(values)
+                for service_id, values in services[day].items()
+            },
+        }
+        for day in days
+    }
+
+
+def _serialise_value(name, value):
+    if name in MONEY_FIELDS:
+        return str(Decimal(value).quantize(CENT))
+    if name == "unconverted":
+        return {currency: _serialise(value[currency]) for currency in sorted(value)}
+    return value
+
+
+def _serialise(values):
+    return {name: _serialise_value(name, value) for name, value in values.items()}
+
+
+def _add(totals, values):
+    for name, value in values.items():
+        if name == "services":
+            for service_id, figures in value.items():
+                service = totals["services"].setdefault(
+                    service_id, {"bookings": 0, "booking_value": Decimal("0")}
+                )
+                service["bookings"] += figures["bookings"]
+                service["booking_value"] += Decimal(figures["booking_value"])
+        elif name == "unconverted":
+            for currency, amounts in value.items():
+                unconverted = totals.setdefault(name, {}).setdefault(currency, {})
+                for key, amount in amounts.items():
+                    total = unconverted.get(key, Decimal("0"))
+                    unconverted[key] = total + Decimal(amount)
+        elif name in MONEY_FIELDS:
+            totals[name] = totals.get(name, Decimal("0")) + Decimal(value)
+        else:
+            totals[name] = totals.get(name, 0) + value
+
+
+def daily_figures(start_date, end_date, destination=None, provider=None):
+    """
+    {date: figures} for every day in [start_date, end_date], read from the
+    ReportDay cache and computing (and caching) only the missing past days.
+    Days with unconverted amounts are not cached. Also returns how many days
+    came from the cache.
+    """
+    key = scope_key(destination, provider)
+    today = timezone.localdate()
+    days = []
+    day = start_date
+    while day <= end_date:
+        days.append(day)
+        day += ONE_DAY
+
+    cached = dict(
+        ReportDay.objects.filter(
+            scope_key=key, date__range=(start_date, end_date)
+        ).values_list("date", "data")
+    )
+    missing = [day for day in days if day not in cached]
+    computed = _compute_days(missing, destination, provider) if missing else {}
+    changed = cache.get_many([CHANGED_KEY.format(day=day) for day in computed])
+
+    ReportDay.objects.bulk_create(
+        [
+            ReportDay(scope_key=key, date=day, data=data)
+            for day, data in computed.items()
+            if day < today
+            and CHANGED_KEY.format(day=day) not in changed
+            and "unconverted" not in data
+        ],
+        update_conflicts=True,
+        unique_fields=["scope_key", "date"],
+        update_fields=["data", "computed_at"],
+    )
+    return {**cached, **computed}, len(cached)
+
+
+@read_only
+def build_report(start_date, end_date, destination=None, provider=None):
+    """Report data (the Report.data payload) for a scope and period"""
+    from services.models import TourService
+
+    started = time.perf_counter()
+    figures, cached_days = daily_figures(start_date, end_date, destination, provider)
+
+    totals = {"services": {}}
+    daily = []
+    for day in sorted(figures):
+        _add(totals, figures[day])
+        daily.append(
+            {
+                "date": day.isoformat(),
+                "bookings": figures[day].get("bookings", 0),
+                "booking_value": figures[day].get("booking_value", "0"),
+                "payment_amount": figures[day].get("payment_amount", "0"),
+            }
+        )
+
+    services = totals.pop("services")
+    unconverted = totals.pop("unconverted", {})
+    top = sorted(services.items(), key=lambda item: item[1]["bookings"], reverse=True)
+    top = top[:TOP_SERVICES]
+    names = dict(
+        TourService.objects.filter(pk__in=[pk for pk, _ in top]).values_list(
+            "pk", "name"
+        )
+    )
+
+    return {
+        "scope": scope_key(destination, provider),
+        "currency": settings.REPORTING_CURRENCY,
+        "incomplete_currencies": sorted(unconverted),
+        "unconverted": _serialise_value("unconverted", unconverted),
+        "period": {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "days": len(figures),
+        },
+        "totals": _serialise(totals),
+        "daily": daily,
+        "top_services": [
+            {
+                "service_id": int(pk),
+                "name": names.get(int(pk), ""),
+                "bookings": values["bookings"],
+                "booking_value": str(values["booking_value"].quantize(CENT)),
+            }
+            for pk, values in top
+        ],
+        "generation": {
+            "cached_days": cached_days,
+            "computed_days": len(figures) - cached_days,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+
+
+def generate_report(report):
+    """Fill in report.data for its scope and period (the caller saves it)"""
+    report.data = build_report(
+        report.start_date,
+        report.end_date,
+        destination=report.destination_id,
+        provider=report.provider_id,
+    )
+    return report
+
+
+def invalidate_report_days(days, destination_ids=(), provider_ids=()):
+    """Drop cached days for the given scopes (and the platform) on change"""
+    keys = ["platform"]
+    keys += [scope_key(destination=pk) for pk in destination_ids if pk]
+    keys += [scope_key(provider=pk) for pk in provider_ids if pk]
+    days = {day for day in days if day}
+    if days:
+        ReportDay.objects.filter(scope_key__in=keys, date__in=days).delete()
+        cache.set_many(
+            {CHANGED_KEY.format(day=day): True for day in days},
+            settings.DATABASE_PRIMARY_PIN_SECONDS,
+        )
+
+
+@read_only
+def destination_revenue(start_date, end_date, destination_ids=None):
+    """
+    Payments collected from start_date to end_date per destination id, in the
+    reporting currency, converted in SQL with one grouped query. Payments in
+    a currency without any rate are left out of "revenue" and totalled per
+    currency under "unconverted":
+    {"currency", "revenue": {destination id: amount},
+     "unconverted": {destination id: {currency: amount}}, "incomplete_currencies"}
+    """
+    from bookings.models import Payment
+
+    payments = Payment.objects.filter(
+        _moment_filter("completed_at", [(start_date, end_date)], fallback="created_at"),
+        status__in=[PaymentStatus.COMPLETED, PaymentStatus.REFUNDED],
+    ).annotate(day=TruncDate(Coalesce("completed_at", "created_at")))
+    if destination_ids is not None:
+        payments = payments.filter(booking__service__destination_id__in=destination_ids)
+    revenue = (
+        payments.values("booking__service__destination_id")
+        .annotate(revenue=Sum(converted("amount", "currency", "day")))
+        .order_by()
+    )
+    incomplete = missing_currencies(payments)
+    unconverted = defaultdict(dict)
+    if incomplete:
+        amounts = (
+            payments.filter(currency__in=incomplete)
+            .values("booking__service__destination_id", "currency")
+            .annotate(amount=Sum("amount"))
+            .order_by()
+        )
+        for row in amounts:
+            destination = unconverted[row["booking__service__destination_id"]]
+            destination[row["currency"]] = Decimal(row["amount"]).quantize(CENT)
+    return {
+        "currency": settings.REPORTING_CURRENCY,
+        "revenue": {
+            row["booking__service__destination_id"]: Decimal(
+                row["revenue"] or 0
+            ).quantize(CENT)
+            for row in revenue
+        },
+        "unconverted": dict(unconverted),
+        "incomplete_currencies": incomplete,
+    }
+
+
+def clear_report_cache(destination=None, provider=None):
+    """Forget every cached day of one scope (or all scopes)"""
+    days = ReportDay.objects.all()
+    if destination is not None or provider is not None:
+        days = days.filter(scope_key=scope_key(destination, provider))
+    return days.delete()[0]
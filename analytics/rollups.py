@@ -0,0 +1,379 @@
+"""
+Weekly, monthly and yearly rollups of AnalyticsData.
+
+AnalyticsRollup keeps sum/count/min/max per (period, scope, metric, period
+start). refresh_rollups() recomputes only the buckets touched by new or changed
+daily rows (AnalyticsData signals and the ingest pipeline call it), and
+rebuild_rollups() recomputes a whole date range for backfills. Weeks and months
+are aggregated from daily rows; years are summed from the month rollups, so a
+refresh reads at most a month of daily rows per key.
+
+aggregate_metric() and metric_series() answer date-range queries by covering
+the range with the coarsest whole periods that fit (years, then months, then
+ISO weeks) and reading raw daily rows only for the ragged edges, so a
+year-over-year dashboard reads a few dozen rollup rows instead of every day.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+from utils.enums import RollupPeriod
+
+from .models import AnalyticsData, AnalyticsRollup
+
+ONE_DAY = timedelta(days=1)
+CENT = Decimal("0.01")
+PERIODS = (RollupPeriod.YEAR, RollupPeriod.MONTH, RollupPeriod.WEEK)  # coarsest first
+TRUNCATE = {
+    RollupPeriod.WEEK: TruncWeek,
+    RollupPeriod.MONTH: TruncMonth,
+    RollupPeriod.YEAR: TruncYear,
+}
+# Periods summed from a finer rollup instead of daily rows (weeks do not nest)
+DERIVED_FROM = {RollupPeriod.YEAR: RollupPeriod.MONTH}
+BUCKET_FIELDS = (
+    "scope_key",
+    "destination_id",
+    "service_id",
+    "provider_id",
+    "metric_type",
+    "period_start",
+)
+# OR-ed conditions per query, well within SQLite's expression depth limit
+CONDITIONS_PER_QUERY = 200
+
+
+def period_start(period, day):
+    if period == RollupPeriod.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == RollupPeriod.MONTH:
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def period_end(period, start):
+    """First day after the period starting at `start`"""
+    if period == RollupPeriod.WEEK:
+        return start + timedelta(days=7)
+    if period == RollupPeriod.MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start.replace(year=start.year + 1)
+
+
+def _as_date(day):
+    return date.fromisoformat(day) if isinstance(day, str) else day
+
+
+def _bucket_aggregates(period, queryset):
+    return (
+        queryset.annotate(period_start=TRUNCATE[period]("date_recorded"))
+        .values(*BUCKET_FIELDS)
+        .annotate(
+            value_sum=Sum("value"),
+            value_count=Count("id"),
+            value_min=Min("value"),
+            value_max=Max("value"),
+        )
+        .order_by()
+    )
+
+
+def _period_aggregates(period, start=None, end=None, chunk_size=2000, **filters):
+    """
+    Bucket values of `period` for data in [start, end), from daily rows or,
+    for periods in DERIVED_FROM, from the finer rollups (refreshed first)
+    """
+    finer = DERIVED_FROM.get(period)
+    if finer is None:
+        rows = AnalyticsData.objects.filter(**filters)
+        if start:
+            rows = rows.filter(date_recorded__gte=start)
+        if end:
+            rows = rows.filter(date_recorded__lt=end)
+        yield from _bucket_aggregates(period, rows).iterator(chunk_size=chunk_size)
+        return
+
+    rollups = AnalyticsRollup.objects.filter(period=finer, **filters)
+    if start:
+        rollups = rollups.filter(period_start__gte=start)
+    if end:
+        rollups = rollups.filter(period_start__lt=end)
+    buckets = (
+        rollups.values(*BUCKET_FIELDS[:-1], bucket=TRUNCATE[period]("period_start"))
+        .annotate(
+            value_sum=Sum("value_sum"),
+            value_count=Sum("value_count"),
+            value_min=Min("value_min"),
+            value_max=Max("value_max"),
+        )
+        .order_by()
+    )
+    for values in buckets.iterator(chunk_size=chunk_size):
+        values["period_start"] = values.pop("bucket")
+        yield values
+
+
+def _upsert(rollups):
+    AnalyticsRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["period", "scope_key", "metric_type", "period_start"],
+        update_fields=[
+            "value_sum",
+            "value_count",
+            "value_min",
+            "value_max",
+            "updated_at",
+        ],
+    )
+    return len(rollups)
+
+
+def refresh_rollups(keys):
+    """
+    Recompute the week/month/year buckets containing the given
+    (scope_key, metric_type, date_recorded) keys. Returns buckets written.
+    """
+    keys = {(scope, metric, _as_date(day)) for scope, metric, day in keys}
+    if not keys:
+        return 0
+    scopes = {scope for scope, _, _ in keys}
+    metrics = {metric for _, metric, _ in keys}
+
+    written = 0
+    for period in reversed(PERIODS):  # finest first, for DERIVED_FROM
+        buckets = {
+            (scope, metric, period_start(period, day)) for scope, metric, day in keys
+        }
+        starts = [start for _, _, start in buckets]
+        aggregates = _period_aggregates(
+            period,
+            min(starts),
+            period_end(period, max(starts)),
+            scope_key__in=scopes,
+            metric_type__in=metrics,
+        )
+
+        found = {}
+        for values in aggregates:
+            key = (values["scope_key"], values["metric_type"], values["period_start"])
+            if key in buckets:
+                found[key] = AnalyticsRollup(period=period, **values)
+        written += _upsert(list(found.values()))
+
+        emptied = defaultdict(list)
+        for scope, metric, start in buckets - found.keys():
+            emptied[scope, metric].append(start)
+        conditions = [
+            Q(scope_key=scope, metric_type=metric, period_start__in=starts)
+            for (scope, metric), starts in emptied.items()
+        ]
+        for offset in range(0, len(conditions), CONDITIONS_PER_QUERY):
+            chunk = conditions[offset : offset + CONDITIONS_PER_QUERY]
+            AnalyticsRollup.objects.filter(reduce(or_, chunk), period=period).delete()
+    return written
+
+
+def rebuild_rollups(start_date=None, end_date=None, batch_size=2000):
+    """Recompute every rollup bucket overlapping [start_date, end_date]"""
+    written = 0
+    for period in reversed(PERIODS):  # finest first, for DERIVED_FROM
+        start = end = None
+        rollups = AnalyticsRollup.objects.filter(period=period)
+        if start_date:
+            start = period_start(period, start_date)
+            rollups = rollups.filter(period_start__gte=start)
+        if end_date:
+            end = period_end(period, period_start(period, end_date))
+            rollups = rollups.filter(period_start__lt=end)
+        rollups.delete()
+
+        batch = []
+        for values in _period_aggregates(period, start, end, batch_size):
+            batch.append(AnalyticsRollup(period=period, **values))
+            if len(batch) >= batch_size:
+                written += _upsert(batch)
+                batch = []
+        if batch:
+            written += _upsert(batch)
+    return written
+
+
+def cover_range(start, end, periods=PERIODS):
+    """
+    Split [start, end] into (period, first day, last day) segments using whole
+    years, then months, then weeks; period is None for leftover raw days.
+    """
+    if start > end:
+        return []
+    if not periods:
+        return [(None, start, end)]
+
+    period, finer = periods[0], periods[1:]
+    first = period_start(period, start)
+    if first != start:
+        first = period_end(period, first)
+
+    segments = []
+    cursor = first
+    while period_end(period, cursor) - ONE_DAY <= end:
+        segments.append((period, cursor, period_end(period, cursor) - ONE_DAY))
+        cursor = period_end(period, cursor)
+    if not segments:
+        return cover_range(start, end, finer)
+    return (
+        cover_range(start, first - ONE_DAY, finer)
+        + segments
+        + cover_range(cursor, end, finer)
+    )
+
+
+def _scope_key(destination, service, provider):
+    return AnalyticsData.make_scope_key(
+        getattr(destination, "pk", destination),
+        getattr(service, "pk", service),
+        getattr(provider, "pk", provider),
+    )
+
+
+def _summary(total, count, minimum, maximum):
+    total = (total or Decimal("0")).quantize(CENT)
+    count = count or 0
+    return {
+        "sum": total,
+        "count": count,
+        "min": minimum,
+        "max": maximum,
+        "average": total / count if count else None,
+    }
+
+
+def _merge(summaries):
+    summaries = [summary for summary in summaries if summary["count"]]
+    return _summary(
+        sum((summary["sum"] for summary in summaries), Decimal("0")),
+        sum(summary["count"] for summary in summaries),
+        min((summary["min"] for summary in summaries), default=None),
+        max((summary["max"] for summary in summaries), default=None),
+    )
+
+
+def aggregate_metric(
+    metric_type, start, end, destination=None, service=None, provider=None
+):
+    """
+    Sum/count/min/max/average of a metric over [start, end] for one scope,
+    read from the coarsest rollups covering the range (at most two queries).
+    """
+    scope_key = _scope_key(destination, service, provider)
+    segments = cover_range(start, end)
+    summaries = []
+
+    starts = defaultdict(list)
+    for period, first, _ in segments:
+        if period is not None:
+            starts[period].append(first)
+    # One condition per period however long the range
+    rolled = [
+        Q(period=period, period_start__in=firsts) for period, firsts in starts.items()
+    ]
+    if rolled:
+        values = AnalyticsRollup.objects.filter(
+            reduce(or_, rolled), scope_key=scope_key, metric_type=metric_type
+        ).aggregate(
+            total=Sum("value_sum"),
+            count=Sum("value_count"),
+            minimum=Min("value_min"),
+            maximum=Max("value_max"),
+        )
+        summaries.append(_summary(**values))
+
+    # Only the ragged ends are raw: at most two ranges
+    raw = [
+        Q(date_recorded__range=(first, last))
+        for period, first, last in segments
+        if period is None
+    ]
+    if raw:
+        values = AnalyticsData.objects.filter(
+            reduce(or_, raw), scope_key=scope_key, metric_type=metric_type
+        ).aggregate(
+            total=Sum("value"),
+            count=Count("id"),
+            minimum=Min("value"),
+            maximum=Max("value"),
+        )
+        summaries.append(_summary(**values))
+
+    return _merge(summaries)
+
+
+def metric_series(
+    metric_type,
+    start,
+    end,
+    period=RollupPeriod.MONTH,
+    destination=None,
+    service=None,
+    provider=None,
+):
+    """
+    One summary per `period` bucket overlapping [start, end], each tagged with
+    its period_start. Whole buckets come from one rollup query; partial
+    buckets at either end are aggregated from finer data.
+    """
+    scope_key = _scope_key(destination, service, provider)
+    buckets = []
+    cursor = period_start(period, start)
+    while cursor <= end:
+        buckets.append(cursor)
+        cursor = period_end(period, cursor)
+
+    whole = [
+        first
+        for first in buckets
+        if first >= start and period_end(period, first) - ONE_DAY <= end
+    ]
+    rollups = {
+        rollup.period_start: rollup
+        for rollup in AnalyticsRollup.objects.filter(
+            period=period,
+            scope_key=scope_key,
+            metric_type=metric_type,
+            period_start__in=whole,
+        )
+    }
+
+    series = []
+    for first in buckets:
+        if first in whole:
+            rollup = rollups.get(first)
+            summary = _summary(
+                *(
+                    (
+                        rollup.value_sum,
+                        rollup.value_count,
+                        rollup.value_min,
+                        rollup.value_max,
+                    )
+                    if rollup
+                    else (None, 0, None, None)
+                )
+            )
+        else:
+            summary = aggregate_metric(
+                metric_type,
+                max(first, start),
+                min(period_end(period, first) - ONE_DAY, end),
+                destination,
+                service,
+                provider,
+            )
+        series.append({"period_start": first, **summary})
+    return series
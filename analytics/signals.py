@@ -0,0 +1,132 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .fx import forget_rates
+from .models import AnalyticsData, ExchangeRate, ReportDay
+from .reports import invalidate_report_days
+from .rollups import refresh_rollups
+
+
+def _rollup_key(instance):
+    return (instance.scope_key, instance.metric_type, instance.date_recorded)
+
+
+@receiver(pre_save, sender=AnalyticsData)
+def analytics_data_before_save(sender, instance, **kwargs):
+    instance._rollup_previous = None
+    if not instance._state.adding:
+        instance._rollup_previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(
+                "scope_key",
+                "metric_type",
+                "date_recorded",
+                "destination_id",
+                "provider_id",
+            )
+            .first()
+        )
+
+
+@receiver(post_save, sender=AnalyticsData)
+def analytics_data_saved(sender, instance, **kwargs):
+    keys = [_rollup_key(instance)]
+    invalidate_report_days(
+        [instance.date_recorded], [instance.destination_id], [instance.provider_id]
+    )
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous:
+        keys.append(previous[:3])
+        invalidate_report_days([previous[2]], [previous[3]], [previous[4]])
+    refresh_rollups(keys)
+
+
+@receiver(post_delete, sender=AnalyticsData)
+def analytics_data_deleted(sender, instance, **kwargs):
+    refresh_rollups([_rollup_key(instance)])
+    invalidate_report_days(
+        [instance.date_recorded], [instance.destination_id], [instance.provider_id]
+    )
+
+
+def _local_date(value):
+    return timezone.localdate(value) if value else None
+
+
+def _service_scopes(service_id):
+    from services.models import TourService
+
+    return (
+        TourService.objects.filter(pk=service_id)
+        .values_list("destination_id", "provider_id")
+        .first()
+    ) or (None, None)
+
+
+@receiver(post_save, sender="bookings.Booking")
+@receiver(post_delete, sender="bookings.Booking")
+def booking_report_days_changed(sender, instance, **kwargs):
+    if sender.service.is_cached(instance):
+        service = instance.service
+        destination_id, provider_id = service.destination_id, service.provider_id
+    else:
+        destination_id, provider_id = _service_scopes(instance.service_id)
+    invalidate_report_days(
+        [_local_date(instance.booking_date)], [destination_id], [provider_id]
+    )
+
+
+def _payment_days(completed_at, refund_date, created_at):
+    return [_local_date(completed_at or created_at), _local_date(refund_date)]
+
+
+@receiver(pre_save, sender="bookings.Payment")
+def payment_before_save(sender, instance, **kwargs):
+    instance._report_previous = None
+    if not instance._state.adding:
+        instance._report_previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("completed_at", "refund_date", "created_at")
+            .first()
+        )
+
+
+@receiver(post_save, sender="bookings.Payment")
+@receiver(post_delete, sender="bookings.Payment")
+def payment_report_days_changed(sender, instance, **kwargs):
+    from bookings.models import Booking
+
+    service_id = (
+        Booking.objects.filter(pk=instance.booking_id)
+        .values_list("service_id", flat=True)
+        .first()
+    )
+    days = _payment_days(
+        instance.completed_at, instance.refund_date, instance.created_at
+    )
+    previous = getattr(instance, "_report_previous", None)
+    if previous:
+        days += _payment_days(*previous)
+    destination_id, provider_id = _service_scopes(service_id)
+    invalidate_report_days(days, [destination_id], [provider_id])
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(sender, instance, **kwargs):
+    # The rate applies until the currency's next rate (and before its first)
+    forget_rates()
+    rates = sender.objects.filter(currency=instance.currency).exclude(pk=instance.pk)
+    following = (
+        rates.filter(date__gt=instance.date)
+        .order_by("date")
+        .values_list("date", flat=True)
+        .first()
+    )
+    days = ReportDay.objects.all()
+    if rates.filter(date__lt=instance.date).exists():
+        days = days.filter(date__gte=instance.date)
+    if following:
+        days = days.filter(date__lt=following)
+    days.delete()
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import io
+import json
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from bookings.models import Payment
+from services.tests import make_booking, make_service
+from utils.enums import (
+    Currency,
+    MetricType,
+    PaymentMethod,
+    PaymentStatus,
+    PromotionType,
+    RollupPeriod,
+)
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from . import counters
+from .counters import LocalCounterBuffer, RedisCounterBuffer, flush_counters
+from .fx import convert, forget_rates
+from .ingest import ingest_analytics
+from .models import AnalyticsData, AnalyticsRollup, ExchangeRate, Promotion, ReportDay
+from .reports import build_report, destination_revenue
+from .rollups import aggregate_metric, rebuild_rollups, refresh_rollups
+
+
+def record(day, value, metric=MetricType.PAGE_VIEWS):
+    return AnalyticsData.objects.create(
+        metric_type=metric, value=value, date_recorded=day
+    )
+
+
+def rollups():
+    return {
+        (rollup.period, rollup.period_start): (
+            rollup.value_sum,
+            rollup.value_count,
+            rollup.value_min,
+            rollup.value_max,
+        )
+        for rollup in AnalyticsRollup.objects.all()
+    }
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        record(date(2030, 1, 30), 10)
+        record(date(2030, 2, 3), 5)
+        self.march = record(date(2030, 3, 4), 7)
+
+    def test_daily_rows_roll_up_into_every_period(self):
+        found = rollups()
+        self.assertEqual(
+            found[(RollupPeriod.YEAR, date(2030, 1, 1))], (Decimal("22"), 3, 5, 10)
+        )
+        self.assertEqual(
+            found[(RollupPeriod.MONTH, date(2030, 2, 1))], (Decimal("5"), 1, 5, 5)
+        )
+        # 2030-01-30 and 2030-02-03 share the ISO week starting 2030-01-28
+        self.assertEqual(
+            found[(RollupPeriod.WEEK, date(2030, 1, 28))], (Decimal("15"), 2, 5, 10)
+        )
+
+    def test_year_follows_month_changes(self):
+        self.march.value = 1
+        self.march.save()
+        record(date(2030, 2, 20), 3)
+        self.assertEqual(
+            rollups()[(RollupPeriod.YEAR, date(2030, 1, 1))], (Decimal("19"), 4, 1, 10)
+        )
+
+        self.march.delete()
+        found = rollups()
+        self.assertNotIn((RollupPeriod.MONTH, date(2030, 3, 1)), found)
+        self.assertEqual(
+            found[(RollupPeriod.YEAR, date(2030, 1, 1))], (Decimal("18"), 3, 3, 10)
+        )
+
+    def test_refresh_matches_rebuild(self):
+        record(date(2031, 6, 1), 4)
+        refreshed = rollups()
+        rebuild_rollups()
+        self.assertEqual(rollups(), refreshed)
+
+    def test_aggregate_metric_reads_whole_periods_and_edges(self):
+        summary = aggregate_metric(
+            MetricType.PAGE_VIEWS, date(2030, 1, 30), date(2030, 12, 31)
+        )
+        self.assertEqual((summary["sum"], summary["count"]), (Decimal("22"), 3))
+        self.assertEqual((summary["min"], summary["max"]), (5, 10))
+
+    def test_refresh_handles_more_buckets_than_one_query_can_name(self):
+        keys = [
+            (f"destination:{pk}", MetricType.PAGE_VIEWS, date(2030, 1, 7))
+            for pk in range(1, 1501)
+        ]
+        self.assertEqual(refresh_rollups(keys), 0)
+
+    def test_long_ranges_read_one_condition_per_period(self):
+        for year in range(2010, 2030):
+            record(date(year, 6, 1), 1)
+        summary = aggregate_metric(
+            MetricType.PAGE_VIEWS, date(2010, 1, 1), date(2029, 12, 31)
+        )
+        self.assertEqual(summary["count"], 20)
+
+
+class PromotionCounterTests(TestCase):
+    def setUp(self):
+        self.promotion = Promotion.objects.create(
+            promotion_type=PromotionType.FEATURED,
+            title="Dry season",
+            price=50,
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=30),
+        )
+
+    def record(self, buffer):
+        buffer.increment(self.promotion.pk, "impressions", 3)
+        buffer.increment(self.promotion.pk, "clicks")
+
+    def assertCountedOnce(self, buffer, ack):
+        seen = []
+
+        def check_then_ack():
+            self.promotion.refresh_from_db()
+            with mock.patch.object(counters, "get_buffer", return_value=buffer):
+                seen.append(self.promotion.live_counts)
+            ack()
+
+        with mock.patch.object(buffer, "ack", check_then_ack):
+            self.assertEqual(flush_counters(buffer), 1)
+        self.assertEqual(seen, [{"impressions": 3, "clicks": 1, "conversions": 0}])
+        self.assertEqual(buffer.pending(self.promotion.pk), Counter())
+
+    def test_flush_applies_increments_and_counts_them_once(self):
+        buffer = LocalCounterBuffer()
+        self.record(buffer)
+        self.assertEqual(buffer.pending(self.promotion.pk)["impressions"], 3)
+        self.assertCountedOnce(buffer, buffer.ack)
+        self.assertEqual((self.promotion.impressions, self.promotion.clicks), (3, 1))
+
+    def test_failed_flush_keeps_the_batch_pending(self):
+        buffer = LocalCounterBuffer()
+        self.record(buffer)
+        with mock.patch.object(
+            Promotion.objects, "filter", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            flush_counters(buffer)
+        buffer.increment(self.promotion.pk, "clicks")
+        self.assertEqual(
+            buffer.pending(self.promotion.pk),
+            Counter({"impressions": 3, "clicks": 2}),
+        )
+        flush_counters(buffer)
+        self.promotion.refresh_from_db()
+        self.assertEqual((self.promotion.impressions, self.promotion.clicks), (3, 1))
+        flush_counters(buffer)
+        self.promotion.refresh_from_db()
+        self.assertEqual((self.promotion.impressions, self.promotion.clicks), (3, 2))
+
+    @skipUnless(fakeredis, "needs fakeredis")
+    def test_redis_buffer_counts_a_committed_batch_once(self):
+        buffer = RedisCounterBuffer("redis://localhost/0")
+        buffer._redis = fakeredis.FakeRedis()
+        self.record(buffer)
+        self.assertEqual(buffer.pending(self.promotion.pk)["clicks"], 1)
+        self.assertCountedOnce(buffer, buffer.ack)
+
+
+class IngestTests(TestCase):
+    def test_counts_rows_written_not_records_read(self):
+        records = [
+            {"metric_type": "page_views", "value": value, "date": "2030-01-01"}
+            for value in (3, 4)
+        ]
+        records.append({"metric_type": "users", "value": 1, "date": "2030-01-01"})
+        source = io.StringIO("".join(json.dumps(record) + "\n" for record in records))
+
+        result = ingest_analytics(source, format="jsonl", batch_size=10)
+        self.assertEqual((result.rows, result.duplicates), (2, 1))
+        self.assertEqual(
+            AnalyticsData.objects.get(metric_type=MetricType.PAGE_VIEWS).value,
+            Decimal("4"),
+        )
+
+
+class CurrencyTests(TestCase):
+    def setUp(self):
+        forget_rates()
+        self.service = make_service()
+        self.day = timezone.localdate() - timedelta(days=2)
+        ExchangeRate.objects.create(
+            currency=Currency.EUR, date=self.day, rate=Decimal("1.1")
+        )
+
+    def pay(self, amount, currency):
+        completed = timezone.now() - timedelta(days=2)
+        return Payment.objects.create(
+            booking=make_booking(self.service, currency=currency),
+            amount=amount,
+            currency=currency,
+            method=PaymentMethod.CREDIT_CARD,
+            status=PaymentStatus.COMPLETED,
+            completed_at=completed,
+        )
+
+    def test_rates_apply_from_their_day_and_before_the_first(self):
+        ExchangeRate.objects.create(
+            currency=Currency.EUR,
+            date=self.day + timedelta(days=1),
+            rate=Decimal("1.2"),
+        )
+        self.assertEqual(convert(10, Currency.EUR, self.day), Decimal("11.00"))
+        self.assertEqual(
+            convert(10, Currency.EUR, self.day - timedelta(days=30)), Decimal("11.00")
+        )
+        self.assertEqual(
+            convert(10, Currency.EUR, self.day + timedelta(days=5)), Decimal("12.00")
+        )
+        self.assertEqual(convert(10, Currency.USD, self.day), Decimal("10.00"))
+
+    def test_unrated_currencies_are_reported_separately(self):
+        self.pay(100, Currency.EUR)
+        self.pay(50, Currency.USD)
+        self.pay(1000, Currency.KES)
+        destination = self.service.destination_id
+
+        revenue = destination_revenue(self.day, self.day)
+        self.assertEqual(revenue["revenue"], {destination: Decimal("160.00")})
+        self.assertEqual(
+            revenue["unconverted"], {destination: {Currency.KES: Decimal("1000.00")}}
+        )
+        self.assertEqual(revenue["incomplete_currencies"], [Currency.KES])
+
+        report = build_report(self.day, self.day)
+        self.assertEqual(report["totals"]["payment_amount"], "160.00")
+        self.assertEqual(
+            report["unconverted"][Currency.KES]["payment_amount"], "1000.00"
+        )
+        self.assertEqual(report["incomplete_currencies"], [Currency.KES])
+        self.assertFalse(ReportDay.objects.exists())
+
+    def test_payments_fall_on_the_day_they_completed(self):
+        self.pay(100, Currency.USD)
+        next_day = self.pay(40, Currency.USD)
+        Payment.objects.filter(pk=next_day.pk).update(
+            completed_at=next_day.completed_at + timedelta(days=1)
+        )
+        unfinished = self.pay(7, Currency.USD)
+        Payment.objects.filter(pk=unfinished.pk).update(
+            completed_at=None, created_at=unfinished.completed_at
+        )
+
+        revenue = destination_revenue(self.day, self.day)
+        self.assertEqual(
+            revenue["revenue"], {self.service.destination_id: Decimal("107.00")}
+        )
+        report = build_report(self.day, self.day)
+        self.assertEqual(report["totals"]["payment_amount"], "107.00")
+
+    def test_report_days_are_cached_once_every_rate_is_known(self):
+        self.pay(1000, Currency.KES)
+        build_report(self.day, self.day)
+        ExchangeRate.objects.create(
+            currency=Currency.KES, date=self.day, rate=Decimal("0.0077")
+        )
+
+        report = build_report(self.day, self.day)
+        self.assertEqual(report["totals"]["payment_amount"], "7.70")
+        self.assertEqual(report["incomplete_currencies"], [])
+        self.assertEqual(report["unconverted"], {})
+        self.assertTrue(ReportDay.objects.filter(date=self.day).exists())
+        self.assertEqual(
+            destination_revenue(self.day, self.day)["incomplete_currencies"], []
+        )
+
+
+class GenerateReportCommandTests(SimpleTestCase):
+    def test_rejects_malformed_and_impossible_dates(self):
+        for args in (
+            ["--date", "2030-13-01"],
+            ["--type", "custom", "--start", "2030-02-30", "--end", "2030-03-01"],
+            ["--type", "custom", "--start", "2030-02-01", "--end", "soon"],
+            ["--type", "custom", "--start", "2030-02-02", "--end", "2030-02-01"],
+        ):
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command("generate_report", *args)
+
+
+class RebuildRollupsCommandTests(SimpleTestCase):
+    def test_rejects_malformed_and_impossible_dates(self):
+        for args in (
+            ["--start", "2030-13-01"],
+            ["--end", "2030-02-30"],
+            ["--start", "2030-02-02", "--end", "2030-02-01"],
+        ):
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command("rebuild_analytics_rollups", *args)
@@ -1,10 +1,20 @@
 from django.contrib import admin
 
-from .models import Booking, Package, PackageService, Payment, Review
+from utils.admin import LargeTableAdminMixin
+
+from .models import (
+    Booking,
+    Package,
+    PackageService,
+    Payment,
+    PayoutLineItem,
+    PayoutStatement,
+    Review,
+)
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "confirmation_code",
         "tourist",
@@ -30,7 +40,7 @@ class BookingAdmin(admin.ModelAdmin):
         "total_guests",
     ]
     raw_id_fields = ["tourist", "service"]
-    date_hierarchy = "service_date"
+    list_select_related = ["service__provider"]
 
     fieldsets = (
         (
@@ -90,7 +100,7 @@ class BookingAdmin(admin.ModelAdmin):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "booking",
         "amount",
@@ -109,6 +119,7 @@ class PaymentAdmin(admin.ModelAdmin):
         "provider_payout",
     ]
     raw_id_fields = ["booking"]
+    list_select_related = ["booking__tourist", "booking__service"]
 
     fieldsets = (
         (
@@ -159,12 +170,12 @@ class PackageServiceInline(admin.TabularInline):
 
 
 @admin.register(Package)
-class PackageAdmin(admin.ModelAdmin):
+class PackageAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "name",
         "destination",
         "duration_days",
-        "final_price",
+        "effective_price",
         "is_active",
         "is_featured",
     ]
@@ -225,12 +236,13 @@ class PackageAdmin(admin.ModelAdmin):
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["tourist", "service", "rating", "is_approved", "created_at"]
     list_filter = ["rating", "is_approved", "created_at"]
     search_fields = ["tourist__username", "service__name", "comment"]
     readonly_fields = ["booking", "created_at", "updated_at", "average_rating"]
     raw_id_fields = ["tourist", "service", "booking"]
+    list_select_related = ["service__provider"]
 
     fieldsets = (
         (
@@ -263,3 +275,52 @@ class ReviewAdmin(admin.ModelAdmin):
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
+
+
+class PayoutLineItemInline(admin.TabularInline):
+    model = PayoutLineItem
+    fields = ["payment", "kind", "amount", "commission_amount", "payout_amount"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PayoutStatement)
+class PayoutStatementAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = [
+        "provider",
+        "period_start",
+        "period_end",
+        "currency",
+        "payment_count",
+        "refund_count",
+        "payout_amount",
+        "created_at",
+    ]
+    list_filter = ["currency", "period_end", "created_at"]
+    search_fields = ["provider__company_name", "settlement_id"]
+    readonly_fields = [
+        "settlement_id",
+        "provider",
+        "currency",
+        "period_start",
+        "period_end",
+        "payment_count",
+        "refund_count",
+        "gross_amount",
+        "refunded_amount",
+        "commission_amount",
+        "payout_amount",
+        "created_at",
+    ]
+    list_select_related = ["provider"]
+    inlines = [PayoutLineItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
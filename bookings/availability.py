@@ -0,0 +1,102 @@
+"""
+Start-date availability for Packages.
+
+A package starting on day S needs each of its PackageService rows on
+S + day_number - 1. package_calendar() sizes the window from the itinerary's
+last day, then reads the itinerary and, through a filtered LEFT JOIN, every
+ServiceAvailability row the window can touch in a single query, and checks
+each candidate start date in memory: a date is feasible when every itinerary
+service has room for the party on its day. The service with the least room is
+reported as the limiting one.
+
+Rows come from the ServiceAvailability index, so inactive services, closed
+inventory and sold-out days all read as no room.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.db.models import FilteredRelation, Max, Q
+
+from .models import Package, PackageService
+
+ONE_DAY = timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class PackageStart:
+    date: date
+    available: bool
+    capacity: int  # largest party that could start on this date
+    limiting_service_id: int = None
+
+
+def _package(package):
+    if isinstance(package, Package):
+        return package
+    return Package.objects.only("duration_days", "max_capacity").get(pk=package)
+
+
+def package_calendar(package, start_date, end_date, party_size=1):
+    """
+    [PackageStart] for every start date from `start_date` to `end_date`
+    inclusive. Two queries for a Package instance (three given its id).
+    """
+    package = _package(package)
+    # duration_days is descriptive: the itinerary may run past it
+    last_day_number = PackageService.objects.filter(package=package).aggregate(
+        last=Max("day_number")
+    )["last"]
+    days = max(package.duration_days, last_day_number or 0, 1)
+    last_day = end_date + timedelta(days=days - 1)
+    rows = (
+        PackageService.objects.filter(package=package)
+        .annotate(
+            slot=FilteredRelation(
+                "service__availability_index",
+                condition=Q(
+                    service__availability_index__date__gte=start_date,
+                    service__availability_index__date__lte=last_day,
+                    service__availability_index__is_bookable=True,
+                ),
+            )
+        )
+        .values_list("day_number", "service_id", "slot__date", "slot__remaining_slots")
+    )
+
+    itinerary = set()  # (service id, day offset)
+    room = defaultdict(dict)  # service id -> {date: remaining slots}
+    for day_number, service_id, day, remaining in rows:
+        itinerary.add((service_id, day_number - 1))
+        if day is not None:
+            room[service_id][day] = remaining
+
+    calendar = []
+    start = start_date
+    while start <= end_date:
+        least, limiting = None, None
+        for service_id, offset in itinerary:
+            remaining = room[service_id].get(start + timedelta(days=offset), 0)
+            if least is None or remaining < least:
+                least, limiting = remaining, service_id
+        capacity = min(package.max_capacity, least) if itinerary else 0
+        calendar.append(
+            PackageStart(
+                date=start,
+                available=capacity >= party_size,
+                capacity=capacity,
+                limiting_service_id=limiting,
+            )
+        )
+        start += ONE_DAY
+    return calendar
+
+
+def available_start_dates(package, start_date, end_date, party_size=1):
+    """Dates from `start_date` to `end_date` the party can start the package"""
+    return [
+        start.date
+        for start in package_calendar(package, start_date, end_date, party_size)
+        if start.available
+    ]
@@ -0,0 +1,37 @@
+"""
+Booking creation.
+
+create_booking() is the entry point for new bookings: it prices the booking
+from the service and the day's inventory (services.pricing.price_booking) and
+refuses one beyond the provider's monthly plan limit (see
+services.entitlements) before the row is written. Booking.save() itself never
+checks the quota, so internal saves, fixtures and signal-driven saves cannot
+fail on it.
+"""
+
+from services.models import TourService
+from services.pricing import price_booking
+
+from .models import Booking
+
+
+def create_booking(service, tourist, service_date, service_time, **fields):
+    """
+    Create a Booking of `service` (a TourService or its id), with its
+    amounts set from the quote for its date and guests. Raises
+    ValidationError when the provider has used up its plan's bookings for
+    the month.
+    """
+    if not isinstance(service, TourService):
+        service = TourService.objects.get(pk=service)
+    booking = Booking(
+        service=service,
+        tourist=tourist,
+        service_date=service_date,
+        service_time=service_time,
+        **fields,
+    )
+    price_booking(booking)
+    booking.check_booking_quota()
+    booking.save()
+    return booking
@@ -0,0 +1,230 @@
+"""
+Collision-free booking confirmation codes.
+
+Each code is a 60-bit value built from a time-ordered sequence
+(seconds since CODE_EPOCH | node slot | per-second counter), which is unique by
+construction, passed through a keyed Feistel permutation so consecutive codes
+look random, and rendered as 12 Crockford base32 characters (no I, L, O, U).
+The permutation is a bijection, so distinct inputs can never collide and no
+database round trip is needed.
+
+Node slots keep processes apart: BOOKING_CODE_NODE_ID pins one explicitly,
+otherwise each process leases a free slot in the shared cache. A per-process
+cache (locmem, dummy) cannot keep processes apart, so they fall back to a
+pid/host hash, which may collide; `check --deploy` warns about that setup.
+"""
+
+import atexit
+import hashlib
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 12
+
+CODE_EPOCH = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+TIME_BITS = 31  # ~68 years of seconds
+NODE_BITS = 10  # 1024 concurrent processes
+COUNTER_BITS = 19  # 524k codes per process per second before borrowing ahead
+HALF_BITS = (TIME_BITS + NODE_BITS + COUNTER_BITS) // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+FEISTEL_ROUNDS = 4
+
+NODE_COUNT = 1 << NODE_BITS
+NODE_LEASE_KEY = "booking-codes:node"
+NODE_LEASE_SECONDS = 4 * 3600
+NODE_LEASE_RENEW_SECONDS = 1800
+
+# Backends whose contents other processes cannot see
+PROCESS_LOCAL_CACHES = (DummyCache, LocMemCache)
+
+
+def shared_cache():
+    """Whether leases taken in the default cache are visible to every process"""
+    return not isinstance(caches["default"], PROCESS_LOCAL_CACHES)
+
+
+class ConfirmationCodeGenerator:
+    """Thread-safe, fork-aware generator of unique confirmation codes"""
+
+    def __init__(self, key, node_id=None):
+        self._round_keys = [
+            hashlib.blake2b(key, person=f"round-{i}".encode()).digest()[:32]
+            for i in range(FEISTEL_ROUNDS)
+        ]
+        self._fixed_node = node_id
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._second = 0
+        self._counter = 0
+        self._lease_token = uuid.uuid4().hex
+        self._node = (
+            self._fixed_node % NODE_COUNT
+            if self._fixed_node is not None
+            else self._claim_node()
+        )
+        self._renew_at = time.monotonic() + NODE_LEASE_RENEW_SECONDS
+        atexit.register(self._release_lease)
+
+    def _claim_node(self):
+        if not shared_cache():
+            return self._hash_node()
+        try:
+            cache.add(NODE_LEASE_KEY, 0, timeout=None)
+            start = cache.incr(NODE_LEASE_KEY)
+            for offset in range(NODE_COUNT):
+                slot = (start + offset) % NODE_COUNT
+                if cache.add(
+                    f"{NODE_LEASE_KEY}:{slot}", self._lease_token, NODE_LEASE_SECONDS
+                ):
+                    return slot
+        except Exception:
+            # Shared cache unreachable: use a hash
+            pass
+        return self._hash_node()
+
+    def _hash_node(self):
+        seed = f"{socket.gethostname()}:{self._pid}".encode()
+        return int.from_bytes(hashlib.blake2b(seed).digest()[:4], "big") % NODE_COUNT
+
+    def _renew_lease(self):
+        self._renew_at = time.monotonic() + NODE_LEASE_RENEW_SECONDS
+        if self._fixed_node is not None:
+            return
+        key = f"{NODE_LEASE_KEY}:{self._node}"
+        try:
+            if cache.get(key) == self._lease_token:
+                cache.touch(key, NODE_LEASE_SECONDS)
+                return
+        except Exception:
+            return
+        # Lease lost (expired and possibly re-claimed): move to a fresh slot
+        self._node = self._claim_node()
+        self._counter = 0
+
+    def _release_lease(self):
+        if self._fixed_node is not None or self._pid != os.getpid():
+            return
+        key = f"{NODE_LEASE_KEY}:{self._node}"
+        try:
+            if cache.get(key) == self._lease_token:
+                cache.delete(key)
+        except Exception:
+            pass
+
+    def _reserve(self, count):
+        """Reserve `count` sequence values; returns (node, second, first counter)"""
+        if self._pid != os.getpid():
+            self._reset()
+        if time.monotonic() >= self._renew_at:
+            self._renew_lease()
+
+        now = int(time.time()) - CODE_EPOCH
+        if now > self._second:
+            self._second, self._counter = now, 0
+        elif self._counter + count > 1 << COUNTER_BITS:
+            # Counter exhausted for this second: borrow the next one
+            self._second, self._counter = self._second + 1, 0
+
+        first = self._counter
+        self._counter += count
+        return self._node, self._second, first
+
+    def _sequence(self, count):
+        with self._lock:
+            chunks = []
+            while count:
+                take = min(count, 1 << COUNTER_BITS)
+                chunks.append((self._reserve(take), take))
+                count -= take
+        for (node, second, first), take in chunks:
+            prefix = (second << NODE_BITS | node) << COUNTER_BITS
+            for counter in range(first, first + take):
+                yield prefix | counter
+
+    def _permute(self, value):
+        left, right = value >> HALF_BITS, value & HALF_MASK
+        for round_key in self._round_keys:
+            digest = hashlib.blake2b(
+                right.to_bytes(4, "big"), key=round_key, digest_size=4
+            ).digest()
+            left, right = right, left ^ (int.from_bytes(digest, "big") & HALF_MASK)
+        return left << HALF_BITS | right
+
+    @staticmethod
+    def encode(value):
+        chars = []
+        for _ in range(CODE_LENGTH):
+            value, index = divmod(value, 32)
+            chars.append(ALPHABET[index])
+        return "".join(reversed(chars))
+
+    def values(self, count):
+        """Permuted 60-bit code values (what the codes encode)"""
+        return [self._permute(value) for value in self._sequence(count)]
+
+    def generate(self):
+        return self.encode(self.values(1)[0])
+
+    def generate_many(self, count):
+        return [self.encode(value) for value in self.values(count)]
+
+
+_generator = None
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        node_id = getattr(settings, "BOOKING_CODE_NODE_ID", None)
+        _generator = ConfirmationCodeGenerator(
+            key=settings.SECRET_KEY.encode(),
+            node_id=int(node_id) if node_id not in (None, "") else None,
+        )
+    return _generator
+
+
+def check_node_slots(app_configs=None, **kwargs):
+    if getattr(settings, "BOOKING_CODE_NODE_ID", None) not in (None, ""):
+        return []
+    if shared_cache():
+        return []
+    return [
+        checks.Warning(
+            "Booking code node slots are leased from a per-process cache, so "
+            "processes fall back to a pid/host hash and may issue the same codes.",
+            hint="Configure a shared cache (Redis) or set BOOKING_CODE_NODE_ID "
+            "per process.",
+            id="bookings.W001",
+        )
+    ]
+
+
+def generate_confirmation_code():
+    return get_generator().generate()
+
+
+def generate_confirmation_codes(count):
+    """Codes for a batch of bookings, reserved from the sequence in one step"""
+    return get_generator().generate_many(count)
+
+
+def assign_confirmation_codes(bookings):
+    """Fill in missing codes on unsaved bookings, e.g. before bulk_create()"""
+    missing = [booking for booking in bookings if not booking.confirmation_code]
+    for booking, code in zip(missing, generate_confirmation_codes(len(missing))):
+        booking.confirmation_code = code
+    return bookings
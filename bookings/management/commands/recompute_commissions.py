@@ -0,0 +1,42 @@
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.settlement import recompute_commissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute commission and provider payout of unsettled payments, "
+        "optionally at a new commission rate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rate", help="New commission percentage (e.g. 12.50); default keeps it"
+        )
+        parser.add_argument(
+            "--provider",
+            type=int,
+            action="append",
+            dest="provider_ids",
+            help="Limit to a provider id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        rate = options["rate"]
+        if rate is not None:
+            try:
+                rate = Decimal(rate)
+            except InvalidOperation:
+                raise CommandError(f"Invalid rate {rate!r}")
+            if not 0 <= rate <= 100:
+                raise CommandError("--rate must be between 0 and 100")
+
+        started = time.perf_counter()
+        updated = recompute_commissions(rate, provider_ids=options["provider_ids"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Recomputed {updated} payments in {elapsed:.1f}s")
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.settlement import settle_period
+from utils.dates import date_option
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle unsettled payments and refunds for a period into immutable "
+        "provider payout statements"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="First day (YYYY-MM-DD)")
+        parser.add_argument("--end", required=True, help="Last day (YYYY-MM-DD)")
+        parser.add_argument(
+            "--provider",
+            type=int,
+            action="append",
+            dest="provider_ids",
+            help="Limit to a provider id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        start_date = date_option(options, "start")
+        end_date = date_option(options, "end")
+        if start_date > end_date:
+            raise CommandError("--start must not be after --end")
+
+        started = time.perf_counter()
+        statements = settle_period(start_date, end_date, options["provider_ids"])
+        elapsed = time.perf_counter() - started
+
+        for statement in statements:
+            self.stdout.write(
+                f"{statement.provider_id} {statement.currency}: "
+                f"{statement.payment_count} payments, "
+                f"{statement.refund_count} refunds, "
+                f"payout {statement.payout_amount}"
+            )
+        lines = sum(s.payment_count + s.refund_count for s in statements)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Issued {len(statements)} statements ({lines} line items) "
+                f"in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="hold_id",
+            field=models.CharField(
+                blank=True,
+                help_text=(
+                    "Capacity hold converted to booked slots once payment completes"
+                ),
+                max_length=80,
+            ),
+        ),
+    ]
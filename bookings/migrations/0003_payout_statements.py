@@ -0,0 +1,141 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0002_booking_hold_id"),
+        ("services", "0005_providerstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PayoutStatement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "settlement_id",
+                    models.UUIDField(
+                        db_index=True,
+                        editable=False,
+                        help_text="Settlement run that issued it",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.CharField(
+                        choices=[
+                            ("USD", "US Dollar"),
+                            ("EUR", "Euro"),
+                            ("GBP", "British Pound"),
+                            ("KES", "Kenyan Shilling"),
+                            ("TZS", "Tanzanian Shilling"),
+                            ("ZAR", "South African Rand"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("period_end", models.DateField()),
+                ("payment_count", models.PositiveIntegerField(default=0)),
+                ("refund_count", models.PositiveIntegerField(default=0)),
+                (
+                    "gross_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "refunded_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "commission_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "payout_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "provider",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="payout_statements",
+                        to="services.serviceprovider",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Payout Statement",
+                "verbose_name_plural": "Payout Statements",
+                "ordering": ["-period_end", "provider"],
+            },
+        ),
+        migrations.CreateModel(
+            name="PayoutLineItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("payment", "Payment"), ("refund", "Refund")],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "commission_amount",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("payout_amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="payout_line_items",
+                        to="bookings.payment",
+                    ),
+                ),
+                (
+                    "statement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="line_items",
+                        to="bookings.payoutstatement",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Payout Line Item",
+                "verbose_name_plural": "Payout Line Items",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="payoutstatement",
+            index=models.Index(
+                fields=["provider", "period_end"], name="bookings_pa_provide_f0c718_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="payoutlineitem",
+            unique_together={("payment", "kind")},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0003_payout_statements"),
+        ("services", "0005_providerstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["booking_date"], name="bookings_bo_booking_f34616_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["created_at"], name="bookings_pa_created_0175e9_idx"
+            ),
+        ),
+    ]
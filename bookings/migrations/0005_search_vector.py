@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The trigger utils.search.search_vector_sql() generated for the document
+# in bookings.search when this migration was written, frozen so that editing the
+# document later cannot change what this migration does.
+INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION bookings_package_search_vector()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english',
+                coalesce(NEW."name", '')
+            ), 'A') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."short_description", '')
+            ), 'B') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."description", '')
+            ), 'C') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."included_items", '')
+            ), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS bookings_package_search_vector
+    ON "bookings_package"
+    """,
+    """
+    CREATE TRIGGER bookings_package_search_vector
+    BEFORE INSERT OR UPDATE OF
+        "description",
+        "included_items",
+        "name",
+        "search_vector",
+        "short_description"
+    ON "bookings_package"
+    FOR EACH ROW EXECUTE FUNCTION bookings_package_search_vector()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS bookings_package_search_gin
+    ON "bookings_package" USING gin (search_vector)
+    """,
+    'UPDATE "bookings_package" SET search_vector = NULL',
+]
+UNINSTALL = [
+    """
+    DROP TRIGGER IF EXISTS bookings_package_search_vector
+    ON "bookings_package"
+    """,
+    "DROP FUNCTION IF EXISTS bookings_package_search_vector()",
+    "DROP INDEX IF EXISTS bookings_package_search_gin",
+]
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def install_trigger(apps, schema_editor):
+    _execute(schema_editor, INSTALL)
+
+
+def uninstall_trigger(apps, schema_editor):
+    _execute(schema_editor, UNINSTALL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0004_changelist_ordering_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="package",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(install_trigger, uninstall_trigger),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:02
+
+from decimal import Decimal
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+import utils.expressions
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0005_search_vector"),
+        ("destinations", "0003_geocell"),
+        ("services", "0007_geocell"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="package",
+            name="effective_discount_percentage",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.Case(
+                    models.When(
+                        models.Q(
+                            ("discounted_price__gt", 0),
+                            ("discounted_price__lt", models.F("total_price")),
+                            ("total_price__gt", 0),
+                        ),
+                        then=models.ExpressionWrapper(
+                            utils.expressions.DecimalDivide(
+                                django.db.models.expressions.CombinedExpression(
+                                    django.db.models.expressions.CombinedExpression(
+                                        models.F("total_price"),
+                                        "-",
+                                        models.F("discounted_price"),
+                                    ),
+                                    "*",
+                                    models.Value(Decimal("100")),
+                                ),
+                                "total_price",
+                            ),
+                            output_field=models.DecimalField(
+                                decimal_places=2, max_digits=5
+                            ),
+                        ),
+                    ),
+                    default=models.Value(Decimal("0")),
+                ),
+                output_field=models.DecimalField(decimal_places=2, max_digits=5),
+            ),
+        ),
+        migrations.AddField(
+            model_name="package",
+            name="effective_price",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.comparison.Coalesce(
+                    django.db.models.functions.comparison.NullIf(
+                        "discounted_price", models.Value(Decimal("0"))
+                    ),
+                    "total_price",
+                ),
+                output_field=models.DecimalField(decimal_places=2, max_digits=10),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="package",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["destination", "effective_price"],
+                name="bookings_package_price",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="package",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["destination", "effective_discount_percentage"],
+                name="bookings_package_discount",
+            ),
+        ),
+    ]
@@ -2,13 +2,23 @@ import uuid
 from decimal import Decimal
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.utils import timezone
 from django.utils.text import slugify
 
-from utils.enums import (BookingStatus, Currency, PaymentMethod, PaymentStatus,
-                         Rating)
+from utils.enums import (
+    BookingStatus,
+    Currency,
+    PaymentMethod,
+    PaymentStatus,
+    PayoutLineKind,
+    Rating,
+)
+from utils.expressions import DecimalDivide
 
 
 class Booking(models.Model):
@@ -67,6 +77,11 @@ class Booking(models.Model):
 
     # Confirmation
     confirmation_code = models.CharField(max_length=20, unique=True, blank=True)
+    hold_id = models.CharField(
+        max_length=80,
+        blank=True,
+        help_text="Capacity hold converted to booked slots once payment completes",
+    )
 
     # Timestamps
     confirmed_at = models.DateTimeField(null=True, blank=True)
@@ -84,6 +99,7 @@ class Booking(models.Model):
             models.Index(fields=["service_date"]),
             models.Index(fields=["status", "service_date"]),
             models.Index(fields=["confirmation_code"]),
+            models.Index(fields=["booking_date"]),
         ]
 
     def __str__(self):
@@ -91,6 +107,40 @@ class Booking(models.Model):
             f"{self.confirmation_code} - {self.tourist.username} - {self.service.name}"
         )
 
+    @property
+    def service_provider_id(self):
+        """The service's provider, without loading the service when not loaded"""
+        from services.models import TourService
+
+        if Booking.service.is_cached(self):
+            return self.service.provider_id
+        return (
+            TourService.objects.filter(pk=self.service_id)
+            .values_list("provider_id", flat=True)
+            .first()
+        )
+
+    def check_booking_quota(self):
+        """
+        Refuse a new booking beyond the provider's monthly plan limit. Run by
+        clean() (forms, the admin) and bookings.checkout.create_booking(), not
+        by save(), so internal saves and fixtures never fail on the quota.
+        """
+        from services.entitlements import can_accept_booking
+
+        if (
+            self._state.adding
+            and self.service_id
+            and not can_accept_booking(self.service_provider_id)
+        ):
+            raise ValidationError(
+                "This provider has reached the monthly booking limit of its plan."
+            )
+
+    def clean(self):
+        super().clean()
+        self.check_booking_quota()
+
     def save(self, *args, **kwargs):
         if not self.confirmation_code:
             self.confirmation_code = self.generate_confirmation_code()
@@ -99,11 +149,10 @@ class Booking(models.Model):
         super().save(*args, **kwargs)
 
     def generate_confirmation_code(self):
-        """Generate unique confirmation code"""
-        import random
-        import string
+        """Generate unique confirmation code (see bookings.codes)"""
+        from .codes import generate_confirmation_code
 
-        return "".join(random.choices(string.ascii_uppercase + string.digits, k=10))
+        return generate_confirmation_code()
 
     @property
     def total_guests(self):
@@ -206,6 +255,7 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=["status", "created_at"]),
             models.Index(fields=["payment_id"]),
+            models.Index(fields=["created_at"]),
         ]
 
     def __str__(self):
@@ -229,6 +279,67 @@ class Payment(models.Model):
         return self.status == PaymentStatus.REFUNDED
 
 
+class PackageQuerySet(models.QuerySet):
+    """Catalog filters on the stored effective price and discount columns"""
+
+    def active(self):
+        return self.filter(is_active=True)
+
+    def priced_between(self, min_price=None, max_price=None):
+        packages = self
+        if min_price is not None:
+            packages = packages.filter(effective_price__gte=min_price)
+        if max_price is not None:
+            packages = packages.filter(effective_price__lte=max_price)
+        return packages
+
+    def discounted(self, min_percentage=0):
+        """Packages at least `min_percentage` percent off (any discount by default)"""
+        if min_percentage:
+            return self.filter(effective_discount_percentage__gte=min_percentage)
+        return self.filter(effective_discount_percentage__gt=0)
+
+    def with_price_per_day(self):
+        days = Cast(NullIf("duration_days", 0), models.FloatField())
+        return self.annotate(
+            price_per_day=Cast(
+                models.ExpressionWrapper(
+                    models.F("effective_price") / days,
+                    output_field=models.FloatField(),
+                ),
+                models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+    def with_service_costs(self):
+        """
+        Annotate services_total (the included services' base prices bought
+        separately) and savings against the package's effective price
+        """
+        services_total = (
+            PackageService.objects.filter(package=models.OuterRef("pk"))
+            .values("package")
+            .annotate(total=models.Sum("service__base_price"))
+            .values("total")
+        )
+        return self.annotate(
+            services_total=Coalesce(
+                models.Subquery(services_total), models.Value(Decimal("0"))
+            ),
+            savings=models.F("services_total") - models.F("effective_price"),
+        )
+
+    def with_itinerary(self):
+        """Prefetch each package's PackageService rows and services as .itinerary"""
+        return self.prefetch_related(
+            models.Prefetch(
+                "packageservice_set",
+                queryset=PackageService.objects.select_related("service"),
+                to_attr="itinerary",
+            )
+        )
+
+
 class Package(models.Model):
     """
     Pre-packaged multi-service offerings
@@ -258,6 +369,37 @@ class Package(models.Model):
     currency = models.CharField(
         max_length=3, choices=Currency.choices, default=Currency.USD
     )
+    # final_price and discount_percentage, stored so listings can filter, sort
+    # and index on them (see PackageQuerySet)
+    effective_price = models.GeneratedField(
+        expression=Coalesce(
+            NullIf("discounted_price", models.Value(Decimal("0"))), "total_price"
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    effective_discount_percentage = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                models.Q(
+                    discounted_price__gt=0,
+                    total_price__gt=0,
+                    discounted_price__lt=models.F("total_price"),
+                ),
+                then=models.ExpressionWrapper(
+                    DecimalDivide(
+                        (models.F("total_price") - models.F("discounted_price"))
+                        * models.Value(Decimal("100")),
+                        "total_price",
+                    ),
+                    output_field=models.DecimalField(max_digits=5, decimal_places=2),
+                ),
+            ),
+            default=models.Value(Decimal("0")),
+        ),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+    )
 
     # Details
     duration_days = models.PositiveIntegerField()
@@ -277,10 +419,15 @@ class Package(models.Model):
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
 
+    # Full-text search, maintained by a PostgreSQL trigger (see utils.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PackageQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Package"
         verbose_name_plural = "Packages"
@@ -288,6 +435,16 @@ class Package(models.Model):
         indexes = [
             models.Index(fields=["slug"]),
             models.Index(fields=["is_active", "is_featured"]),
+            models.Index(
+                fields=["destination", "effective_price"],
+                condition=models.Q(is_active=True),
+                name="bookings_package_price",
+            ),
+            models.Index(
+                fields=["destination", "effective_discount_percentage"],
+                condition=models.Q(is_active=True),
+                name="bookings_package_discount",
+            ),
         ]
 
     def __str__(self):
@@ -408,3 +565,90 @@ class Review(models.Model):
         if self.cleanliness:
             ratings.append(self.cleanliness)
         return sum(ratings) / len(ratings) if ratings else 0
+
+
+class PayoutStatement(models.Model):
+    """
+    Immutable payout statement for one provider and currency, produced by a
+    settlement run (bookings.settlement) for a period
+    """
+
+    settlement_id = models.UUIDField(
+        db_index=True, editable=False, help_text="Settlement run that issued it"
+    )
+    provider = models.ForeignKey(
+        "services.ServiceProvider",
+        on_delete=models.PROTECT,
+        related_name="payout_statements",
+    )
+    currency = models.CharField(max_length=3, choices=Currency.choices)
+    period_start = models.DateField()
+    period_end = models.DateField()
+
+    # Totals of the line items
+    payment_count = models.PositiveIntegerField(default=0)
+    refund_count = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    commission_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payout_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Payout Statement"
+        verbose_name_plural = "Payout Statements"
+        ordering = ["-period_end", "provider"]
+        indexes = [
+            models.Index(fields=["provider", "period_end"]),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.provider} - {self.period_start} to {self.period_end} - "
+            f"{self.payout_amount} {self.currency}"
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Payout statements are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Payout statements are immutable")
+
+
+class PayoutLineItem(models.Model):
+    """
+    One payment (or refund of it) settled on a PayoutStatement. A payment is
+    settled at most once per kind, so re-running a settlement never pays twice.
+    """
+
+    statement = models.ForeignKey(
+        PayoutStatement, on_delete=models.PROTECT, related_name="line_items"
+    )
+    payment = models.ForeignKey(
+        Payment, on_delete=models.PROTECT, related_name="payout_line_items"
+    )
+    kind = models.CharField(max_length=10, choices=PayoutLineKind.choices)
+
+    # Negative for refunds
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    commission_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payout_amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Payout Line Item"
+        verbose_name_plural = "Payout Line Items"
+        unique_together = ["payment", "kind"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.payment_id} - {self.payout_amount}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Payout line items are immutable")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Payout line items are immutable")
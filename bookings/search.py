@@ -0,0 +1,29 @@
+"""
+Full-text search over Packages (see utils.search), read from a replica when
+one is usable (see utils.db) and loaded from the catalog cache (see
+utils.cache).
+"""
+
+from utils.cache import from_catalog
+from utils.db import on_replica
+from utils.search import SearchDocument, search
+
+from .models import Package
+
+PACKAGE_DOCUMENT = SearchDocument(
+    "bookings.Package",
+    {
+        "A": ["name"],
+        "B": ["short_description"],
+        "C": ["description"],
+        "D": ["included_items"],
+    },
+)
+
+
+def search_packages(query, destination=None, min_price=None, max_price=None, limit=20):
+    """Active packages matching `query`, best first (a list), each with `rank`"""
+    packages = on_replica(Package.objects.active()).priced_between(min_price, max_price)
+    if destination is not None:
+        packages = packages.filter(destination=destination)
+    return from_catalog(search(packages, PACKAGE_DOCUMENT, query, limit), "rank")
@@ -0,0 +1,246 @@
+"""
+Set-based commission settlement and provider payout statements.
+
+settle_period() settles every not-yet-settled payment completed, and every
+refund issued, in a period:
+
+1. one grouped query finds the (provider, currency) pairs with work and one
+   bulk insert creates their PayoutStatements, tagged with a settlement id;
+2. one INSERT ... SELECT per kind writes the line items straight from the
+   payments (refunds as negative lines, with the commission returned pro rata);
+3. one UPDATE fills in each statement's totals from its line items.
+
+No payment is loaded into Python or saved, so a million payments settle in a
+handful of statements. A unique (payment, kind) line item means a payment is
+paid out, and a refund clawed back, exactly once however often settlement runs.
+
+recompute_commissions() rewrites commission/payout for unsettled payments with
+one UPDATE when a commission rate changes.
+"""
+
+import uuid
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Round, TruncDate
+from django.utils import timezone
+
+from utils.enums import PaymentStatus, PayoutLineKind
+
+from .models import Payment, PayoutLineItem, PayoutStatement
+
+LINE_COLUMNS = (
+    "statement_id",
+    "payment_id",
+    "kind",
+    "amount",
+    "commission_amount",
+    "payout_amount",
+)
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+# Multiply by a fraction rather than dividing by 100: SQLite stores whole
+# amounts and rates as integers and would divide them as integers
+PERCENT = Decimal("0.01")
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _unsettled(kind, start_date, end_date, provider_ids):
+    """Payments with a `kind` line due in the period and not yet settled"""
+    start, end = _day_start(start_date), _day_start(end_date + timedelta(days=1))
+    if kind == PayoutLineKind.PAYMENT:
+        payments = Payment.objects.annotate(
+            settled_on=Coalesce("completed_at", "created_at")
+        ).filter(status__in=[PaymentStatus.COMPLETED, PaymentStatus.REFUNDED])
+    else:
+        payments = Payment.objects.annotate(
+            settled_on=Coalesce("refund_date", "created_at")
+        ).filter(refund_amount__gt=0)
+
+    payments = payments.filter(settled_on__gte=start, settled_on__lt=end).filter(
+        ~Exists(PayoutLineItem.objects.filter(payment=OuterRef("pk"), kind=kind))
+    )
+    if provider_ids is not None:
+        payments = payments.filter(booking__service__provider_id__in=provider_ids)
+    return payments
+
+
+def _line_values(kind):
+    """amount/commission/payout expressions of a line item of `kind`"""
+    if kind == PayoutLineKind.PAYMENT:
+        return {
+            "line_amount": F("amount"),
+            "line_commission": F("commission_amount"),
+            "line_payout": F("provider_payout"),
+        }
+    commission = Round(F("refund_amount") * F("commission_rate") * Value(PERCENT), 2)
+    return {
+        "line_amount": -F("refund_amount"),
+        "line_commission": -commission,
+        "line_payout": commission - F("refund_amount"),
+    }
+
+
+def _insert_lines(kind, payments, settlement_id):
+    """INSERT ... SELECT the line items of `kind` for the unsettled payments"""
+    statement = PayoutStatement.objects.filter(
+        settlement_id=settlement_id,
+        provider_id=OuterRef("booking__service__provider_id"),
+        currency=OuterRef("currency"),
+    ).values("pk")[:1]
+    select = (
+        payments.annotate(
+            line_statement=Subquery(statement),
+            line_payment=F("pk"),
+            line_kind=Value(kind),
+            **_line_values(kind),
+        )
+        .order_by()
+        .values_list(
+            "line_statement",
+            "line_payment",
+            "line_kind",
+            "line_amount",
+            "line_commission",
+            "line_payout",
+        )
+    )
+    sql, params = select.query.sql_with_params()
+    table = PayoutLineItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {table} ({', '.join(LINE_COLUMNS)}) {sql}", params)
+        return cursor.rowcount
+
+
+def _line_total(aggregate, **filters):
+    """Subquery of an aggregate over each statement's line items"""
+    lines = (
+        PayoutLineItem.objects.filter(statement=OuterRef("pk"), **filters)
+        .values("statement")
+        .annotate(total=aggregate)
+        .values("total")
+    )
+    output = IntegerField() if isinstance(aggregate, Count) else MONEY
+    return Coalesce(Subquery(lines), Value(0), output_field=output)
+
+
+def settle_period(start_date, end_date, provider_ids=None):
+    """
+    Settle payments and refunds falling in [start_date, end_date]. Returns the
+    PayoutStatements issued (empty if there was nothing left to settle).
+    """
+    settlement_id = uuid.uuid4()
+    kinds = (PayoutLineKind.PAYMENT, PayoutLineKind.REFUND)
+
+    with transaction.atomic():
+        pending = {
+            kind: _unsettled(kind, start_date, end_date, provider_ids) for kind in kinds
+        }
+        pairs = set()
+        for payments in pending.values():
+            pairs.update(
+                payments.values_list(
+                    "booking__service__provider_id", "currency"
+                ).distinct()
+            )
+        if not pairs:
+            return []
+
+        PayoutStatement.objects.bulk_create(
+            [
+                PayoutStatement(
+                    settlement_id=settlement_id,
+                    provider_id=provider_id,
+                    currency=currency,
+                    period_start=start_date,
+                    period_end=end_date,
+                )
+                for provider_id, currency in sorted(pairs)
+            ]
+        )
+        for kind, payments in pending.items():
+            _insert_lines(kind, payments, settlement_id)
+
+        statements = PayoutStatement.objects.filter(settlement_id=settlement_id)
+        statements.update(
+            payment_count=_line_total(Count("id"), kind=PayoutLineKind.PAYMENT),
+            refund_count=_line_total(Count("id"), kind=PayoutLineKind.REFUND),
+            gross_amount=_line_total(Sum("amount"), kind=PayoutLineKind.PAYMENT),
+            refunded_amount=-_line_total(Sum("amount"), kind=PayoutLineKind.REFUND),
+            commission_amount=_line_total(Sum("commission_amount")),
+            payout_amount=_line_total(Sum("payout_amount")),
+        )
+    return list(statements)
+
+
+def commission_updates(rate=None):
+    """commission_rate/commission_amount/provider_payout update expressions"""
+    updates = {}
+    factor = F("commission_rate") * Value(PERCENT)
+    if rate is not None:
+        updates["commission_rate"] = Value(Decimal(rate))
+        factor = Value(Decimal(rate) * PERCENT)
+    commission = Round(F("amount") * factor, 2)
+    updates["commission_amount"] = commission
+    updates["provider_payout"] = F("amount") - commission
+    return updates
+
+
+def recompute_commissions(rate=None, provider_ids=None, payments=None):
+    """
+    Recompute commission_amount/provider_payout (setting commission_rate to
+    `rate` when given) for payments not yet settled, in one UPDATE. Returns
+    the number of payments updated. Provider revenue stats are rebuilt
+    and the cached report days they fall on dropped afterwards, since
+    .update() bypasses the Payment signals.
+    """
+    from analytics.reports import invalidate_report_days
+    from services.stats import rebuild_provider_stats
+
+    payments = Payment.objects.all() if payments is None else payments
+    payments = payments.filter(
+        ~Exists(
+            PayoutLineItem.objects.filter(
+                payment=OuterRef("pk"), kind=PayoutLineKind.PAYMENT
+            )
+        )
+    )
+    if provider_ids is not None:
+        payments = payments.filter(booking__service__provider_id__in=provider_ids)
+
+    affected = set(
+        payments.annotate(day=TruncDate(Coalesce("completed_at", "created_at")))
+        .values_list(
+            "day",
+            "booking__service__destination_id",
+            "booking__service__provider_id",
+        )
+        .order_by()
+        .distinct()
+    )
+    with transaction.atomic():
+        updated = Payment.objects.filter(pk__in=payments.values("pk")).update(
+            **commission_updates(rate)
+        )
+        providers = {provider_id for _, _, provider_id in affected}
+        rebuild_provider_stats(providers)
+        invalidate_report_days(
+            {day for day, _, _ in affected},
+            destination_ids={destination_id for _, destination_id, _ in affected},
+            provider_ids=providers,
+        )
+    return updated
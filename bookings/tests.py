@@ -1,3 +1,277 @@
-from django.test import TestCase
+import multiprocessing
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from services.models import Inventory, TourService
+from services.tests import DAY, make_booking, make_service
+from utils.enums import PaymentMethod, PaymentStatus
+
+from .availability import available_start_dates, package_calendar
+from .codes import ALPHABET, CODE_LENGTH, ConfirmationCodeGenerator, check_node_slots
+from .models import Package, PackageService, Payment
+from .settlement import recompute_commissions, settle_period
+
+KEY = b"test-key"
+FILE_CACHE = "django.core.cache.backends.filebased.FileBasedCache"
+LOCMEM_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+
+
+def _generate_in_process(generator, claiming, results, count):
+    # Lease the node slot one process at a time, then generate concurrently
+    with claiming:
+        codes = [generator.generate()]
+    codes += generator.generate_many(count - 1)
+    results.put(codes)
+
+
+class ConfirmationCodeTests(SimpleTestCase):
+    def test_codes_are_well_formed(self):
+        code = ConfirmationCodeGenerator(KEY, node_id=1).generate()
+        self.assertEqual(len(code), CODE_LENGTH)
+        self.assertTrue(set(code) <= set(ALPHABET))
+
+    def test_generators_on_different_nodes_never_collide(self):
+        codes = []
+        for node in range(4):
+            generator = ConfirmationCodeGenerator(KEY, node_id=node)
+            codes += generator.generate_many(5000)
+            codes += [generator.generate() for _ in range(500)]
+        self.assertEqual(len(codes), len(set(codes)))
+
+    def test_processes_sharing_a_cache_never_collide(self):
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {"default": {"BACKEND": FILE_CACHE, "LOCATION": directory}}
+            with override_settings(CACHES=caches):
+                context = multiprocessing.get_context("fork")
+                generator = ConfirmationCodeGenerator(KEY)
+                claiming, results = context.Lock(), context.Queue()
+                processes = [
+                    context.Process(
+                        target=_generate_in_process,
+                        args=(generator, claiming, results, 2000),
+                    )
+                    for _ in range(4)
+                ]
+                for process in processes:
+                    process.start()
+                codes = [code for _ in processes for code in results.get(timeout=60)]
+                for process in processes:
+                    process.join()
+        self.assertEqual(len(codes), 8000)
+        self.assertEqual(len(codes), len(set(codes)))
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": LOCMEM_CACHE}}, BOOKING_CODE_NODE_ID=None
+    )
+    def test_process_local_cache_uses_hash_and_warns(self):
+        generator = ConfirmationCodeGenerator(KEY)
+        generator.generate()
+        self.assertEqual(generator._node, generator._hash_node())
+        self.assertEqual(
+            [warning.id for warning in check_node_slots()], ["bookings.W001"]
+        )
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": LOCMEM_CACHE}}, BOOKING_CODE_NODE_ID="7"
+    )
+    def test_pinned_node_needs_no_shared_cache(self):
+        self.assertEqual(check_node_slots(), [])
+
+
+class PackageCalendarTests(TestCase):
+    def setUp(self):
+        self.drive = make_service()
+        self.walk = TourService.objects.create(
+            provider=self.drive.provider,
+            name="Forest walk",
+            description="d",
+            service_type="tour",
+            destination=self.drive.destination,
+            base_price=40,
+            duration_hours=2,
+            max_capacity=10,
+            featured_image="x.jpg",
+        )
+        # The itinerary runs a day past the advertised duration
+        self.package = Package.objects.create(
+            name="Bush weekend",
+            description="d",
+            destination=self.drive.destination,
+            total_price=300,
+            duration_days=2,
+            max_capacity=8,
+            featured_image="x.jpg",
+        )
+        PackageService.objects.create(
+            package=self.package, service=self.drive, day_number=1, sequence=1
+        )
+        PackageService.objects.create(
+            package=self.package, service=self.walk, day_number=3, sequence=1
+        )
+        Inventory.objects.create(service=self.drive, date=DAY, available_slots=5)
+        Inventory.objects.create(
+            service=self.walk, date=DAY + timedelta(days=2), available_slots=3
+        )
+
+    def test_window_covers_the_last_itinerary_day(self):
+        with self.assertNumQueries(2):
+            first, second = package_calendar(self.package, DAY, DAY + timedelta(days=1))
+        self.assertEqual((first.available, first.capacity), (True, 3))
+        self.assertEqual(first.limiting_service_id, self.walk.pk)
+        self.assertEqual((second.available, second.capacity), (False, 0))
+
+    def test_start_dates_fit_the_party(self):
+        window = (DAY - timedelta(days=1), DAY + timedelta(days=1))
+        self.assertEqual(available_start_dates(self.package.pk, *window), [DAY])
+        self.assertEqual(available_start_dates(self.package, *window, 4), [])
+
+
+class PackagePriceColumnTests(TestCase):
+    prices = [
+        ("300", "200"),
+        ("100", "80"),
+        ("99.99", "79.99"),
+        ("250", "250"),
+        ("250", "0"),
+        ("120", None),
+        ("1000.50", "1"),
+    ]
+
+    def setUp(self):
+        destination = make_service().destination
+        for total, discounted in self.prices:
+            Package.objects.create(
+                name=f"Package {total} {discounted}",
+                description="d",
+                destination=destination,
+                total_price=Decimal(total),
+                discounted_price=discounted and Decimal(discounted),
+                duration_days=1,
+                featured_image="x.jpg",
+            )
+
+    def test_generated_columns_match_the_properties(self):
+        for package in Package.objects.all():
+            with self.subTest(package=package.name):
+                self.assertEqual(package.effective_price, package.final_price)
+                self.assertEqual(
+                    package.effective_discount_percentage,
+                    Decimal(package.discount_percentage).quantize(Decimal("0.01")),
+                )
+
+    def test_discounted_filters_on_the_percentage(self):
+        self.assertEqual(
+            sorted(Package.objects.discounted(20).values_list("name", flat=True)),
+            [
+                "Package 100 80",
+                "Package 1000.50 1",
+                "Package 300 200",
+                "Package 99.99 79.99",  # 20.002%
+            ],
+        )
+        self.assertEqual(Package.objects.discounted(34).count(), 1)
+        self.assertEqual(Package.objects.discounted().count(), 4)
+
+
+class ExportBookingsCommandTests(SimpleTestCase):
+    def test_rejects_malformed_and_impossible_dates(self):
+        for args in (
+            ["--start", "2030-13-01"],
+            ["--start", "2030-02-30"],
+            ["--end", "yesterday"],
+            ["--start", "2030-02-02", "--end", "2030-02-01"],
+        ):
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command("export_bookings", "bookings", *args)
+
+
+class SettlePayoutsCommandTests(SimpleTestCase):
+    def test_rejects_malformed_and_impossible_dates(self):
+        for args in (
+            ["--start", "2030-01-01", "--end", "2030-01-3l"],
+            ["--start", "2030-02-30", "--end", "2030-03-01"],
+            ["--start", "2030-02-02", "--end", "2030-02-01"],
+        ):
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                call_command("settle_payouts", *args)
+
+
+class ExportViewTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        self.url = reverse("bookings:export", args=["bookings"])
+
+    def test_rejects_malformed_and_impossible_dates(self):
+        for query in (
+            {"start": "yesterday"},
+            {"start": "2030-02-30"},
+            {"end": "2030-13-01"},
+            {"start": "2030-02-02", "end": "2030-02-01"},
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(self.url, query)
+                self.assertEqual(response.status_code, 400)
+
+    def test_streams_a_valid_period(self):
+        response = self.client.get(self.url, {"start": "2030-01-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content))
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        self.today = timezone.localdate()
+
+    def pay(self, amount, **fields):
+        fields = {
+            "method": PaymentMethod.CREDIT_CARD,
+            "status": PaymentStatus.COMPLETED,
+            "completed_at": timezone.now(),
+            **fields,
+        }
+        return Payment.objects.create(
+            booking=make_booking(self.service), amount=amount, **fields
+        )
+
+    def test_whole_amounts_keep_their_cents(self):
+        payment = self.pay(99, commission_rate=15)
+        self.assertEqual(recompute_commissions(), 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.commission_amount, Decimal("14.85"))
+
+        recompute_commissions(rate=Decimal("12.5"))
+        payment.refresh_from_db()
+        self.assertEqual(payment.commission_amount, Decimal("12.38"))
+        self.assertEqual(payment.provider_payout, Decimal("86.62"))
+
+    def test_refunds_return_commission_pro_rata(self):
+        self.pay(
+            100,
+            commission_rate=10,
+            refund_amount=15,
+            refund_date=timezone.now(),
+            status=PaymentStatus.REFUNDED,
+        )
+        self.pay(250)
+
+        [statement] = settle_period(self.today, self.today)
+        self.assertEqual((statement.payment_count, statement.refund_count), (2, 1))
+        self.assertEqual(statement.gross_amount, Decimal("350"))
+        self.assertEqual(statement.refunded_amount, Decimal("15"))
+        # 10 + 25 commission, 1.50 of it returned with the refund
+        self.assertEqual(statement.commission_amount, Decimal("33.50"))
+        self.assertEqual(statement.payout_amount, Decimal("301.50"))
+        self.assertEqual(settle_period(self.today, self.today), [])
+
+    def test_only_the_period_is_settled(self):
+        self.pay(100, completed_at=timezone.now().replace(year=2020))
+        self.assertEqual(settle_period(date(2021, 1, 1), self.today), [])
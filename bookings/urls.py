@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+app_name = "bookings"
+
+urlpatterns = [
+    path("exports/<str:kind>/", views.export, name="export"),
+]
@@ -1,3 +1,40 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
 
-# Create your views here.
+from utils.dates import parse_day
+
+from .exports import chunked, stream_export
+
+
+@staff_member_required
+def export(request, kind):
+    """
+    Stream Bookings or Payments as CSV/JSONL.
+    Query parameters: format, start, end (YYYY-MM-DD) and status (repeatable).
+    """
+    format = request.GET.get("format", "csv")
+    dates = {}
+    for name in ("start", "end"):
+        try:
+            dates[name] = parse_day(request.GET.get(name))
+        except ValueError as exc:
+            return HttpResponseBadRequest(f"{name} {exc}")
+    if dates["start"] and dates["end"] and dates["start"] > dates["end"]:
+        return HttpResponseBadRequest("start must not be after end")
+    try:
+        lines = stream_export(
+            kind,
+            format,
+            dates["start"],
+            dates["end"],
+            request.GET.getlist("status") or None,
+        )
+    except ValueError:
+        raise Http404("Unknown export")
+
+    content_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{format}"
+    response = StreamingHttpResponse(chunked(lines), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "utils.db.PrimaryPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -95,6 +96,64 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Custom User Model
 AUTH_USER_MODEL = "accounts.User"
 
+# Booking confirmation codes: pin this process's node slot (0-1023).
+# Leave unset to lease a free slot from the shared cache at startup.
+BOOKING_CODE_NODE_ID = os.getenv("BOOKING_CODE_NODE_ID")
+
+# Booking holds: capacity reserved between slot selection and payment
+BOOKING_HOLD_STORE = "services.holds.LocalHoldStore"
+BOOKING_HOLD_TTL = 15 * 60  # seconds
+BOOKING_HOLD_CAPACITY_TTL = 30  # seconds remaining_slots stay cached for holds
+
+# Promotion impression/click/conversion counters are buffered, then flushed
+PROMOTION_COUNTER_BUFFER = "analytics.counters.LocalCounterBuffer"
+PROMOTION_COUNTER_FLUSH_INTERVAL = 10  # seconds
+
+# Subscription plans and quota usage counters stay cached for this long;
+# run reconcile_entitlements periodically to correct any counter drift
+ENTITLEMENT_CACHE_TTL = 60 * 60  # seconds
+
+# Admin changelists show the planner's row estimate instead of COUNT(*) above
+# this many rows (PostgreSQL only)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# Text search configuration for PostgreSQL full-text search vectors
+SEARCH_CONFIG = "english"
+
+# Parties of at least this many guests get the service's group_discount_rate
+GROUP_DISCOUNT_MIN_GUESTS = 10
+
+# Revenue reports convert amounts into this currency with ExchangeRate rows;
+# each process reloads its rate table at least this often
+REPORTING_CURRENCY = "USD"
+FX_RATES_TTL = 5 * 60  # seconds
+
+# Values cached with utils.tags are dropped by tag invalidation rather than
+# expiry; each process also keeps recent values locally, and invalidations
+# reach the other processes through CACHE_INVALIDATION_BUS
+TAGGED_CACHE_TTL = 24 * 60 * 60  # seconds
+TAGGED_CACHE_LOCAL_TTL = 60  # seconds
+TAGGED_CACHE_LOCAL_MAX_ENTRIES = 10_000
+CACHE_INVALIDATION_BUS = "utils.tags.LocalInvalidationBus"
+
+# Read replicas (utils.db): DATABASES aliases replicating "default". Replicas
+# lagging more than DATABASE_REPLICA_MAX_LAG are skipped; clients that wrote
+# read the primary for DATABASE_PRIMARY_PIN_SECONDS
+DATABASE_ROUTERS = ["utils.db.ReplicaRouter"]
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_MAX_LAG = 5  # seconds
+DATABASE_REPLICA_CHECK_INTERVAL = 5  # seconds
+DATABASE_PRIMARY_PIN_SECONDS = 15
+
+# Pooled databases (utils.pool) share their wait-time and usage statistics
+# at most this often per worker process
+DATABASE_POOL_STATS_INTERVAL = 30  # seconds
+
+# Catalog objects (services, destinations, packages, providers) cached by
+# utils.cache; hit/miss counts are shared every CATALOG_CACHE_STATS_EVERY lookups
+CATALOG_CACHE_TTL = 6 * 60 * 60  # seconds
+CATALOG_CACHE_STATS_EVERY = 100
+
 # Email Configuration (Override in environment-specific settings)
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "noreply@touristmanagement.com"
@@ -27,13 +27,40 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
-        "CONN_MAX_AGE": 600,  # Connection pooling
+        "CONN_MAX_AGE": 600,  # Persistent connections when not pooled
         "OPTIONS": {
             "connect_timeout": 10,
         },
     }
 }
 
+# Connection pool - one pool per worker process (utils.pool). Size
+# DATABASE_POOL_MAX_SIZE to the worker's threads: pods x workers x max size
+# must stay below the server's max_connections
+if os.getenv("DATABASE_POOL", "True") == "True":
+    from psycopg_pool import ConnectionPool
+
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "4")),
+        "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),  # seconds
+        "max_idle": 5 * 60,  # seconds
+        "max_lifetime": 30 * 60,  # seconds
+        "check": ConnectionPool.check_connection,
+    }
+
+# Read replicas - comma-separated hosts streaming from the primary
+for number, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
 # Security Settings
 SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", "True") == "True"
 SESSION_COOKIE_SECURE = True
@@ -85,6 +112,18 @@ CACHES = {
     }
 }
 
+# Booking holds - shared across pods through Redis
+BOOKING_HOLD_STORE = "services.holds.RedisHoldStore"
+BOOKING_HOLD_REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+
+# Promotion counters - buffered in Redis, flushed by flush_promotion_counters
+PROMOTION_COUNTER_BUFFER = "analytics.counters.RedisCounterBuffer"
+PROMOTION_COUNTER_REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+
+# Cache invalidations - published to every pod through Redis pub/sub
+CACHE_INVALIDATION_BUS = "utils.tags.RedisInvalidationBus"
+CACHE_INVALIDATION_REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+
 # Session - Use Redis for sessions in production
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
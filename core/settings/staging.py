@@ -53,6 +53,13 @@ CACHES = {
     }
 }
 
+# Booking holds, promotion counters and cache invalidations - in-process
+# without Redis
+if not os.getenv("REDIS_URL"):
+    BOOKING_HOLD_STORE = "services.holds.LocalHoldStore"
+    PROMOTION_COUNTER_BUFFER = "analytics.counters.LocalCounterBuffer"
+    CACHE_INVALIDATION_BUS = "utils.tags.LocalInvalidationBus"
+
 # Logging - More verbose in staging
 LOGGING["root"]["level"] = "DEBUG"
 LOGGING["loggers"]["django"]["level"] = "DEBUG"
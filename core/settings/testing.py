@@ -34,6 +34,11 @@ DATABASES = {
 #     }
 # }
 
+# A replica alias for the routing tests (utils.db): the test runner points the
+# mirror at the test primary. Tests opt in with DATABASE_REPLICAS=["replica"].
+DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICAS = []
+
 # Password hashers - Use faster hashers for testing
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.MD5PasswordHasher",
@@ -52,6 +57,9 @@ CACHES = {
     }
 }
 
+# Promotion counters - only flush when a test calls flush_counters()
+PROMOTION_COUNTER_FLUSH_INTERVAL = 0
+
 # Static files - Disable collectstatic in tests
 STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
 
@@ -1,10 +1,12 @@
 from django.contrib import admin
 
+from utils.admin import LargeTableAdminMixin
+
 from .models import Amenity, Category, Destination
 
 
 @admin.register(Destination)
-class DestinationAdmin(admin.ModelAdmin):
+class DestinationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["name", "city", "country", "is_active", "is_featured", "created_at"]
     list_filter = ["is_active", "is_featured", "country", "created_at"]
     search_fields = ["name", "city", "country", "description"]
@@ -52,7 +54,7 @@ class DestinationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["name", "icon", "color", "is_active", "created_at"]
     list_filter = ["is_active", "created_at"]
     search_fields = ["name", "description"]
@@ -61,6 +63,6 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Amenity)
-class AmenityAdmin(admin.ModelAdmin):
+class AmenityAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ["name", "icon"]
     search_fields = ["name", "description"]
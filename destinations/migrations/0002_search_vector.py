@@ -0,0 +1,94 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The trigger utils.search.search_vector_sql() generated for the document
+# in destinations.search when this migration was written, frozen so that editing the
+# document later cannot change what this migration does.
+INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION destinations_destination_search_vector()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english',
+                coalesce(NEW."name", '')
+            ), 'A') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."short_description", '')
+            ), 'B') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."description", '')
+            ), 'C') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."city", '') || ' ' ||
+                coalesce(NEW."state_province", '') || ' ' ||
+                coalesce(NEW."country", '')
+            ), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS destinations_destination_search_vector
+    ON "destinations_destination"
+    """,
+    """
+    CREATE TRIGGER destinations_destination_search_vector
+    BEFORE INSERT OR UPDATE OF
+        "city",
+        "country",
+        "description",
+        "name",
+        "search_vector",
+        "short_description",
+        "state_province"
+    ON "destinations_destination"
+    FOR EACH ROW EXECUTE FUNCTION destinations_destination_search_vector()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS destinations_destination_search_gin
+    ON "destinations_destination" USING gin (search_vector)
+    """,
+    'UPDATE "destinations_destination" SET search_vector = NULL',
+]
+UNINSTALL = [
+    """
+    DROP TRIGGER IF EXISTS destinations_destination_search_vector
+    ON "destinations_destination"
+    """,
+    "DROP FUNCTION IF EXISTS destinations_destination_search_vector()",
+    "DROP INDEX IF EXISTS destinations_destination_search_gin",
+]
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def install_trigger(apps, schema_editor):
+    _execute(schema_editor, INSTALL)
+
+
+def uninstall_trigger(apps, schema_editor):
+    _execute(schema_editor, UNINSTALL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("destinations", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="destination",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(install_trigger, uninstall_trigger),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+# The encoding as of this migration (utils.geo.encode_geocell), frozen so a
+# later change to the live one cannot change what this backfill writes
+CELL_BITS = 26
+BATCH_SIZE = 2000
+
+
+def _spread(value):
+    value &= 0xFFFFFFFF
+    value = (value | value << 16) & 0x0000FFFF0000FFFF
+    value = (value | value << 8) & 0x00FF00FF00FF00FF
+    value = (value | value << 4) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value << 2) & 0x3333333333333333
+    return (value | value << 1) & 0x5555555555555555
+
+
+def encode_geocell(latitude, longitude):
+    top = (1 << CELL_BITS) - 1
+    x = int((float(longitude) + 180.0) / 360.0 * (1 << CELL_BITS))
+    y = int((float(latitude) + 90.0) / 180.0 * (1 << CELL_BITS))
+    return _spread(min(max(x, 0), top)) << 1 | _spread(min(max(y, 0), top))
+
+
+def fill_geocells(apps, schema_editor):
+    model = apps.get_model("destinations.Destination")
+    rows = model.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list("pk", "latitude", "longitude")
+    changed = []
+    for pk, latitude, longitude in rows.iterator(chunk_size=BATCH_SIZE):
+        changed.append(model(pk=pk, geocell=encode_geocell(latitude, longitude)))
+        if len(changed) >= BATCH_SIZE:
+            model.objects.bulk_update(changed, ["geocell"])
+            changed = []
+    if changed:
+        model.objects.bulk_update(changed, ["geocell"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("destinations", "0002_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="destination",
+            name="geocell",
+            field=models.BigIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_geocells, migrations.RunPython.noop),
+    ]
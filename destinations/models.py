@@ -1,8 +1,11 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils.text import slugify
 
+from utils.geo import encode_geocell
+
 
 class Destination(models.Model):
     """
@@ -27,6 +30,8 @@ class Destination(models.Model):
     longitude = models.DecimalField(
         max_digits=9, decimal_places=6, help_text="Longitude coordinate"
     )
+    # Z-order cell of the coordinates, for radius search (see utils.geo)
+    geocell = models.BigIntegerField(null=True, editable=False, db_index=True)
 
     # Media
     featured_image = models.ImageField(upload_to="destinations/")
@@ -50,6 +55,9 @@ class Destination(models.Model):
         related_name="managed_destinations",
     )
 
+    # Full-text search, maintained by a PostgreSQL trigger (see utils.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -70,6 +78,10 @@ class Destination(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.name}-{self.city}")
+        self.geocell = encode_geocell(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geocell"}
         super().save(*args, **kwargs)
 
     @property
@@ -0,0 +1,49 @@
+"""
+Full-text search over Destinations (see utils.search), and radius and
+nearest search by their coordinates (see utils.geo), read from a replica
+when one is usable (see utils.db). Search results are loaded from the catalog
+cache (see utils.cache).
+"""
+
+from utils.cache import from_catalog
+from utils.db import on_replica
+from utils.geo import GeoIndex, nearest, within_radius
+from utils.search import SearchDocument, search
+
+from .models import Destination
+
+DESTINATION_DOCUMENT = SearchDocument(
+    "destinations.Destination",
+    {
+        "A": ["name"],
+        "B": ["short_description"],
+        "C": ["description"],
+        "D": ["city", "state_province", "country"],
+    },
+)
+
+DESTINATION_LOCATION = GeoIndex("latitude", "longitude")
+
+
+def search_destinations(query, country=None, limit=20):
+    """Active destinations matching `query`, best first (a list), with `rank`"""
+    destinations = on_replica(Destination.objects.filter(is_active=True))
+    if country:
+        destinations = destinations.filter(country__iexact=country)
+    return from_catalog(
+        search(destinations, DESTINATION_DOCUMENT, query, limit), "rank"
+    )
+
+
+def destinations_within(latitude, longitude, radius_km):
+    """Active destinations within `radius_km`, nearest first"""
+    destinations = on_replica(Destination.objects.filter(is_active=True))
+    return within_radius(
+        destinations, DESTINATION_LOCATION, latitude, longitude, radius_km
+    )
+
+
+def nearest_destinations(latitude, longitude, k=10):
+    """The `k` active destinations nearest the point"""
+    destinations = on_replica(Destination.objects.filter(is_active=True))
+    return nearest(destinations, DESTINATION_LOCATION, latitude, longitude, k)
@@ -1,11 +1,13 @@
 from django.contrib import admin
 
+from utils.admin import LargeTableAdminMixin
+
 from .models import (AvailabilitySchedule, Inventory, ServiceProvider,
                      Subscription, TourService)
 
 
 @admin.register(ServiceProvider)
-class ServiceProviderAdmin(admin.ModelAdmin):
+class ServiceProviderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "company_name",
         "destination",
@@ -39,7 +41,7 @@ class ServiceProviderAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "provider",
         "plan",
@@ -89,7 +91,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
 
 @admin.register(TourService)
-class TourServiceAdmin(admin.ModelAdmin):
+class TourServiceAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "name",
         "provider",
@@ -177,23 +179,25 @@ class TourServiceAdmin(admin.ModelAdmin):
 
 
 @admin.register(AvailabilitySchedule)
-class AvailabilityScheduleAdmin(admin.ModelAdmin):
+class AvailabilityScheduleAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "service",
         "start_date",
         "end_date",
         "start_time",
         "end_time",
+        "daily_capacity",
         "is_active",
     ]
     list_filter = ["is_active", "start_date", "end_date"]
     search_fields = ["service__name"]
     raw_id_fields = ["service"]
     readonly_fields = ["created_at", "updated_at"]
+    list_select_related = ["service__provider"]
 
 
 @admin.register(Inventory)
-class InventoryAdmin(admin.ModelAdmin):
+class InventoryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = [
         "service",
         "date",
@@ -206,4 +210,4 @@ class InventoryAdmin(admin.ModelAdmin):
     search_fields = ["service__name"]
     raw_id_fields = ["service"]
     readonly_fields = ["created_at", "updated_at", "remaining_slots"]
-    date_hierarchy = "date"
+    list_select_related = ["service__provider"]
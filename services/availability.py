@@ -0,0 +1,232 @@
+"""
+Denormalised availability index (ServiceAvailability) and the search path on top.
+
+Rows mirror Inventory one-to-one: remaining slots, effective price and a
+bookable flag per (service, date). They are refreshed from signals whenever
+Inventory or a TourService changes, and adjusted in place by the reservation
+engine (a Booking save alone changes neither), so searches never evaluate
+Python properties per row.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Inventory, ServiceAvailability, TourService
+
+
+def refresh_availability(service_ids=None, dates=None, start_date=None, end_date=None):
+    """
+    Rebuild index rows from Inventory for the given services and/or dates.
+    With no arguments the whole index is rebuilt. Returns rows written.
+    """
+    if service_ids is not None and dates is not None:
+        for service_id in service_ids:
+            for date in dates:
+                forget_remaining_slots(service_id, date)
+
+    if connection.vendor == "postgresql":
+        return _refresh_postgresql(service_ids, dates, start_date, end_date)
+
+    inventory = Inventory.objects.all()
+    if service_ids is not None:
+        inventory = inventory.filter(service_id__in=service_ids)
+    if dates is not None:
+        inventory = inventory.filter(date__in=dates)
+    if start_date:
+        inventory = inventory.filter(date__gte=start_date)
+    if end_date:
+        inventory = inventory.filter(date__lte=end_date)
+
+    rows = inventory.values_list(
+        "service_id",
+        "service__destination_id",
+        "service__is_active",
+        "service__base_price",
+        "date",
+        "available_slots",
+        "booked_slots",
+        "blocked_slots",
+        "price_override",
+        "is_available",
+    )
+
+    written = 0
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(_index_row(*row))
+        if len(batch) >= 1000:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _index_row(
+    service_id,
+    destination_id,
+    service_active,
+    base_price,
+    date,
+    available,
+    booked,
+    blocked,
+    price_override,
+    is_available,
+):
+    remaining = max(0, available - booked - blocked)
+    return ServiceAvailability(
+        service_id=service_id,
+        destination_id=destination_id,
+        date=date,
+        remaining_slots=remaining,
+        price=price_override if price_override else base_price,
+        is_bookable=bool(is_available and service_active and remaining > 0),
+    )
+
+
+def _upsert(rows):
+    ServiceAvailability.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["service", "date"],
+        update_fields=[
+            "destination",
+            "remaining_slots",
+            "price",
+            "is_bookable",
+            "updated_at",
+        ],
+    )
+    return len(rows)
+
+
+def _refresh_postgresql(service_ids, dates, start_date, end_date):
+    """Set-based INSERT ... SELECT upsert that skips unchanged rows"""
+    index = ServiceAvailability._meta.db_table
+    inventory = Inventory._meta.db_table
+    service = TourService._meta.db_table
+
+    conditions = ["TRUE"]
+    if service_ids is not None:
+        conditions.append("i.service_id = ANY(%(service_ids)s)")
+    if dates is not None:
+        conditions.append("i.date = ANY(%(dates)s)")
+    if start_date:
+        conditions.append("i.date >= %(start)s")
+    if end_date:
+        conditions.append("i.date <= %(end)s")
+
+    sql = f"""
+        INSERT INTO {index} (
+            service_id, destination_id, date, remaining_slots, price,
+            is_bookable, updated_at
+        )
+        SELECT
+            i.service_id,
+            t.destination_id,
+            i.date,
+            r.remaining,
+            COALESCE(NULLIF(i.price_override, 0), t.base_price),
+            i.is_available AND t.is_active AND r.remaining > 0,
+            now()
+        FROM {inventory} i
+        JOIN {service} t ON t.id = i.service_id
+        CROSS JOIN LATERAL (
+            SELECT GREATEST(
+                i.available_slots - i.booked_slots - i.blocked_slots, 0
+            ) AS remaining
+        ) r
+        WHERE {" AND ".join(conditions)}
+        ON CONFLICT (service_id, date) DO UPDATE
+            SET destination_id = EXCLUDED.destination_id,
+                remaining_slots = EXCLUDED.remaining_slots,
+                price = EXCLUDED.price,
+                is_bookable = EXCLUDED.is_bookable,
+                updated_at = EXCLUDED.updated_at
+            WHERE ({index}.destination_id, {index}.remaining_slots,
+                   {index}.price, {index}.is_bookable)
+                IS DISTINCT FROM
+                  (EXCLUDED.destination_id, EXCLUDED.remaining_slots,
+                   EXCLUDED.price, EXCLUDED.is_bookable)
+    """
+    params = {
+        "service_ids": list(service_ids) if service_ids is not None else None,
+        "dates": list(dates) if dates is not None else None,
+        "start": start_date,
+        "end": end_date,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def consume_availability(service_id, date, slots):
+    """In-place decrement after a successful reservation (no re-read of Inventory)"""
+    forget_remaining_slots(service_id, date)
+    ServiceAvailability.objects.filter(service_id=service_id, date=date).update(
+        remaining_slots=Greatest(F("remaining_slots") - slots, Value(0)),
+        is_bookable=Case(
+            When(is_bookable=True, remaining_slots__gt=slots, then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+def remove_availability(service_id, date):
+    forget_remaining_slots(service_id, date)
+    ServiceAvailability.objects.filter(service_id=service_id, date=date).delete()
+
+
+def _remaining_key(service_id, date):
+    return f"availability:remaining:{service_id}:{date}"
+
+
+def cached_remaining_slots(service_id, date):
+    """
+    Bookable remaining slots for one service date, cached for
+    BOOKING_HOLD_CAPACITY_TTL seconds and dropped whenever the row changes.
+    """
+    key = _remaining_key(service_id, date)
+    remaining = cache.get(key)
+    if remaining is None:
+        row = (
+            ServiceAvailability.objects.filter(service_id=service_id, date=date)
+            .values_list("remaining_slots", "is_bookable")
+            .first()
+        )
+        remaining = row[0] if row and row[1] else 0
+        cache.set(key, remaining, settings.BOOKING_HOLD_CAPACITY_TTL)
+    return remaining
+
+
+def forget_remaining_slots(service_id, date):
+    cache.delete(_remaining_key(service_id, date))
+
+
+def available_service_ids(destination, start_date, end_date, min_slots=1):
+    """
+    Ids of services in `destination` with at least `min_slots` free on any day
+    in [start_date, end_date]. Answered by one range scan of the partial index.
+    """
+    return (
+        ServiceAvailability.objects.filter(
+            destination=destination,
+            date__range=(start_date, end_date),
+            remaining_slots__gte=min_slots,
+            is_bookable=True,
+        )
+        .values_list("service_id", flat=True)
+        .distinct()
+    )
+
+
+def search_available_services(destination, start_date, end_date, min_slots=1):
+    """Active TourServices bookable for `min_slots` guests within the window"""
+    return TourService.objects.filter(
+        is_active=True,
+        id__in=available_service_ids(destination, start_date, end_date, min_slots),
+    )
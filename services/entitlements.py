@@ -0,0 +1,279 @@
+"""
+Subscription entitlements and quota checks for service providers.
+
+A provider's active Subscription is resolved once into an Entitlements record
+and cached; usage (active services, bookings in the current billing month) is
+kept as cache counters that TourService and Booking signals increment and
+decrement. can_create_service() and can_accept_booking() therefore only read
+the cache once it is warm; a miss falls back to the database and re-seeds it.
+
+Billing months run from the subscription's start day, so the bookings counter
+key carries the period start and starts from zero each month by itself.
+Counters expire after ENTITLEMENT_CACHE_TTL seconds and reconcile_usage()
+(the reconcile_entitlements command) resets them from real counts, so any
+drift from missed signals or bulk writes is bounded.
+"""
+
+import calendar
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from utils.enums import SubscriptionPlan, SubscriptionStatus
+
+from .models import Subscription, TourService
+
+PLAN_KEY = "entitlements:plan:{provider_id}"
+SERVICES_KEY = "entitlements:services:{provider_id}"
+BOOKINGS_KEY = "entitlements:bookings:{provider_id}:{period_start}"
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    plan: str
+    max_services: int
+    max_bookings_per_month: int
+    analytics_enabled: bool
+    priority_support: bool
+    featured_listing: bool
+    billing_day: int = 1
+    expires_at: datetime = None
+
+
+def _default(field):
+    return Subscription._meta.get_field(field).default
+
+
+# Providers without an active subscription get the Free plan's model defaults
+FREE_PLAN = Entitlements(
+    plan=SubscriptionPlan.FREE,
+    max_services=_default("max_services"),
+    max_bookings_per_month=_default("max_bookings_per_month"),
+    analytics_enabled=_default("analytics_enabled"),
+    priority_support=_default("priority_support"),
+    featured_listing=_default("featured_listing"),
+)
+
+
+def _entitlements(subscription):
+    if subscription is None:
+        return FREE_PLAN
+    return Entitlements(
+        plan=subscription.plan,
+        max_services=subscription.max_services,
+        max_bookings_per_month=subscription.max_bookings_per_month,
+        analytics_enabled=subscription.analytics_enabled,
+        priority_support=subscription.priority_support,
+        featured_listing=subscription.featured_listing,
+        billing_day=timezone.localtime(subscription.start_date).day,
+        expires_at=subscription.end_date,
+    )
+
+
+def _active_subscriptions(provider_ids, now):
+    """{provider id: its current active Subscription}, latest start wins"""
+    subscriptions = Subscription.objects.filter(
+        provider_id__in=provider_ids,
+        status=SubscriptionStatus.ACTIVE,
+        start_date__lte=now,
+        end_date__gt=now,
+    ).order_by("provider_id", "start_date")
+    return {subscription.provider_id: subscription for subscription in subscriptions}
+
+
+def _plan_timeout(entitlements, now):
+    """Cache the plan no longer than its TTL, nor past the subscription's end"""
+    timeout = settings.ENTITLEMENT_CACHE_TTL
+    if entitlements.expires_at is not None:
+        remaining = (entitlements.expires_at - now).total_seconds()
+        timeout = max(1, min(timeout, int(remaining)))
+    return timeout
+
+
+def get_entitlements(provider):
+    """The provider's current Entitlements (cached; FREE_PLAN without a plan)"""
+    provider_id = getattr(provider, "pk", provider)
+    key = PLAN_KEY.format(provider_id=provider_id)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        now = timezone.now()
+        subscription = _active_subscriptions([provider_id], now).get(provider_id)
+        entitlements = _entitlements(subscription)
+        cache.set(key, entitlements, _plan_timeout(entitlements, now))
+    return entitlements
+
+
+def forget_entitlements(provider_id):
+    """
+    Drop the cached plan, and the bookings counter of every billing anchor,
+    since a new plan may count from a day whose counter was left unmaintained
+    """
+    today = timezone.localdate()
+    cache.delete_many(
+        [PLAN_KEY.format(provider_id=provider_id)]
+        + [
+            _bookings_key(provider_id, replace(FREE_PLAN, billing_day=day), today)
+            for day in range(1, 32)
+        ]
+    )
+
+
+def billing_period(entitlements, day=None):
+    """(first day, first day of the next) billing month containing `day`"""
+    day = day or timezone.localdate()
+
+    def anchored(year, month):
+        last = calendar.monthrange(year, month)[1]
+        return date(year, month, min(entitlements.billing_day, last))
+
+    start = anchored(day.year, day.month)
+    if start > day:
+        previous = day.replace(day=1) - timedelta(days=1)
+        start = anchored(previous.year, previous.month)
+    following = start.replace(day=1) + timedelta(days=32)
+    return start, anchored(following.year, following.month)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _bookings_key(provider_id, entitlements, day=None):
+    period_start = billing_period(entitlements, day)[0]
+    return BOOKINGS_KEY.format(provider_id=provider_id, period_start=period_start)
+
+
+def _count_services(provider_ids):
+    counts = (
+        TourService.objects.filter(provider_id__in=provider_ids, is_active=True)
+        .values("provider_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    return {row["provider_id"]: row["count"] for row in counts}
+
+
+def _count_bookings(provider_ids, period_start, period_end):
+    from bookings.models import Booking
+
+    counts = (
+        Booking.objects.filter(
+            service__provider_id__in=provider_ids,
+            booking_date__gte=_day_start(period_start),
+            booking_date__lt=_day_start(period_end),
+        )
+        .values("service__provider_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    return {row["service__provider_id"]: row["count"] for row in counts}
+
+
+def service_usage(provider):
+    """Active services the provider has (cached counter)"""
+    provider_id = getattr(provider, "pk", provider)
+    key = SERVICES_KEY.format(provider_id=provider_id)
+    used = cache.get(key)
+    if used is None:
+        used = _count_services([provider_id]).get(provider_id, 0)
+        cache.add(key, used, settings.ENTITLEMENT_CACHE_TTL)
+    return used
+
+
+def booking_usage(provider):
+    """Bookings made in the provider's current billing month (cached counter)"""
+    provider_id = getattr(provider, "pk", provider)
+    entitlements = get_entitlements(provider_id)
+    key = _bookings_key(provider_id, entitlements)
+    used = cache.get(key)
+    if used is None:
+        period = billing_period(entitlements)
+        used = _count_bookings([provider_id], *period).get(provider_id, 0)
+        cache.add(key, used, settings.ENTITLEMENT_CACHE_TTL)
+    return used
+
+
+def can_create_service(provider):
+    return service_usage(provider) < get_entitlements(provider).max_services
+
+
+def can_accept_booking(provider):
+    return booking_usage(provider) < get_entitlements(provider).max_bookings_per_month
+
+
+def has_feature(provider, feature):
+    """e.g. has_feature(provider, "analytics_enabled")"""
+    return bool(getattr(get_entitlements(provider), feature))
+
+
+def _adjust(key, delta):
+    # Only adjust a seeded counter; a missing one is recounted when next read
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def record_service_delta(provider_id, delta):
+    """An active service was added (delta=1) or removed (delta=-1)"""
+    _adjust(SERVICES_KEY.format(provider_id=provider_id), delta)
+
+
+def record_booking_delta(provider_id, booking_date, delta):
+    """A booking made at `booking_date` was added (delta=1) or removed (-1)"""
+    entitlements = cache.get(PLAN_KEY.format(provider_id=provider_id))
+    if entitlements is None:
+        return  # the usage counter cannot be warm without the plan
+    day = timezone.localdate(booking_date)
+    _adjust(_bookings_key(provider_id, entitlements, day), delta)
+
+
+def reconcile_usage(provider_ids=None, batch_size=1000):
+    """
+    Reset cached plans and usage counters from the database for the given
+    providers (all by default). Returns how many cached counters had drifted.
+    """
+    from .models import ServiceProvider
+
+    providers = ServiceProvider.objects.order_by("pk").values_list("pk", flat=True)
+    if provider_ids is not None:
+        providers = providers.filter(pk__in=provider_ids)
+    ids = list(providers)
+    now = timezone.now()
+    today = timezone.localdate()
+    ttl = settings.ENTITLEMENT_CACHE_TTL
+
+    drifted = 0
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        subscriptions = _active_subscriptions(chunk, now)
+        plans = {pk: _entitlements(subscriptions.get(pk)) for pk in chunk}
+
+        counters = {}
+        services = _count_services(chunk)
+        for pk in chunk:
+            counters[SERVICES_KEY.format(provider_id=pk)] = services.get(pk, 0)
+
+        by_period = {}
+        for pk, entitlements in plans.items():
+            by_period.setdefault(billing_period(entitlements, today), []).append(pk)
+        for period, period_ids in by_period.items():
+            bookings = _count_bookings(period_ids, *period)
+            for pk in period_ids:
+                key = BOOKINGS_KEY.format(provider_id=pk, period_start=period[0])
+                counters[key] = bookings.get(pk, 0)
+
+        cached = cache.get_many(list(counters))
+        drifted += sum(1 for key, value in cached.items() if value != counters[key])
+        cache.set_many(counters, ttl)
+        for pk, entitlements in plans.items():
+            cache.set(
+                PLAN_KEY.format(provider_id=pk),
+                entitlements,
+                _plan_timeout(entitlements, now),
+            )
+    return drifted
@@ -0,0 +1,266 @@
+"""
+Time-limited booking holds.
+
+A hold reserves slots on a (service, date) between slot selection and payment.
+Holds live in a HoldStore (Redis in production, an in-process stand-in for
+tests and development), never in the database: placing a hold or checking
+what is held is a constant number of store operations. Expired holds are
+dropped lazily whenever their (service, date) is touched and swept in bulk by
+the sweep_holds command; on payment a hold is converted into booked_slots
+through the reservation engine, which counts active holds against capacity.
+
+Hold ids are self-describing ("<service>:<date>:<slots>:<token>") so release
+and conversion need no lookup.
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date as date_cls
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .availability import cached_remaining_slots
+
+
+@dataclass(frozen=True)
+class Hold:
+    id: str
+    service_id: int
+    date: date_cls
+    slots: int
+    expires_at: float
+
+
+def _slot_key(service_id, date):
+    return f"{service_id}:{date.isoformat()}"
+
+
+def parse_hold_id(hold_id):
+    service_id, day, slots, _ = hold_id.split(":")
+    return int(service_id), date_cls.fromisoformat(day), int(slots)
+
+
+class LocalHoldStore:
+    """In-process HoldStore for tests and single-process development"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._held = {}  # slot key -> total slots held
+        self._holds = {}  # slot key -> {hold id: (slots, expires_at)}
+        self._expiries = []  # heap of (expires_at, hold id, slot key)
+
+    def _drop_expired(self, key, now):
+        holds = self._holds.get(key, {})
+        for hold_id, (slots, expires_at) in list(holds.items()):
+            if expires_at <= now:
+                del holds[hold_id]
+                self._held[key] -= slots
+
+    def place(self, hold_id, key, slots, capacity, expires_at, now):
+        with self._lock:
+            self._drop_expired(key, now)
+            if self._held.get(key, 0) + slots > capacity:
+                return False
+            self._held[key] = self._held.get(key, 0) + slots
+            self._holds.setdefault(key, {})[hold_id] = (slots, expires_at)
+            heapq.heappush(self._expiries, (expires_at, hold_id, key))
+            return True
+
+    def release(self, hold_id, key):
+        with self._lock:
+            entry = self._holds.get(key, {}).pop(hold_id, None)
+            if entry is None:
+                return False
+            self._held[key] -= entry[0]
+            return True
+
+    def held(self, key, now, exclude=None):
+        with self._lock:
+            self._drop_expired(key, now)
+            held = self._held.get(key, 0)
+            entry = self._holds.get(key, {}).get(exclude)
+            return held - entry[0] if entry else held
+
+    def expired(self, now, limit):
+        with self._lock:
+            expired = []
+            while self._expiries and len(expired) < limit:
+                if self._expiries[0][0] > now:
+                    break
+                _, hold_id, key = heapq.heappop(self._expiries)
+                expired.append((hold_id, key))
+            return expired
+
+
+class RedisHoldStore:
+    """
+    Redis HoldStore. Per slot key it keeps a counter of held slots and a sorted
+    set of hold ids scored by expiry; a global sorted set drives the sweeper.
+    Every mutation is a Lua script, so check-and-hold is atomic across pods.
+    """
+
+    PREFIX = "holds"
+
+    # KEYS: counter, per-key zset, global zset
+    # ARGV: now, hold id, slots, capacity, expires_at
+    PLACE = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    for _, id in ipairs(expired) do
+        local slots = string.match(id, '^[^:]+:[^:]+:(%d+):')
+        redis.call('DECRBY', KEYS[1], slots)
+        redis.call('ZREM', KEYS[3], id)
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    local held = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if held + tonumber(ARGV[3]) > tonumber(ARGV[4]) then
+        return 0
+    end
+    redis.call('INCRBY', KEYS[1], ARGV[3])
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[2])
+    redis.call('ZADD', KEYS[3], ARGV[5], ARGV[2])
+    return 1
+    """
+
+    # KEYS: counter, per-key zset, global zset; ARGV: hold id, slots
+    RELEASE = """
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    if redis.call('ZREM', KEYS[2], ARGV[1]) == 1 then
+        redis.call('DECRBY', KEYS[1], ARGV[2])
+        return 1
+    end
+    return 0
+    """
+
+    # KEYS: counter, per-key zset, global zset; ARGV: now, hold id to leave out
+    HELD = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    for _, id in ipairs(expired) do
+        local slots = string.match(id, '^[^:]+:[^:]+:(%d+):')
+        redis.call('DECRBY', KEYS[1], slots)
+        redis.call('ZREM', KEYS[3], id)
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+    local held = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if ARGV[2] ~= '' and redis.call('ZSCORE', KEYS[2], ARGV[2]) then
+        held = held - tonumber(string.match(ARGV[2], '^[^:]+:[^:]+:(%d+):'))
+    end
+    return held
+    """
+
+    def __init__(self, url=None):
+        import redis
+
+        self._redis = redis.Redis.from_url(url or settings.BOOKING_HOLD_REDIS_URL)
+        self._place = self._redis.register_script(self.PLACE)
+        self._release = self._redis.register_script(self.RELEASE)
+        self._held = self._redis.register_script(self.HELD)
+        self._expiring = f"{self.PREFIX}:expiring"
+
+    def _keys(self, key):
+        return [f"{self.PREFIX}:{key}:held", f"{self.PREFIX}:{key}:ids", self._expiring]
+
+    def place(self, hold_id, key, slots, capacity, expires_at, now):
+        args = [now, hold_id, slots, capacity, expires_at]
+        return bool(self._place(keys=self._keys(key), args=args))
+
+    def release(self, hold_id, key):
+        slots = parse_hold_id(hold_id)[2]
+        return bool(self._release(keys=self._keys(key), args=[hold_id, slots]))
+
+    def held(self, key, now, exclude=None):
+        args = [now, exclude or ""]
+        return int(self._held(keys=self._keys(key), args=args))
+
+    def expired(self, now, limit):
+        hold_ids = self._redis.zrangebyscore(
+            self._expiring, "-inf", now, start=0, num=limit
+        )
+        expired = []
+        for hold_id in hold_ids:
+            hold_id = hold_id.decode()
+            service_id, day, _ = parse_hold_id(hold_id)
+            expired.append((hold_id, _slot_key(service_id, day)))
+        return expired
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.BOOKING_HOLD_STORE)()
+    return _store
+
+
+def place_hold(service, date, slots=1, ttl=None):
+    """
+    Hold `slots` on a service date for `ttl` seconds (BOOKING_HOLD_TTL by
+    default). Returns a Hold, or None when not enough unheld capacity is left.
+    """
+    if slots < 1:
+        raise ValueError("slots must be a positive integer")
+    service_id = getattr(service, "pk", service)
+    now = time.time()
+    expires_at = now + (ttl or settings.BOOKING_HOLD_TTL)
+    hold_id = f"{service_id}:{date.isoformat()}:{slots}:{uuid.uuid4().hex}"
+    capacity = cached_remaining_slots(service_id, date)
+
+    placed = get_store().place(
+        hold_id, _slot_key(service_id, date), slots, capacity, expires_at, now
+    )
+    if not placed:
+        return None
+    return Hold(hold_id, service_id, date, slots, expires_at)
+
+
+def release_hold(hold_id):
+    """Drop a hold (abandoned checkout). Returns False if it was already gone."""
+    service_id, day, _ = parse_hold_id(hold_id)
+    return get_store().release(hold_id, _slot_key(service_id, day))
+
+
+def held_slots(service, date, exclude=None):
+    """Slots held on a service date, leaving out the hold `exclude`"""
+    service_id = getattr(service, "pk", service)
+    return get_store().held(_slot_key(service_id, date), time.time(), exclude)
+
+
+def unheld_slots(service, date):
+    """Remaining slots minus active holds"""
+    service_id = getattr(service, "pk", service)
+    return max(
+        0, cached_remaining_slots(service_id, date) - held_slots(service_id, date)
+    )
+
+
+def convert_hold(hold_id):
+    """
+    Turn a hold into booked_slots once payment completes. The slots are booked
+    before the hold is dropped, so capacity is never double-sold in between;
+    other holds still count against capacity.
+    Returns the ReservationStatus of the booking: anything but RESERVED means
+    the paid slots could not be booked.
+    """
+    from .inventory import reserve_slots  # inventory imports this module
+
+    service_id, day, slots = parse_hold_id(hold_id)
+    status = reserve_slots(service_id, day, slots, hold_id=hold_id)
+    release_hold(hold_id)
+    return status
+
+
+def sweep_expired_holds(limit=10_000):
+    """Release holds whose TTL has passed. Returns the number released."""
+    store = get_store()
+    released = 0
+    for hold_id, key in store.expired(time.time(), limit):
+        released += store.release(hold_id, key)
+    return released
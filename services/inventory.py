@@ -0,0 +1,225 @@
+"""
+Daily Inventory management: slot reservation and schedule materialisation.
+
+Every reservation is a single conditional UPDATE, so concurrent bookings on
+the same (service, date) never read-modify-write the row and can never push
+booked_slots past capacity or below zero.
+"""
+
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils.enums import ReservationStatus
+
+from .availability import consume_availability, refresh_availability
+from .holds import held_slots
+from .models import AvailabilitySchedule, Inventory, TourService
+
+WEEKDAY_FIELDS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+
+def reserve_slots(service, date, slots=1, hold_id=None):
+    """
+    Atomically book `slots` on a service date. Slots held for other checkouts
+    are not available; `hold_id` is the hold being converted, if any.
+
+    Returns ReservationStatus.RESERVED on success, SOLD_OUT when the row exists
+    but lacks capacity, and UNAVAILABLE when there is no open inventory row.
+    """
+    if slots < 1:
+        raise ValueError("slots must be a positive integer")
+
+    held = held_slots(service, date, exclude=hold_id)
+    updated = Inventory.objects.filter(
+        service=service,
+        date=date,
+        is_available=True,
+        available_slots__gte=F("booked_slots") + F("blocked_slots") + slots + held,
+    ).update(booked_slots=F("booked_slots") + slots, updated_at=timezone.now())
+    if updated:
+        consume_availability(getattr(service, "pk", service), date, slots)
+        return ReservationStatus.RESERVED
+
+    # Slow path only: tell "sold out" apart from "not on sale"
+    if Inventory.objects.filter(service=service, date=date, is_available=True).exists():
+        return ReservationStatus.SOLD_OUT
+    return ReservationStatus.UNAVAILABLE
+
+
+def release_slots(service, date, slots=1):
+    """Atomically give back `slots` previously reserved. Returns True on success."""
+    if slots < 1:
+        raise ValueError("slots must be a positive integer")
+
+    updated = Inventory.objects.filter(
+        service=service, date=date, booked_slots__gte=slots
+    ).update(booked_slots=F("booked_slots") - slots, updated_at=timezone.now())
+    if updated:
+        refresh_availability(
+            service_ids=[getattr(service, "pk", service)], dates=[date]
+        )
+    return bool(updated)
+
+
+def materialize_inventory(days=365, start_date=None, service_ids=None, batch_size=500):
+    """
+    Expand active AvailabilitySchedules into Inventory rows for the next `days`.
+
+    Idempotent: missing days are inserted, days whose capacity changed get their
+    available_slots updated, and untouched days are left alone. Rows are never
+    deleted, since they may already carry bookings.
+    Returns a (created, updated) tuple.
+    """
+    start_date = start_date or timezone.localdate()
+    end_date = start_date + timedelta(days=days - 1)
+    if connection.vendor == "postgresql":
+        result = _materialize_postgresql(start_date, end_date, service_ids)
+    else:
+        result = _materialize_bulk(start_date, end_date, service_ids, batch_size)
+    if any(result):
+        refresh_availability(
+            service_ids=service_ids, start_date=start_date, end_date=end_date
+        )
+    return result
+
+
+def _materialize_postgresql(start_date, end_date, service_ids):
+    """Single INSERT ... SELECT over generate_series with ON CONFLICT upsert"""
+    inventory = Inventory._meta.db_table
+    schedule = AvailabilitySchedule._meta.db_table
+    service = TourService._meta.db_table
+    weekdays = ", ".join(f"s.{field}" for field in WEEKDAY_FIELDS)
+    service_filter = "AND s.service_id = ANY(%(service_ids)s)" if service_ids else ""
+
+    sql = f"""
+        WITH upserted AS (
+            INSERT INTO {inventory} (
+                service_id, date, available_slots, booked_slots, blocked_slots,
+                is_available, notes, created_at, updated_at
+            )
+            SELECT
+                s.service_id,
+                d.day::date,
+                MAX(COALESCE(s.daily_capacity, t.max_capacity)),
+                0, 0, TRUE, '', now(), now()
+            FROM {schedule} s
+            JOIN {service} t ON t.id = s.service_id
+            CROSS JOIN LATERAL generate_series(
+                GREATEST(s.start_date, %(start)s::date),
+                LEAST(s.end_date, %(end)s::date),
+                interval '1 day'
+            ) AS d(day)
+            WHERE s.is_active
+              AND t.is_active
+              AND (ARRAY[{weekdays}])[EXTRACT(ISODOW FROM d.day)::int]
+              {service_filter}
+            GROUP BY s.service_id, d.day::date
+            ON CONFLICT (service_id, date) DO UPDATE
+                SET available_slots = EXCLUDED.available_slots,
+                    updated_at = EXCLUDED.updated_at
+                WHERE {inventory}.available_slots <> EXCLUDED.available_slots
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """
+    params = {"start": start_date, "end": end_date, "service_ids": service_ids}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        created, updated = cursor.fetchone()
+    return created, updated
+
+
+def _materialize_bulk(start_date, end_date, service_ids, batch_size):
+    """Portable fallback: expand per batch of services, then bulk insert/update"""
+    schedules = AvailabilitySchedule.objects.filter(
+        is_active=True,
+        service__is_active=True,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    )
+    if service_ids:
+        schedules = schedules.filter(service_id__in=service_ids)
+    rows = schedules.order_by("service_id").values_list(
+        "service_id",
+        "start_date",
+        "end_date",
+        "daily_capacity",
+        "service__max_capacity",
+        *WEEKDAY_FIELDS,
+    )
+
+    created = updated = 0
+    batch = {}
+    for row in rows.iterator(chunk_size=2000):
+        if row[0] not in batch and len(batch) >= batch_size:
+            c, u = _apply_inventory_batch(batch, start_date, end_date)
+            created, updated, batch = created + c, updated + u, {}
+        batch.setdefault(row[0], []).append(row)
+    if batch:
+        c, u = _apply_inventory_batch(batch, start_date, end_date)
+        created, updated = created + c, updated + u
+    return created, updated
+
+
+def _apply_inventory_batch(batch, start_date, end_date):
+    wanted = {}
+    for service_id, schedule_rows in batch.items():
+        for _, first, last, capacity, max_capacity, *weekdays in schedule_rows:
+            capacity = capacity if capacity is not None else max_capacity
+            day = max(first, start_date)
+            last = min(last, end_date)
+            while day <= last:
+                if weekdays[day.weekday()]:
+                    key = (service_id, day)
+                    wanted[key] = max(wanted.get(key, 0), capacity)
+                day += timedelta(days=1)
+
+    rows = Inventory.objects.filter(
+        service_id__in=batch.keys(), date__range=(start_date, end_date)
+    )
+    existing = {
+        (row.service_id, row.date): row
+        for row in rows.only("id", "service_id", "date", "available_slots")
+    }
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for (service_id, day), capacity in wanted.items():
+        row = existing.get((service_id, day))
+        if row is None:
+            to_create.append(
+                Inventory(service_id=service_id, date=day, available_slots=capacity)
+            )
+        elif row.available_slots != capacity:
+            row.available_slots = capacity
+            row.updated_at = now
+            to_update.append(row)
+
+    created = 0
+    with transaction.atomic():
+        if to_create:
+            # ignore_conflicts skips days another run inserted since `existing`
+            # was read, so count the rows this insert added
+            before = rows.count()
+            Inventory.objects.bulk_create(
+                to_create, batch_size=1000, ignore_conflicts=True
+            )
+            created = rows.count() - before
+        Inventory.objects.bulk_update(
+            to_update, ["available_slots", "updated_at"], batch_size=1000
+        )
+    return created, len(to_update)
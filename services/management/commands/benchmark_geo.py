@@ -0,0 +1,129 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from services.models import ServiceProvider, TourService
+from services.search import SERVICE_LOCATION
+from utils.enums import ServiceType
+from utils.geo import distance_expression, encode_geocell, nearest, within_radius
+
+BATCH_SIZE = 10_000
+MICRODEGREE = Decimal("0.000001")
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert random service meeting points, then time geocell radius and "
+        "nearest-k searches against a full scan. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument(
+            "--scans", type=int, default=5, help="Queries also run as full scans"
+        )
+        parser.add_argument("--radius", type=float, default=25.0, help="km")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        provider = ServiceProvider.objects.select_related("destination").first()
+        if provider is None:
+            raise CommandError("Need at least one service provider")
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            points = self._insert(provider, options["points"], rng)
+            inserted = time.perf_counter() - started
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {TourService._meta.db_table}")
+
+            services = TourService.objects.only("pk")
+            centres = rng.sample(points, min(options["queries"], len(points)))
+            radius, k = options["radius"], options["k"]
+
+            started = time.perf_counter()
+            found = [
+                list(within_radius(services, SERVICE_LOCATION, *centre, radius))
+                for centre in centres
+            ]
+            radius_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for centre in centres:
+                nearest(services, SERVICE_LOCATION, *centre, k)
+            nearest_elapsed = time.perf_counter() - started
+
+            scans = centres[: options["scans"]]
+            started = time.perf_counter()
+            scanned = [self._scan(services, centre, radius) for centre in scans]
+            scan_elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        mismatches = sum(
+            1
+            for rows, expected in zip(found, scanned)
+            if [row.pk for row in rows] != [row.pk for row in expected]
+        )
+        matches = sum(len(rows) for rows in found) / max(len(found), 1)
+        per_query = 1000 / max(len(centres), 1)
+
+        self.stdout.write(f"Points:           {len(points):,} in {inserted:.1f}s")
+        self.stdout.write(f"Radius:           {radius} km, {matches:,.1f} rows/query")
+        self.stdout.write(
+            f"Radius search:    {radius_elapsed * per_query:.2f} ms/query"
+        )
+        self.stdout.write(
+            f"Nearest {k}:       {nearest_elapsed * per_query:.2f} ms/query"
+        )
+        self.stdout.write(
+            f"Full scan:        {scan_elapsed * 1000 / max(len(scans), 1):.2f} ms/query"
+        )
+        if mismatches:
+            raise CommandError(f"{mismatches} searches disagreed with the full scan")
+        self.stdout.write(self.style.SUCCESS("Geocell searches match the full scan"))
+
+    def _insert(self, provider, count, rng):
+        """Random meeting points between 60°S and 70°N; returns their (lat, lon)s"""
+        points = []
+        for start in range(0, count, BATCH_SIZE):
+            batch = []
+            for number in range(start, min(start + BATCH_SIZE, count)):
+                latitude = Decimal(rng.uniform(-60, 70)).quantize(MICRODEGREE)
+                longitude = Decimal(rng.uniform(-180, 180)).quantize(MICRODEGREE)
+                points.append((float(latitude), float(longitude)))
+                batch.append(
+                    TourService(
+                        provider=provider,
+                        destination_id=provider.destination_id,
+                        name=f"Geo benchmark {number}",
+                        slug=f"geo-benchmark-{number}",
+                        description="Benchmark point",
+                        service_type=ServiceType.TOUR,
+                        base_price=0,
+                        duration_hours=1,
+                        featured_image="benchmark.jpg",
+                        meeting_point_latitude=latitude,
+                        meeting_point_longitude=longitude,
+                        geocell=encode_geocell(latitude, longitude),
+                    )
+                )
+            TourService.objects.bulk_create(batch)
+        return points
+
+    def _scan(self, services, centre, radius):
+        """The same search without the geocell index, as a baseline"""
+        return list(
+            services.annotate(
+                distance_km=distance_expression(SERVICE_LOCATION, *centre)
+            )
+            .filter(distance_km__lte=radius)
+            .order_by("distance_km", "pk")
+        )
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from services.inventory import release_slots, reserve_slots
+from services.models import Inventory
+from utils.dates import parse_day
+from utils.enums import ReservationStatus
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a single (service, date) inventory row with parallel reservations "
+        "and report bookings/sec. Reserved slots are released afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("service_id", type=int)
+        parser.add_argument("date", help="Service date (YYYY-MM-DD)")
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument(
+            "--attempts", type=int, default=200, help="Reservations per worker"
+        )
+        parser.add_argument("--slots", type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            date = parse_day(options["date"])
+        except ValueError as exc:
+            raise CommandError(f"date {exc}")
+        service_id = options["service_id"]
+        try:
+            inventory = Inventory.objects.get(service_id=service_id, date=date)
+        except Inventory.DoesNotExist:
+            raise CommandError(f"No inventory for service {service_id} on {date}")
+
+        results = Counter()
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options["workers"])
+
+        def worker():
+            local = Counter()
+            try:
+                start_barrier.wait()
+                for _ in range(options["attempts"]):
+                    local[reserve_slots(service_id, date, options["slots"])] += 1
+            finally:
+                connection.close()
+            with lock:
+                results.update(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["workers"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        inventory.refresh_from_db()
+        reserved = results[ReservationStatus.RESERVED]
+        oversold = inventory.booked_slots + inventory.blocked_slots > (
+            inventory.available_slots
+        )
+        total = sum(results.values())
+
+        self.stdout.write(f"Workers:        {options['workers']}")
+        self.stdout.write(f"Attempts:       {total}")
+        self.stdout.write(f"Reserved:       {reserved}")
+        self.stdout.write(f"Sold out:       {results[ReservationStatus.SOLD_OUT]}")
+        self.stdout.write(f"Elapsed:        {elapsed:.3f}s")
+        self.stdout.write(f"Attempts/sec:   {total / elapsed:,.0f}")
+        self.stdout.write(f"Bookings/sec:   {reserved / elapsed:,.0f}")
+
+        if reserved:
+            release_slots(service_id, date, reserved * options["slots"])
+
+        if oversold:
+            raise CommandError("Inventory was oversold!")
+        self.stdout.write(self.style.SUCCESS("No oversell detected"))
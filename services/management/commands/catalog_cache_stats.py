@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from utils.cache import hit_rates
+
+
+class Command(BaseCommand):
+    help = "Report hits, misses and hit rate of the catalog object cache per model"
+
+    def handle(self, *args, **options):
+        for label, stats in hit_rates().items():
+            rate = stats["hit_rate"]
+            self.stdout.write(
+                f"{label:<28} {stats['hits']:>10,} hits {stats['misses']:>10,} misses "
+                f"{'-' if rate is None else f'{rate:.1%}':>7}"
+            )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from utils.pool import pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Report connection pool usage and wait times per database, across the "
+        "worker processes that shared them"
+    )
+
+    def handle(self, *args, **options):
+        report = pool_stats()
+        if not report:
+            self.stdout.write("No pooled databases configured")
+            return
+        for alias, stats in report.items():
+            wait = stats["average_wait_ms"]
+            self.stdout.write(self.style.SUCCESS(alias))
+            self.stdout.write(
+                f"  requests {stats['requests_num']:,} "
+                f"(queued {stats['requests_queued']:,}, "
+                f"timed out {stats['requests_errors']:,}), "
+                f"average wait {'-' if wait is None else f'{wait:.1f} ms'}"
+            )
+            self.stdout.write(
+                f"  connections opened {stats['connections_num']:,}, "
+                f"failed {stats['connections_errors']:,}, "
+                f"lost {stats['connections_lost']:,}, "
+                f"returned broken {stats['returns_bad']:,}"
+            )
+            for process, sizes in stats["processes"].items():
+                self.stdout.write(
+                    f"  {process:<32} size {sizes['pool_size']}/{sizes['pool_max']} "
+                    f"available {sizes['pool_available']} "
+                    f"waiting {sizes['requests_waiting']}"
+                )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.availability import refresh_availability
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalised ServiceAvailability index from Inventory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--service",
+            type=int,
+            action="append",
+            dest="service_ids",
+            help="Limit to a service id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = refresh_availability(service_ids=options["service_ids"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {written} rows in {elapsed:.1f}s")
+        )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from destinations.models import Destination
+from destinations.search import DESTINATION_LOCATION
+from services.models import TourService
+from services.search import SERVICE_LOCATION
+from utils.geo import refresh_geocells
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the geocells of services and destinations, e.g. after bulk "
+        "imports or updates of their coordinates"
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        services = refresh_geocells(TourService.objects.all(), SERVICE_LOCATION)
+        destinations = refresh_geocells(Destination.objects.all(), DESTINATION_LOCATION)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated {services} service and {destinations} destination "
+                f"geocells in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.stats import rebuild_provider_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ProviderStats rollups; schedule daily so the 30/90 day "
+        "booking windows age out"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--provider",
+            type=int,
+            action="append",
+            dest="provider_ids",
+            help="Limit to a provider id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuilt = rebuild_provider_stats(provider_ids=options["provider_ids"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt stats for {rebuilt} providers in {elapsed:.1f}s"
+            )
+        )
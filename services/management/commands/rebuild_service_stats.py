@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.stats import rebuild_service_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute ServiceStats (ratings, booking counts) for all services"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--service",
+            type=int,
+            action="append",
+            dest="service_ids",
+            help="Limit to a service id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuilt = rebuild_service_stats(service_ids=options["service_ids"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt stats for {rebuilt} services in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.entitlements import reconcile_usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Reset cached subscription plans and quota usage counters from the "
+        "database; schedule periodically to correct drift"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--provider",
+            type=int,
+            action="append",
+            dest="provider_ids",
+            help="Limit to a provider id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        drifted = reconcile_usage(provider_ids=options["provider_ids"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled usage counters in {elapsed:.1f}s "
+                f"({drifted} had drifted)"
+            )
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.holds import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Release booking holds whose TTL has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=10_000)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep sweeping every N seconds (0 = run once)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = sweep_expired_holds(limit=options["limit"])
+            self.stdout.write(f"Released {released} expired holds")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="availabilityschedule",
+            name="daily_capacity",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text=(
+                    "Slots to open per day (defaults to the service's max capacity)"
+                ),
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("destinations", "0001_initial"),
+        ("services", "0002_availabilityschedule_daily_capacity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServiceAvailability",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("remaining_slots", models.PositiveIntegerField(default=0)),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("is_bookable", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "destination",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="destinations.destination",
+                    ),
+                ),
+                (
+                    "service",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="availability_index",
+                        to="services.tourservice",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Service Availability",
+                "verbose_name_plural": "Service Availability",
+                "ordering": ["date"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("is_bookable", True)),
+                        fields=["destination", "date", "remaining_slots", "service"],
+                        name="services_availability_search",
+                    )
+                ],
+                "unique_together": {("service", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+# Frozen copies of the status -> counter mapping and rating scale in
+# services.stats, so that later edits there cannot change this migration
+BOOKING_STATUS_FIELDS = {
+    "pending": "bookings_pending",
+    "confirmed": "bookings_confirmed",
+    "cancelled": "bookings_cancelled",
+    "completed": "bookings_completed",
+}
+RATINGS = range(1, 6)
+BATCH_SIZE = 2000
+
+
+def backfill_service_stats(apps, schema_editor):
+    """
+    Counters for the services that already exist, computed set-based as
+    services.stats.rebuild_service_stats() did when this was written; the
+    signals only apply deltas from here on
+    """
+    TourService = apps.get_model("services", "TourService")
+    ServiceStats = apps.get_model("services", "ServiceStats")
+    Booking = apps.get_model("bookings", "Booking")
+    Review = apps.get_model("bookings", "Review")
+    db = schema_editor.connection.alias
+
+    rating_aggregates = {
+        "rating_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{f"rating_{stars}": Count("id", filter=Q(rating=stars)) for stars in RATINGS},
+    }
+    booking_aggregates = {
+        "bookings_total": Count("id"),
+        **{
+            field: Count("id", filter=Q(status=status))
+            for status, field in BOOKING_STATUS_FIELDS.items()
+        },
+    }
+
+    ids = list(
+        TourService.objects.using(db).order_by("pk").values_list("pk", flat=True)
+    )
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start : start + BATCH_SIZE]
+        rows = {pk: ServiceStats(service_id=pk) for pk in chunk}
+
+        reviews = (
+            Review.objects.using(db)
+            .filter(service_id__in=chunk, is_approved=True)
+            .values("service_id")
+            .annotate(**rating_aggregates)
+        )
+        for values in reviews:
+            stats = rows[values.pop("service_id")]
+            for name, value in values.items():
+                setattr(stats, name, value or 0)
+            if stats.rating_count:
+                stats.average_rating = round(stats.rating_sum / stats.rating_count, 2)
+
+        bookings = (
+            Booking.objects.using(db)
+            .filter(service_id__in=chunk)
+            .values("service_id")
+            .annotate(**booking_aggregates)
+        )
+        for values in bookings:
+            stats = rows[values.pop("service_id")]
+            for name, value in values.items():
+                setattr(stats, name, value)
+
+        ServiceStats.objects.using(db).bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0001_initial"),
+        ("services", "0003_serviceavailability"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServiceStats",
+            fields=[
+                (
+                    "service",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="services.tourservice",
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                (
+                    "average_rating",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=3, null=True
+                    ),
+                ),
+                ("rating_1", models.PositiveIntegerField(default=0)),
+                ("rating_2", models.PositiveIntegerField(default=0)),
+                ("rating_3", models.PositiveIntegerField(default=0)),
+                ("rating_4", models.PositiveIntegerField(default=0)),
+                ("rating_5", models.PositiveIntegerField(default=0)),
+                ("bookings_total", models.PositiveIntegerField(default=0)),
+                ("bookings_pending", models.PositiveIntegerField(default=0)),
+                ("bookings_confirmed", models.PositiveIntegerField(default=0)),
+                ("bookings_cancelled", models.PositiveIntegerField(default=0)),
+                ("bookings_completed", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Service Stats",
+                "verbose_name_plural": "Service Stats",
+                "indexes": [
+                    models.Index(
+                        fields=["average_rating"], name="services_se_average_9fa1a3_idx"
+                    ),
+                    models.Index(
+                        fields=["rating_count"], name="services_se_rating__feda20_idx"
+                    ),
+                    models.Index(
+                        fields=["bookings_total"], name="services_se_booking_a2d0ff_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_service_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:45
+
+from datetime import timedelta
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def backfill_provider_stats(apps, schema_editor):
+    """
+    Counters for the providers that already exist, computed set-based as
+    services.stats.rebuild_provider_stats() did when this was written; the
+    signals only apply deltas from here on
+    """
+    ServiceProvider = apps.get_model("services", "ServiceProvider")
+    ProviderStats = apps.get_model("services", "ProviderStats")
+    ServiceStats = apps.get_model("services", "ServiceStats")
+    TourService = apps.get_model("services", "TourService")
+    Booking = apps.get_model("bookings", "Booking")
+    Payment = apps.get_model("bookings", "Payment")
+    db = schema_editor.connection.alias
+
+    now = timezone.now()
+    last_30, last_90 = now - timedelta(days=30), now - timedelta(days=90)
+
+    ids = list(
+        ServiceProvider.objects.using(db).order_by("pk").values_list("pk", flat=True)
+    )
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start : start + BATCH_SIZE]
+        rows = {pk: ProviderStats(provider_id=pk, refreshed_at=now) for pk in chunk}
+
+        ratings = (
+            ServiceStats.objects.using(db)
+            .filter(service__provider_id__in=chunk)
+            .values("service__provider_id")
+            .annotate(count=Sum("rating_count"), total=Sum("rating_sum"))
+        )
+        for values in ratings:
+            stats = rows[values["service__provider_id"]]
+            stats.rating_count = values["count"] or 0
+            stats.rating_sum = values["total"] or 0
+            if stats.rating_count:
+                stats.average_rating = round(stats.rating_sum / stats.rating_count, 2)
+
+        active = (
+            TourService.objects.using(db)
+            .filter(provider_id__in=chunk, is_active=True)
+            .values("provider_id")
+            .annotate(count=Count("id"))
+        )
+        for values in active:
+            rows[values["provider_id"]].active_services = values["count"]
+
+        bookings = (
+            Booking.objects.using(db)
+            .filter(service__provider_id__in=chunk, booking_date__gte=last_90)
+            .values("service__provider_id")
+            .annotate(
+                last_90=Count("id"),
+                last_30=Count("id", filter=Q(booking_date__gte=last_30)),
+            )
+        )
+        for values in bookings:
+            stats = rows[values["service__provider_id"]]
+            stats.bookings_last_90_days = values["last_90"]
+            stats.bookings_last_30_days = values["last_30"]
+
+        revenue = (
+            Payment.objects.using(db)
+            .filter(booking__service__provider_id__in=chunk, status="completed")
+            .values("booking__service__provider_id")
+            .annotate(total=Sum("provider_payout"))
+        )
+        for values in revenue:
+            stats = rows[values["booking__service__provider_id"]]
+            stats.revenue = values["total"] or Decimal("0")
+
+        ProviderStats.objects.using(db).bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bookings", "0001_initial"),
+        ("services", "0004_servicestats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProviderStats",
+            fields=[
+                (
+                    "provider",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="services.serviceprovider",
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                (
+                    "average_rating",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=3, null=True
+                    ),
+                ),
+                ("active_services", models.PositiveIntegerField(default=0)),
+                ("bookings_last_30_days", models.PositiveIntegerField(default=0)),
+                ("bookings_last_90_days", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Provider payout from completed payments",
+                        max_digits=14,
+                    ),
+                ),
+                (
+                    "refreshed_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Last full rebuild (rolling windows)",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Provider Stats",
+                "verbose_name_plural": "Provider Stats",
+                "indexes": [
+                    models.Index(
+                        fields=["average_rating"], name="services_pr_average_eb2235_idx"
+                    ),
+                    models.Index(
+                        fields=["bookings_last_30_days"],
+                        name="services_pr_booking_410d2e_idx",
+                    ),
+                    models.Index(
+                        fields=["revenue"], name="services_pr_revenue_062286_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_provider_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The trigger utils.search.search_vector_sql() generated for the document
+# in services.search when this migration was written, frozen so that editing the
+# document later cannot change what this migration does.
+INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION services_tourservice_search_vector()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english',
+                coalesce(NEW."name", '')
+            ), 'A') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."short_description", '')
+            ), 'B') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW."description", '')
+            ), 'C') ||
+            setweight(to_tsvector('english',
+                coalesce((SELECT r."name" FROM "destinations_category" r
+                          WHERE r."id" = NEW."category_id"), '')
+                || ' ' ||
+                coalesce((SELECT string_agg(r."name", ' ')
+                          FROM "destinations_amenity" r
+                          JOIN "services_tourservice_amenities" t
+                            ON t."amenity_id" = r."id"
+                          WHERE t."tourservice_id" = NEW."id"), '')
+            ), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS services_tourservice_search_vector
+    ON "services_tourservice"
+    """,
+    """
+    CREATE TRIGGER services_tourservice_search_vector
+    BEFORE INSERT OR UPDATE OF
+        "category_id",
+        "description",
+        "name",
+        "search_vector",
+        "short_description"
+    ON "services_tourservice"
+    FOR EACH ROW EXECUTE FUNCTION services_tourservice_search_vector()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS services_tourservice_search_gin
+    ON "services_tourservice" USING gin (search_vector)
+    """,
+    'UPDATE "services_tourservice" SET search_vector = NULL',
+]
+UNINSTALL = [
+    """
+    DROP TRIGGER IF EXISTS services_tourservice_search_vector
+    ON "services_tourservice"
+    """,
+    "DROP FUNCTION IF EXISTS services_tourservice_search_vector()",
+    "DROP INDEX IF EXISTS services_tourservice_search_gin",
+]
+
+
+def _execute(schema_editor, statements):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def install_trigger(apps, schema_editor):
+    _execute(schema_editor, INSTALL)
+
+
+def uninstall_trigger(apps, schema_editor):
+    _execute(schema_editor, UNINSTALL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0005_providerstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tourservice",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(install_trigger, uninstall_trigger),
+    ]
@@ -1,11 +1,13 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import Avg
 from django.utils.text import slugify
 
 from utils.enums import (Currency, ServiceType, SubscriptionPlan,
                          SubscriptionStatus)
+from utils.geo import encode_geocell
 
 
 class ServiceProvider(models.Model):
@@ -69,18 +71,21 @@ class ServiceProvider(models.Model):
             self.slug = slugify(self.company_name)
         super().save(*args, **kwargs)
 
+    def _get_stats(self):
+        try:
+            return self.stats
+        except ProviderStats.DoesNotExist:
+            return None
+
     @property
     def active_services_count(self):
-        return self.services.filter(is_active=True).count()
+        stats = self._get_stats()
+        return stats.active_services if stats else 0
 
     @property
     def average_rating(self):
-        from bookings.models import Review
-
-        avg = Review.objects.filter(service__provider=self, is_approved=True).aggregate(
-            Avg("rating")
-        )
-        return avg["rating__avg"] or 0
+        stats = self._get_stats()
+        return (stats.average_rating if stats else None) or 0
 
 
 class Subscription(models.Model):
@@ -201,6 +206,8 @@ class TourService(models.Model):
     meeting_point_longitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True
     )
+    # Z-order cell of the meeting point, for radius search (see utils.geo)
+    geocell = models.BigIntegerField(null=True, editable=False, db_index=True)
 
     # Media
     featured_image = models.ImageField(upload_to="services/")
@@ -232,6 +239,9 @@ class TourService(models.Model):
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
 
+    # Full-text search, maintained by a PostgreSQL trigger (see utils.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -250,34 +260,170 @@ class TourService(models.Model):
     def __str__(self):
         return f"{self.name} - {self.provider.company_name}"
 
+    def check_service_quota(self):
+        """
+        Refuse a service becoming active beyond the provider's plan limit. Run
+        by clean() (forms, the admin), not by save().
+        """
+        from .entitlements import can_create_service
+
+        if not (self.provider_id and self.is_active):
+            return
+        adding = self._state.adding or not (
+            TourService.objects.filter(
+                pk=self.pk, provider_id=self.provider_id, is_active=True
+            ).exists()
+        )
+        if adding and not can_create_service(self.provider_id):
+            raise ValidationError(
+                "This provider has reached the active service limit of its plan."
+            )
+
+    def clean(self):
+        super().clean()
+        self.check_service_quota()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.name}-{self.provider.company_name}")
+        self.geocell = encode_geocell(
+            self.meeting_point_latitude, self.meeting_point_longitude
+        )
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {
+            "meeting_point_latitude",
+            "meeting_point_longitude",
+        } & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geocell"}
         super().save(*args, **kwargs)
 
+    def _get_stats(self):
+        try:
+            return self.stats
+        except ServiceStats.DoesNotExist:
+            return None
+
     @property
     def average_rating(self):
-        """Calculate average rating from approved reviews"""
-        from bookings.models import Review
-
-        avg = Review.objects.filter(service=self, is_approved=True).aggregate(
-            Avg("rating")
-        )
-        return avg["rating__avg"]
+        """Average rating from approved reviews (read from ServiceStats)"""
+        stats = self._get_stats()
+        return stats.average_rating if stats else None
 
     @property
     def total_reviews(self):
         """Count total approved reviews"""
-        from bookings.models import Review
-
-        return Review.objects.filter(service=self, is_approved=True).count()
+        stats = self._get_stats()
+        return stats.rating_count if stats else 0
 
     @property
     def total_bookings(self):
         """Count total bookings"""
-        from bookings.models import Booking
+        stats = self._get_stats()
+        return stats.bookings_total if stats else 0
+
+
+class ServiceStats(models.Model):
+    """
+    Denormalised rating and booking aggregates for a TourService.
+    Maintained incrementally by services.stats - do not edit by hand.
+    Listings can select_related("stats") and sort/filter on its columns.
+    """
+
+    service = models.OneToOneField(
+        TourService, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+
+    # Approved reviews
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(
+        max_digits=3, decimal_places=2, null=True, blank=True
+    )
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    # Bookings by status
+    bookings_total = models.PositiveIntegerField(default=0)
+    bookings_pending = models.PositiveIntegerField(default=0)
+    bookings_confirmed = models.PositiveIntegerField(default=0)
+    bookings_cancelled = models.PositiveIntegerField(default=0)
+    bookings_completed = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Service Stats"
+        verbose_name_plural = "Service Stats"
+        indexes = [
+            models.Index(fields=["average_rating"]),
+            models.Index(fields=["rating_count"]),
+            models.Index(fields=["bookings_total"]),
+        ]
+
+    def __str__(self):
+        return f"Stats for service {self.service_id}"
+
+    @property
+    def rating_histogram(self):
+        return {
+            1: self.rating_1,
+            2: self.rating_2,
+            3: self.rating_3,
+            4: self.rating_4,
+            5: self.rating_5,
+        }
+
+
+class ProviderStats(models.Model):
+    """
+    Provider-level rollup of ratings, catalogue size, recent bookings and revenue.
+    Maintained by services.stats - deltas on every change, plus a periodic
+    rebuild that ages the rolling booking windows.
+    """
+
+    provider = models.OneToOneField(
+        ServiceProvider,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
 
-        return Booking.objects.filter(service=self).count()
+    # Approved reviews across all services
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(
+        max_digits=3, decimal_places=2, null=True, blank=True
+    )
+
+    active_services = models.PositiveIntegerField(default=0)
+    bookings_last_30_days = models.PositiveIntegerField(default=0)
+    bookings_last_90_days = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Provider payout from completed payments",
+    )
+
+    refreshed_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last full rebuild (rolling windows)"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Provider Stats"
+        verbose_name_plural = "Provider Stats"
+        indexes = [
+            models.Index(fields=["average_rating"]),
+            models.Index(fields=["bookings_last_30_days"]),
+            models.Index(fields=["revenue"]),
+        ]
+
+    def __str__(self):
+        return f"Stats for provider {self.provider_id}"
 
 
 class AvailabilitySchedule(models.Model):
@@ -302,6 +448,12 @@ class AvailabilitySchedule(models.Model):
     saturday = models.BooleanField(default=False)
     sunday = models.BooleanField(default=False)
 
+    daily_capacity = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Slots to open per day (defaults to the service's max capacity)",
+    )
+
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -370,15 +522,58 @@ class Inventory(models.Model):
 
     @property
     def remaining_slots(self):
-        """Calculate remaining available slots"""
-        return max(0, self.available_slots - self.booked_slots - self.blocked_slots)
+        """Slots not booked, blocked or held for a checkout (see services.holds)"""
+        from .holds import held_slots  # holds imports this module (via availability)
+
+        return max(
+            0,
+            self.available_slots
+            - self.booked_slots
+            - self.blocked_slots
+            - held_slots(self.service_id, self.date),
+        )
 
     @property
     def current_price(self):
-        """Get price for this date (override or base price)"""
+        """Get price for this date (override or base price; see services.pricing)"""
         return self.price_override if self.price_override else self.service.base_price
 
     @property
     def is_fully_booked(self):
         """Check if service is fully booked"""
         return self.remaining_slots <= 0
+
+
+class ServiceAvailability(models.Model):
+    """
+    Denormalised per-day availability index for the search path.
+    Maintained from Inventory by services.availability - do not edit by hand.
+    """
+
+    service = models.ForeignKey(
+        TourService, on_delete=models.CASCADE, related_name="availability_index"
+    )
+    destination = models.ForeignKey(
+        "destinations.Destination", on_delete=models.CASCADE, related_name="+"
+    )
+    date = models.DateField()
+    remaining_slots = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_bookable = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Service Availability"
+        verbose_name_plural = "Service Availability"
+        unique_together = ["service", "date"]
+        ordering = ["date"]
+        indexes = [
+            models.Index(
+                fields=["destination", "date", "remaining_slots", "service"],
+                condition=models.Q(is_bookable=True),
+                name="services_availability_search",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.service_id} - {self.date}: {self.remaining_slots} left"
@@ -0,0 +1,151 @@
+"""
+Price quotes for a service over many dates and guest mixes at once.
+
+The price of a (date, adults, children) booking is:
+
+- adults at the day's price: Inventory.price_override when set, otherwise the
+  service's base_price;
+- children at the service's child_price, or the adult price without one;
+- less group_discount_rate percent of that subtotal once the party reaches
+  GROUP_DISCOUNT_MIN_GUESTS guests.
+
+quote_calendar() loads the service and every Inventory row of the window in
+one query each, then prices each distinct day price once per guest mix and
+shares the result between the days that have it, so a 12-month calendar is
+two queries and a few dozen Decimal computations. Open days count active
+holds against their remaining slots (one HoldStore lookup each, see
+services.holds). Booking amounts come from the same rules through
+price_booking().
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .holds import held_slots
+from .models import Inventory, TourService
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal("100")
+
+
+@dataclass(frozen=True)
+class Quote:
+    service_id: int
+    date: date
+    adults: int
+    children: int
+    currency: str
+    unit_price: Decimal
+    child_price: Decimal
+    subtotal: Decimal
+    discount: Decimal
+    total: Decimal
+    available: bool = False
+    remaining_slots: int = 0
+
+
+def _service(service):
+    if isinstance(service, TourService):
+        return service
+    return TourService.objects.only(
+        "base_price", "child_price", "group_discount_rate", "currency"
+    ).get(pk=service)
+
+
+def _amounts(service, unit_price, adults, children):
+    """(subtotal, discount, total) for one guest mix at one day price"""
+    child_price = (
+        Decimal(service.child_price) if service.child_price is not None else unit_price
+    )
+    subtotal = (unit_price * adults + child_price * children).quantize(CENT)
+    discount = Decimal("0.00")
+    if (
+        service.group_discount_rate
+        and adults + children >= settings.GROUP_DISCOUNT_MIN_GUESTS
+    ):
+        discount = (subtotal * service.group_discount_rate / HUNDRED).quantize(
+            CENT, ROUND_HALF_UP
+        )
+    return child_price, subtotal, discount, subtotal - discount
+
+
+def quote_calendar(service, start_date, end_date, guest_mixes=((1, 0),)):
+    """
+    {day: (Quote per guest mix, in order)} for every day from `start_date`
+    to `end_date` inclusive. `service` is a TourService or its id;
+    `guest_mixes` are (adults, children) pairs. Days without an open
+    inventory row are quoted at the base price with available=False.
+    """
+    service = _service(service)
+    rows = Inventory.objects.filter(
+        service_id=service.pk, date__gte=start_date, date__lte=end_date
+    ).values_list(
+        "date",
+        "price_override",
+        "available_slots",
+        "booked_slots",
+        "blocked_slots",
+        "is_available",
+    )
+    inventory = {row[0]: row[1:] for row in rows}
+
+    priced = {}  # (day price, guest mix) -> amounts, shared between days
+    calendar = {}
+    day = start_date
+    while day <= end_date:
+        override, available, booked, blocked, is_open = inventory.get(
+            day, (None, 0, 0, 0, False)
+        )
+        unit_price = Decimal(override or service.base_price)
+        remaining = max(0, available - booked - blocked)
+        if is_open and remaining:
+            remaining = max(0, remaining - held_slots(service.pk, day))
+        quotes = []
+        for adults, children in guest_mixes:
+            key = (unit_price, adults, children)
+            if key not in priced:
+                priced[key] = _amounts(service, unit_price, adults, children)
+            child_price, subtotal, discount, total = priced[key]
+            quotes.append(
+                Quote(
+                    service_id=service.pk,
+                    date=day,
+                    adults=adults,
+                    children=children,
+                    currency=service.currency,
+                    unit_price=unit_price,
+                    child_price=child_price,
+                    subtotal=subtotal,
+                    discount=discount,
+                    total=total,
+                    available=is_open and remaining >= adults + children,
+                    remaining_slots=remaining if is_open else 0,
+                )
+            )
+        calendar[day] = tuple(quotes)
+        day += timedelta(days=1)
+    return calendar
+
+
+def quote(service, service_date, adults=1, children=0):
+    """The Quote for one booking"""
+    calendar = quote_calendar(service, service_date, service_date, [(adults, children)])
+    return calendar[service_date][0]
+
+
+def price_booking(booking):
+    """Set a Booking's total, discount and final amounts from its quote"""
+    priced = quote(
+        booking.service,
+        booking.service_date,
+        booking.number_of_adults,
+        booking.number_of_children,
+    )
+    booking.currency = priced.currency
+    booking.total_amount = priced.subtotal
+    booking.discount_amount = priced.discount
+    booking.final_amount = priced.total
+    return priced
@@ -0,0 +1,74 @@
+"""
+Full-text search over TourServices (see utils.search), and radius and
+nearest search around their meeting points (see utils.geo). Listings read
+from a replica when one is usable (see utils.db); search results are loaded
+from the catalog cache (see utils.cache).
+"""
+
+from utils.cache import from_catalog
+from utils.db import on_replica
+from utils.geo import GeoIndex, nearest, within_radius
+from utils.search import SearchDocument, search
+
+from .models import TourService
+
+SERVICE_DOCUMENT = SearchDocument(
+    "services.TourService",
+    {
+        "A": ["name"],
+        "B": ["short_description"],
+        "C": ["description"],
+        "D": ["category__name", "amenities__name"],
+    },
+)
+
+SERVICE_LOCATION = GeoIndex("meeting_point_latitude", "meeting_point_longitude")
+
+
+def search_services(
+    query,
+    destination=None,
+    service_type=None,
+    min_price=None,
+    max_price=None,
+    limit=20,
+):
+    """Active services matching `query`, best first (a list), each with `rank`"""
+    services = on_replica(TourService.objects.filter(is_active=True))
+    if destination is not None:
+        services = services.filter(destination=destination)
+    if service_type:
+        services = services.filter(service_type=service_type)
+    if min_price is not None:
+        services = services.filter(base_price__gte=min_price)
+    if max_price is not None:
+        services = services.filter(base_price__lte=max_price)
+    return from_catalog(search(services, SERVICE_DOCUMENT, query, limit), "rank")
+
+
+def services_within(latitude, longitude, radius_km, service_type=None):
+    """Active services meeting within `radius_km`, nearest first"""
+    services = on_replica(TourService.objects.filter(is_active=True))
+    if service_type:
+        services = services.filter(service_type=service_type)
+    return within_radius(
+        services.select_related("provider", "destination"),
+        SERVICE_LOCATION,
+        latitude,
+        longitude,
+        radius_km,
+    )
+
+
+def nearest_services(latitude, longitude, k=10, service_type=None):
+    """The `k` active services meeting nearest the point"""
+    services = on_replica(TourService.objects.filter(is_active=True))
+    if service_type:
+        services = services.filter(service_type=service_type)
+    return nearest(
+        services.select_related("provider", "destination"),
+        SERVICE_LOCATION,
+        latitude,
+        longitude,
+        k,
+    )
@@ -0,0 +1,303 @@
+import logging
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from utils.enums import BookingStatus, PaymentStatus, ReservationStatus
+from utils.search import touch_search_vectors
+
+from .availability import refresh_availability, remove_availability
+from .entitlements import (
+    forget_entitlements,
+    record_booking_delta,
+    record_service_delta,
+)
+from .holds import convert_hold, release_hold
+from .models import (
+    Inventory,
+    ProviderStats,
+    ServiceProvider,
+    ServiceStats,
+    Subscription,
+    TourService,
+)
+from .stats import (
+    apply_active_service_delta,
+    apply_booking_delta,
+    apply_recent_booking_delta,
+    apply_revenue_delta,
+    apply_review_delta,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Inventory)
+def inventory_saved(sender, instance, **kwargs):
+    refresh_availability(service_ids=[instance.service_id], dates=[instance.date])
+
+
+@receiver(post_delete, sender=Inventory)
+def inventory_deleted(sender, instance, **kwargs):
+    remove_availability(instance.service_id, instance.date)
+
+
+@receiver(post_save, sender=ServiceProvider)
+def provider_saved(sender, instance, created, **kwargs):
+    if created:
+        ProviderStats.objects.get_or_create(provider=instance)
+
+
+@receiver(pre_save, sender=TourService)
+def service_before_save(sender, instance, **kwargs):
+    instance._stats_previous = instance._availability_previous = None
+    if not instance._state.adding:
+        previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("provider_id", "is_active", "destination_id", "base_price")
+            .first()
+        )
+        if previous:
+            instance._stats_previous = previous[:2]
+            instance._availability_previous = previous[1:]
+
+
+def _availability_fields(service):
+    """What the availability index copies from a service"""
+    return (service.is_active, service.destination_id, service.base_price)
+
+
+@receiver(post_save, sender=TourService)
+def service_saved(sender, instance, created, **kwargs):
+    if created:
+        ServiceStats.objects.get_or_create(service=instance)
+    else:
+        indexed = getattr(instance, "_availability_previous", None)
+        if indexed != _availability_fields(instance):
+            refresh_availability(service_ids=[instance.pk])
+
+    previous = getattr(instance, "_stats_previous", None)
+    current = (instance.provider_id, instance.is_active)
+    if previous != current:
+        if previous and previous[1]:
+            apply_active_service_delta(previous[0], -1)
+            record_service_delta(previous[0], -1)
+        if instance.is_active:
+            apply_active_service_delta(instance.provider_id, 1)
+            record_service_delta(instance.provider_id, 1)
+
+
+@receiver(post_delete, sender=TourService)
+def service_deleted(sender, instance, **kwargs):
+    if instance.is_active:
+        apply_active_service_delta(instance.provider_id, -1)
+        record_service_delta(instance.provider_id, -1)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    forget_entitlements(instance.provider_id)
+
+
+def _claim_hold(booking):
+    """Clear booking.hold_id atomically so a hold is converted/released once"""
+    if not booking.hold_id:
+        return None
+    claimed = (
+        type(booking)
+        .objects.filter(pk=booking.pk, hold_id=booking.hold_id)
+        .update(hold_id="")
+    )
+    hold_id, booking.hold_id = booking.hold_id, ""
+    return hold_id if claimed else None
+
+
+@receiver(post_save, sender="bookings.Booking")
+def release_cancelled_hold(sender, instance, **kwargs):
+    if instance.status == BookingStatus.CANCELLED:
+        hold_id = _claim_hold(instance)
+        if hold_id:
+            release_hold(hold_id)
+
+
+@receiver(post_save, sender="bookings.Payment")
+def convert_paid_hold(sender, instance, **kwargs):
+    if instance.status != PaymentStatus.COMPLETED:
+        return
+    booking = instance.booking
+    hold_id = _claim_hold(booking)
+    if not hold_id:
+        return
+    status = convert_hold(hold_id)
+    if status != ReservationStatus.RESERVED:
+        # The hold expired and its slots were sold meanwhile: the paid booking
+        # cannot be honoured and needs a refund
+        logger.error(
+            "Booking %s paid but its slots could not be booked (%s); cancelling it",
+            booking.confirmation_code,
+            status,
+        )
+        booking.status = BookingStatus.CANCELLED
+        booking.cancelled_at = timezone.now()
+        booking.save(update_fields=["status", "cancelled_at", "updated_at"])
+
+
+# ServiceStats: remember what a row contributed before the save, then apply
+# the difference once it is committed to the table.
+
+
+def _review_contribution(review):
+    return (review.service_id, review.rating) if review.is_approved else None
+
+
+@receiver(pre_save, sender="bookings.Review")
+def review_before_save(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding:
+        previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("service_id", "rating", "is_approved")
+            .first()
+        )
+    instance._stats_previous = previous[:2] if previous and previous[2] else None
+
+
+@receiver(post_save, sender="bookings.Review")
+def review_saved(sender, instance, **kwargs):
+    previous = getattr(instance, "_stats_previous", None)
+    current = _review_contribution(instance)
+    if previous != current:
+        if previous:
+            apply_review_delta(*previous, -1)
+        if current:
+            apply_review_delta(*current, 1)
+
+
+@receiver(post_delete, sender="bookings.Review")
+def review_deleted(sender, instance, **kwargs):
+    current = _review_contribution(instance)
+    if current:
+        apply_review_delta(*current, -1)
+
+
+@receiver(pre_save, sender="bookings.Booking")
+def booking_before_save(sender, instance, **kwargs):
+    instance._stats_previous = None
+    if not instance._state.adding:
+        instance._stats_previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("service_id", "status")
+            .first()
+        )
+
+
+@receiver(post_save, sender="bookings.Booking")
+def booking_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_stats_previous", None)
+    current = (instance.service_id, instance.status)
+    if previous != current:
+        if previous:
+            apply_booking_delta(*previous, -1)
+        apply_booking_delta(*current, 1)
+    if created:
+        provider_id = instance.service_provider_id
+        apply_recent_booking_delta(
+            instance.service_id, instance.booking_date, 1, provider_id
+        )
+        record_booking_delta(provider_id, instance.booking_date, 1)
+
+
+@receiver(post_delete, sender="bookings.Booking")
+def booking_deleted(sender, instance, **kwargs):
+    provider_id = instance.service_provider_id
+    apply_booking_delta(instance.service_id, instance.status, -1)
+    apply_recent_booking_delta(
+        instance.service_id, instance.booking_date, -1, provider_id
+    )
+    record_booking_delta(provider_id, instance.booking_date, -1)
+
+
+def _payment_revenue(status, provider_payout):
+    return provider_payout if status == PaymentStatus.COMPLETED else 0
+
+
+def _payment_provider(payment):
+    from bookings.models import Booking
+
+    return (
+        Booking.objects.filter(pk=payment.booking_id)
+        .values_list("service__provider_id", flat=True)
+        .first()
+    )
+
+
+@receiver(pre_save, sender="bookings.Payment")
+def payment_before_save(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding:
+        previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("status", "provider_payout")
+            .first()
+        )
+    instance._stats_previous = _payment_revenue(*previous) if previous else 0
+
+
+@receiver(post_save, sender="bookings.Payment")
+def payment_saved(sender, instance, **kwargs):
+    delta = _payment_revenue(instance.status, instance.provider_payout) - getattr(
+        instance, "_stats_previous", 0
+    )
+    if delta:
+        apply_revenue_delta(_payment_provider(instance), delta)
+
+
+@receiver(post_delete, sender="bookings.Payment")
+def payment_deleted(sender, instance, **kwargs):
+    revenue = _payment_revenue(instance.status, instance.provider_payout)
+    if revenue:
+        apply_revenue_delta(_payment_provider(instance), -revenue)
+
+
+# Search vectors: the trigger only sees the service row, so push changes to
+# its amenities and to category/amenity names.
+
+
+@receiver(m2m_changed, sender=TourService.amenities.through)
+def service_amenities_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # amenity.services.clear(): remember which services lose it
+        instance._search_cleared = set(instance.services.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        pk_set = {instance.pk}
+    elif action == "post_clear":
+        pk_set = getattr(instance, "_search_cleared", set())
+    if pk_set:
+        touch_search_vectors(TourService.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_save, sender="destinations.Category")
+@receiver(pre_save, sender="destinations.Amenity")
+def search_name_before_save(sender, instance, **kwargs):
+    instance._search_previous = None
+    if not instance._state.adding:
+        instance._search_previous = (
+            sender.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+        )
+
+
+@receiver(post_save, sender="destinations.Category")
+def category_saved(sender, instance, created, **kwargs):
+    if not created and instance._search_previous != instance.name:
+        touch_search_vectors(TourService.objects.filter(category=instance))
+
+
+@receiver(post_save, sender="destinations.Amenity")
+def amenity_saved(sender, instance, created, **kwargs):
+    if not created and instance._search_previous != instance.name:
+        touch_search_vectors(TourService.objects.filter(amenities=instance))
@@ -0,0 +1,276 @@
+"""
+Incremental maintenance of ServiceStats and ProviderStats.
+
+Review, Booking, Payment and TourService signals apply deltas with F()
+expressions, so the counters never need a read-modify-write. The rebuild_*
+functions recompute everything set-based for backfills, after bulk .update()
+calls that bypass signals, and (for providers) to age the rolling booking
+windows.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    FloatField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from utils.enums import BookingStatus, PaymentStatus, Rating
+
+from .models import ProviderStats, ServiceProvider, ServiceStats, TourService
+
+BOOKING_STATUS_FIELDS = {
+    BookingStatus.PENDING: "bookings_pending",
+    BookingStatus.CONFIRMED: "bookings_confirmed",
+    BookingStatus.CANCELLED: "bookings_cancelled",
+    BookingStatus.COMPLETED: "bookings_completed",
+}
+
+
+def _update(model, key, pk, **updates):
+    """Apply F() updates to the stats row for `pk`, creating it when missing"""
+    rows = model.objects.filter(**{key: pk})
+    if not rows.update(**updates):
+        model.objects.bulk_create([model(**{key: pk})], ignore_conflicts=True)
+        rows.update(**updates)
+
+
+def _rating_updates(rating, delta):
+    """F() updates for rating_count/rating_sum/average_rating on a stats row"""
+    new_count = F("rating_count") + delta
+    new_sum = F("rating_sum") + rating * delta
+    return {
+        "rating_count": new_count,
+        "rating_sum": new_sum,
+        "average_rating": Case(
+            When(
+                rating_count__gt=-delta,
+                then=Cast(new_sum, FloatField()) / new_count,
+            ),
+            default=Value(None),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    }
+
+
+def _provider_of(service_id):
+    return (
+        TourService.objects.filter(pk=service_id)
+        .values_list("provider_id", flat=True)
+        .first()
+    )
+
+
+def apply_review_delta(service_id, rating, delta):
+    """Add (delta=1) or remove (delta=-1) one approved review of `rating` stars"""
+    _update(
+        ServiceStats,
+        "service_id",
+        service_id,
+        **_rating_updates(rating, delta),
+        **{f"rating_{rating}": F(f"rating_{rating}") + delta},
+    )
+
+    provider_id = _provider_of(service_id)
+    if provider_id:
+        _update(
+            ProviderStats, "provider_id", provider_id, **_rating_updates(rating, delta)
+        )
+
+
+def apply_booking_delta(service_id, status, delta):
+    """Add (delta=1) or remove (delta=-1) one booking in `status`"""
+    updates = {"bookings_total": F("bookings_total") + delta}
+    field = BOOKING_STATUS_FIELDS.get(status)
+    if field:
+        updates[field] = F(field) + delta
+    _update(ServiceStats, "service_id", service_id, **updates)
+
+
+def apply_recent_booking_delta(service_id, booking_date, delta, provider_id=None):
+    """Count a booking made at `booking_date` in the provider's rolling windows"""
+    age = timezone.now() - booking_date
+    if age > timedelta(days=90):
+        return
+    provider_id = provider_id or _provider_of(service_id)
+    if not provider_id:
+        return
+    updates = {"bookings_last_90_days": F("bookings_last_90_days") + delta}
+    if age <= timedelta(days=30):
+        updates["bookings_last_30_days"] = F("bookings_last_30_days") + delta
+    _update(ProviderStats, "provider_id", provider_id, **updates)
+
+
+def apply_active_service_delta(provider_id, delta):
+    _update(
+        ProviderStats,
+        "provider_id",
+        provider_id,
+        active_services=F("active_services") + delta,
+    )
+
+
+def apply_revenue_delta(provider_id, amount):
+    if not amount:
+        return
+    _update(ProviderStats, "provider_id", provider_id, revenue=F("revenue") + amount)
+
+
+def rebuild_service_stats(service_ids=None, batch_size=2000):
+    """Recompute ServiceStats from Review/Booking with grouped aggregates"""
+    from bookings.models import Booking, Review
+
+    services = TourService.objects.order_by("pk").values_list("pk", flat=True)
+    if service_ids is not None:
+        services = services.filter(pk__in=service_ids)
+
+    rating_aggregates = {
+        "rating_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{
+            f"rating_{stars}": Count("id", filter=Q(rating=stars))
+            for stars in Rating.values
+        },
+    }
+    booking_aggregates = {
+        "bookings_total": Count("id"),
+        **{
+            field: Count("id", filter=Q(status=status))
+            for status, field in BOOKING_STATUS_FIELDS.items()
+        },
+    }
+    fields = [*rating_aggregates, "average_rating", *booking_aggregates]
+
+    rebuilt = 0
+    ids = list(services.iterator(chunk_size=batch_size))
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        rows = {pk: ServiceStats(service_id=pk) for pk in chunk}
+
+        reviews = (
+            Review.objects.filter(service_id__in=chunk, is_approved=True)
+            .values("service_id")
+            .annotate(**rating_aggregates)
+        )
+        for values in reviews:
+            stats = rows[values.pop("service_id")]
+            for name, value in values.items():
+                setattr(stats, name, value or 0)
+            if stats.rating_count:
+                stats.average_rating = round(stats.rating_sum / stats.rating_count, 2)
+
+        bookings = (
+            Booking.objects.filter(service_id__in=chunk)
+            .values("service_id")
+            .annotate(**booking_aggregates)
+        )
+        for values in bookings:
+            stats = rows[values.pop("service_id")]
+            for name, value in values.items():
+                setattr(stats, name, value)
+
+        ServiceStats.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=["service"],
+            update_fields=[*fields, "updated_at"],
+        )
+        rebuilt += len(rows)
+    return rebuilt
+
+
+def rebuild_provider_stats(provider_ids=None, batch_size=1000):
+    """
+    Recompute ProviderStats from ServiceStats, TourService, Booking and Payment
+    with grouped aggregates. Run periodically so the 30/90 day windows age.
+    """
+    from bookings.models import Booking, Payment
+
+    providers = ServiceProvider.objects.order_by("pk").values_list("pk", flat=True)
+    if provider_ids is not None:
+        providers = providers.filter(pk__in=provider_ids)
+
+    now = timezone.now()
+    last_30, last_90 = now - timedelta(days=30), now - timedelta(days=90)
+
+    rebuilt = 0
+    ids = list(providers.iterator(chunk_size=batch_size))
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        rows = {pk: ProviderStats(provider_id=pk, refreshed_at=now) for pk in chunk}
+
+        ratings = (
+            ServiceStats.objects.filter(service__provider_id__in=chunk)
+            .values("service__provider_id")
+            .annotate(count=Sum("rating_count"), total=Sum("rating_sum"))
+        )
+        for values in ratings:
+            stats = rows[values["service__provider_id"]]
+            stats.rating_count = values["count"] or 0
+            stats.rating_sum = values["total"] or 0
+            if stats.rating_count:
+                stats.average_rating = round(stats.rating_sum / stats.rating_count, 2)
+
+        active = (
+            TourService.objects.filter(provider_id__in=chunk, is_active=True)
+            .values("provider_id")
+            .annotate(count=Count("id"))
+        )
+        for values in active:
+            rows[values["provider_id"]].active_services = values["count"]
+
+        bookings = (
+            Booking.objects.filter(
+                service__provider_id__in=chunk, booking_date__gte=last_90
+            )
+            .values("service__provider_id")
+            .annotate(
+                last_90=Count("id"),
+                last_30=Count("id", filter=Q(booking_date__gte=last_30)),
+            )
+        )
+        for values in bookings:
+            stats = rows[values["service__provider_id"]]
+            stats.bookings_last_90_days = values["last_90"]
+            stats.bookings_last_30_days = values["last_30"]
+
+        revenue = (
+            Payment.objects.filter(
+                booking__service__provider_id__in=chunk,
+                status=PaymentStatus.COMPLETED,
+            )
+            .values("booking__service__provider_id")
+            .annotate(total=Sum("provider_payout"))
+        )
+        for values in revenue:
+            stats = rows[values["booking__service__provider_id"]]
+            stats.revenue = values["total"] or Decimal("0")
+
+        ProviderStats.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=["provider"],
+            update_fields=[
+                "rating_count",
+                "rating_sum",
+                "average_rating",
+                "active_services",
+                "bookings_last_30_days",
+                "bookings_last_90_days",
+                "revenue",
+                "refreshed_at",
+                "updated_at",
+            ],
+        )
+        rebuilt += len(rows)
+    return rebuilt
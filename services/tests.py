@@ -1,3 +1,605 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from bookings.checkout import create_booking
+from bookings.models import Booking, Payment, Review
+from destinations.models import Destination
+from utils.enums import BookingStatus, PaymentMethod, PaymentStatus, ReservationStatus
+
+from .availability import search_available_services
+from .holds import LocalHoldStore, convert_hold, place_hold
+from .inventory import materialize_inventory, release_slots, reserve_slots
+from .models import (
+    AvailabilitySchedule,
+    Inventory,
+    ProviderStats,
+    ServiceAvailability,
+    ServiceProvider,
+    ServiceStats,
+    Subscription,
+    TourService,
+)
+from .pricing import quote, quote_calendar
+from .stats import rebuild_provider_stats, rebuild_service_stats
+
+DAY = date(2030, 1, 7)  # a Monday
+
+
+def make_service(capacity=10, **fields):
+    dmo = User.objects.create(username=f"dmo{User.objects.count()}", user_type="dmo")
+    operator = User.objects.create(
+        username=f"op{User.objects.count()}", user_type="operator"
+    )
+    destination = Destination.objects.create(
+        name="Nairobi",
+        description="d",
+        country="Kenya",
+        city="Nairobi",
+        latitude=-1.2921,
+        longitude=36.8219,
+        featured_image="x.jpg",
+        created_by=dmo,
+    )
+    provider = ServiceProvider.objects.create(
+        user=operator,
+        company_name="Safari Co",
+        description="d",
+        contact_email="a@b.c",
+        contact_phone="1",
+        address="x",
+        destination=destination,
+    )
+    return TourService.objects.create(
+        provider=provider,
+        name="Game drive",
+        description="Game drive safari",
+        service_type="tour",
+        destination=destination,
+        base_price=100,
+        child_price=50,
+        duration_hours=3,
+        max_capacity=capacity,
+        featured_image="x.jpg",
+        **fields,
+    )
+
+
+def make_booking(service, **fields):
+    tourist = User.objects.create(
+        username=f"tourist{User.objects.count()}", user_type="tourist"
+    )
+    fields = {
+        "service_date": DAY,
+        "service_time": "09:00",
+        "total_amount": 100,
+        "final_amount": 100,
+        **fields,
+    }
+    return Booking.objects.create(tourist=tourist, service=service, **fields)
+
+
+class ReserveSlotsTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        Inventory.objects.create(service=self.service, date=DAY, available_slots=5)
+
+    def booked(self):
+        return Inventory.objects.get(service=self.service, date=DAY).booked_slots
+
+    def test_reserves_until_sold_out_without_overselling(self):
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 3), ReservationStatus.RESERVED
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 3), ReservationStatus.SOLD_OUT
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 2), ReservationStatus.RESERVED
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 1), ReservationStatus.SOLD_OUT
+        )
+        self.assertEqual(self.booked(), 5)
+
+    def test_blocked_slots_count_against_capacity(self):
+        Inventory.objects.filter(service=self.service, date=DAY).update(blocked_slots=4)
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 2), ReservationStatus.SOLD_OUT
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 1), ReservationStatus.RESERVED
+        )
+
+    def test_closed_or_missing_day_is_unavailable(self):
+        Inventory.objects.filter(service=self.service, date=DAY).update(
+            is_available=False
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 1), ReservationStatus.UNAVAILABLE
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY + timedelta(days=1), 1),
+            ReservationStatus.UNAVAILABLE,
+        )
+
+    def test_release_never_goes_below_zero(self):
+        reserve_slots(self.service, DAY, 2)
+        self.assertTrue(release_slots(self.service, DAY, 2))
+        self.assertFalse(release_slots(self.service, DAY, 1))
+        self.assertEqual(self.booked(), 0)
+
+    def test_rejects_non_positive_slots(self):
+        with self.assertRaises(ValueError):
+            reserve_slots(self.service, DAY, 0)
+
+
+class AvailabilityIndexTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        self.inventory = Inventory.objects.create(
+            service=self.service, date=DAY, available_slots=6
+        )
+
+    def index(self, service=None, day=DAY):
+        return ServiceAvailability.objects.get(
+            service=service or self.service, date=day
+        )
+
+    def test_follows_inventory_changes(self):
+        row = self.index()
+        self.assertEqual(
+            (row.remaining_slots, row.price, row.is_bookable), (6, 100, True)
+        )
+
+        self.inventory.booked_slots = 4
+        self.inventory.blocked_slots = 2
+        self.inventory.price_override = 80
+        self.inventory.save()
+        row = self.index()
+        self.assertEqual(
+            (row.remaining_slots, row.price, row.is_bookable), (0, 80, False)
+        )
+
+        self.inventory.delete()
+        self.assertFalse(ServiceAvailability.objects.exists())
+
+    def test_follows_only_the_service_fields_it_copies(self):
+        with mock.patch("services.signals.refresh_availability") as refresh:
+            self.service.name = "Night drive"
+            self.service.save()
+            refresh.assert_not_called()
+
+        self.service.base_price = 120
+        self.service.save()
+        self.assertEqual(self.index().price, 120)
+        self.service.is_active = False
+        self.service.save()
+        self.assertFalse(self.index().is_bookable)
+
+    def test_search_filters_on_slots_window_and_destination(self):
+        coast = Destination.objects.create(
+            name="Mombasa",
+            description="d",
+            country="Kenya",
+            city="Mombasa",
+            latitude=-4.0435,
+            longitude=39.6682,
+            featured_image="x.jpg",
+            created_by=self.service.destination.created_by,
+        )
+        other = TourService.objects.create(
+            provider=self.service.provider,
+            name="Dhow cruise",
+            description="d",
+            service_type="tour",
+            destination=coast,
+            base_price=100,
+            duration_hours=3,
+            max_capacity=10,
+            featured_image="x.jpg",
+        )
+        Inventory.objects.create(
+            service=other, date=DAY + timedelta(days=3), available_slots=2
+        )
+        destination = self.service.destination
+        window = (DAY, DAY + timedelta(days=6))
+
+        self.assertEqual(
+            list(search_available_services(destination, *window)), [self.service]
+        )
+        self.assertEqual(
+            list(search_available_services(other.destination, *window, min_slots=2)),
+            [other],
+        )
+        self.assertFalse(
+            search_available_services(other.destination, *window, min_slots=3)
+        )
+        self.assertFalse(
+            search_available_services(
+                destination, DAY + timedelta(days=1), DAY + timedelta(days=6)
+            )
+        )
+        TourService.objects.filter(pk=self.service.pk).update(is_active=False)
+        self.assertFalse(search_available_services(destination, *window))
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        self.service = make_service(group_discount_rate=10)
+        Inventory.objects.create(
+            service=self.service, date=DAY, available_slots=12, price_override=80
+        )
+
+    def test_override_and_child_price(self):
+        priced = quote(self.service, DAY, adults=2, children=1)
+        self.assertEqual((priced.unit_price, priced.child_price), (80, 50))
+        self.assertEqual(
+            (priced.subtotal, priced.discount, priced.total), (210, 0, 210)
+        )
+        self.assertTrue(priced.available)
+
+        closed = quote(self.service.pk, DAY + timedelta(days=1), adults=2)
+        self.assertEqual((closed.unit_price, closed.total), (100, 200))
+        self.assertFalse(closed.available)
+
+    def test_children_pay_the_adult_price_without_a_child_price(self):
+        self.service.child_price = None
+        self.assertEqual(quote(self.service, DAY, adults=1, children=2).total, 240)
+
+    def test_group_discount_from_the_minimum_party(self):
+        with self.settings(GROUP_DISCOUNT_MIN_GUESTS=10):
+            below = quote(self.service, DAY, adults=8, children=1)
+            group = quote(self.service, DAY, adults=8, children=2)
+        self.assertEqual(below.discount, 0)
+        self.assertEqual(
+            (group.subtotal, group.discount, group.total),
+            (Decimal("740.00"), Decimal("74.00"), Decimal("666.00")),
+        )
+
+    def test_bookings_are_created_at_the_quoted_price(self):
+        tourist = User.objects.create(username="guest", user_type="tourist")
+        booking = create_booking(
+            self.service,
+            tourist,
+            DAY,
+            "09:00",
+            number_of_adults=2,
+            number_of_children=1,
+            total_amount=1,
+            final_amount=1,
+        )
+        booking.refresh_from_db()
+        self.assertEqual(
+            (booking.total_amount, booking.discount_amount, booking.final_amount),
+            (210, 0, 210),
+        )
+        self.assertEqual(booking.currency, self.service.currency)
+
+
+class MaterializeInventoryTests(TestCase):
+    def setUp(self):
+        self.service = make_service(capacity=8)
+        AvailabilitySchedule.objects.create(
+            service=self.service,
+            start_date=DAY,
+            end_date=DAY + timedelta(days=13),
+            start_time="09:00",
+            end_time="12:00",
+            monday=True,
+            wednesday=True,
+        )
+
+    def test_creates_scheduled_days_and_is_idempotent(self):
+        self.assertEqual(materialize_inventory(days=14, start_date=DAY), (4, 0))
+        self.assertEqual(materialize_inventory(days=14, start_date=DAY), (0, 0))
+        self.assertEqual(
+            set(Inventory.objects.values_list("available_slots", flat=True)), {8}
+        )
+
+    def test_counts_only_rows_actually_inserted(self):
+        atomic = transaction.atomic
+        inserted = []
+
+        def concurrent_insert(*args, **kwargs):
+            # Another run commits one of the days just before this one writes
+            if not inserted:
+                inserted.append(DAY)
+                Inventory.objects.create(
+                    service=self.service, date=DAY, available_slots=8
+                )
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(transaction, "atomic", concurrent_insert):
+            created, updated = materialize_inventory(days=14, start_date=DAY)
+        self.assertEqual((created, updated), (3, 0))
+        self.assertEqual(Inventory.objects.count(), 4)
+
+    def test_capacity_change_updates_existing_days(self):
+        materialize_inventory(days=14, start_date=DAY)
+        AvailabilitySchedule.objects.update(daily_capacity=3)
+        self.assertEqual(materialize_inventory(days=14, start_date=DAY), (0, 4))
+
+    def test_command_rejects_a_malformed_start(self):
+        for start in ("2030-13-01", "2030-02-30", "tomorrow"):
+            with self.subTest(start=start), self.assertRaises(CommandError):
+                call_command("materialize_inventory", "--start", start)
+        self.assertFalse(Inventory.objects.exists())
+
+
+class BenchmarkReservationsCommandTests(TestCase):
+    def test_rejects_a_malformed_date(self):
+        service = make_service()
+        for day in ("2030-13-01", "2030-02-30", "07/01/2030"):
+            with self.subTest(day=day), self.assertRaisesMessage(CommandError, day):
+                call_command("benchmark_reservations", service.pk, day)
+
+
+class HoldTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        Inventory.objects.create(service=self.service, date=DAY, available_slots=5)
+        patcher = mock.patch("services.holds._store", LocalHoldStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_held_slots_are_not_sold_to_direct_reservations(self):
+        self.assertIsNotNone(place_hold(self.service, DAY, 4))
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 2), ReservationStatus.SOLD_OUT
+        )
+        self.assertEqual(
+            reserve_slots(self.service, DAY, 1), ReservationStatus.RESERVED
+        )
+
+    def test_converting_a_hold_books_its_own_slots(self):
+        hold = place_hold(self.service, DAY, 5)
+        self.assertEqual(convert_hold(hold.id), ReservationStatus.RESERVED)
+        self.assertEqual(
+            Inventory.objects.get(service=self.service, date=DAY).booked_slots, 5
+        )
+        self.assertIsNone(place_hold(self.service, DAY, 1))
+
+    def test_held_slots_are_not_remaining(self):
+        place_hold(self.service, DAY, 3)
+        inventory = Inventory.objects.get(service=self.service, date=DAY)
+        self.assertEqual(inventory.remaining_slots, 2)
+        [[quoted]] = quote_calendar(self.service, DAY, DAY).values()
+        self.assertEqual(quoted.remaining_slots, 2)
+        self.assertFalse(
+            quote_calendar(self.service, DAY, DAY, [(3, 0)])[DAY][0].available
+        )
+
+        place_hold(self.service, DAY, 2)
+        self.assertTrue(inventory.is_fully_booked)
+
+    def test_paid_booking_is_cancelled_when_its_slots_are_gone(self):
+        hold = place_hold(self.service, DAY, 3, ttl=60)
+        tourist = User.objects.create(username="tourist", user_type="tourist")
+        booking = Booking.objects.create(
+            tourist=tourist,
+            service=self.service,
+            service_date=DAY,
+            service_time="09:00",
+            number_of_adults=3,
+            total_amount=300,
+            final_amount=300,
+            hold_id=hold.id,
+        )
+        # The hold lapsed and the slots were sold to someone else
+        Inventory.objects.filter(service=self.service, date=DAY).update(booked_slots=5)
+        with self.assertLogs("services.signals", "ERROR"):
+            Payment.objects.create(
+                booking=booking,
+                amount=300,
+                method=PaymentMethod.CREDIT_CARD,
+                status=PaymentStatus.COMPLETED,
+            )
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, BookingStatus.CANCELLED)
+        self.assertEqual(booking.hold_id, "")
+
+
+class ServiceStatsTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+
+    def stats(self):
+        return ServiceStats.objects.get(service=self.service)
+
+    def review(self, rating, is_approved=True):
+        booking = make_booking(self.service)
+        return Review.objects.create(
+            booking=booking,
+            tourist=booking.tourist,
+            service=self.service,
+            rating=rating,
+            is_approved=is_approved,
+        )
+
+    def assertMatchesRebuild(self):
+        fields = [
+            f.attname for f in ServiceStats._meta.fields if f.name != "updated_at"
+        ]
+        incremental = ServiceStats.objects.values(*fields).get(service=self.service)
+        rebuild_service_stats([self.service.pk])
+        rebuilt = ServiceStats.objects.values(*fields).get(service=self.service)
+        self.assertEqual(incremental, rebuilt)
+
+    def test_only_approved_reviews_count(self):
+        self.review(5)
+        self.review(4)
+        pending = self.review(1, is_approved=False)
+        stats = self.stats()
+        self.assertEqual((stats.rating_count, stats.rating_sum), (2, 9))
+        self.assertEqual(str(stats.average_rating), "4.50")
+        self.assertEqual((stats.rating_5, stats.rating_4, stats.rating_1), (1, 1, 0))
+
+        pending.is_approved = True
+        pending.save()
+        self.assertEqual(str(self.stats().average_rating), "3.33")
+        self.assertMatchesRebuild()
+
+    def test_editing_and_deleting_reviews_moves_the_aggregates(self):
+        review = self.review(2)
+        review.rating = 4
+        review.save()
+        stats = self.stats()
+        self.assertEqual((stats.rating_2, stats.rating_4, stats.rating_sum), (0, 1, 4))
+
+        review.delete()
+        stats = self.stats()
+        self.assertEqual((stats.rating_count, stats.rating_sum), (0, 0))
+        self.assertIsNone(stats.average_rating)
+        self.assertMatchesRebuild()
+
+    def test_booking_status_changes_move_between_counters(self):
+        booking = make_booking(self.service)
+        make_booking(self.service)
+        booking.status = BookingStatus.CONFIRMED
+        booking.save()
+        stats = self.stats()
+        self.assertEqual(
+            (stats.bookings_total, stats.bookings_pending, stats.bookings_confirmed),
+            (2, 1, 1),
+        )
+
+        booking.delete()
+        stats = self.stats()
+        self.assertEqual((stats.bookings_total, stats.bookings_confirmed), (1, 0))
+        self.assertMatchesRebuild()
+
+
+class ProviderStatsTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        self.provider = self.service.provider
+
+    def stats(self):
+        return ProviderStats.objects.get(provider=self.provider)
+
+    def assertMatchesRebuild(self):
+        fields = [
+            "rating_count",
+            "rating_sum",
+            "average_rating",
+            "active_services",
+            "bookings_last_30_days",
+            "bookings_last_90_days",
+            "revenue",
+        ]
+        incremental = ProviderStats.objects.values(*fields).get(provider=self.provider)
+        rebuild_provider_stats([self.provider.pk])
+        rebuilt = ProviderStats.objects.values(*fields).get(provider=self.provider)
+        self.assertEqual(incremental, rebuilt)
+
+    def test_active_services_follow_activation(self):
+        self.assertEqual(self.stats().active_services, 1)
+        self.service.is_active = False
+        self.service.save()
+        self.assertEqual(self.stats().active_services, 0)
+        self.service.is_active = True
+        self.service.save()
+        self.assertEqual(self.stats().active_services, 1)
+        self.assertMatchesRebuild()
+
+    def test_recent_bookings_and_completed_revenue(self):
+        booking = make_booking(self.service)
+        make_booking(self.service)
+        payment = Payment.objects.create(
+            booking=booking, amount=100, method=PaymentMethod.CREDIT_CARD
+        )
+        self.assertEqual(self.stats().revenue, 0)
+
+        payment.status = PaymentStatus.COMPLETED
+        payment.save()
+        stats = self.stats()
+        self.assertEqual(
+            (stats.bookings_last_30_days, stats.bookings_last_90_days), (2, 2)
+        )
+        self.assertEqual(stats.revenue, payment.provider_payout)
+        self.assertMatchesRebuild()
+
+        payment.status = PaymentStatus.REFUNDED
+        payment.save()
+        self.assertEqual(self.stats().revenue, 0)
+        self.assertMatchesRebuild()
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        self.service = make_service()
+        self.provider = self.service.provider
+
+    def add_service(self, **fields):
+        return TourService.objects.create(
+            provider=self.provider,
+            name=f"Tour {TourService.objects.count()}",
+            description="d",
+            service_type="tour",
+            destination=self.service.destination,
+            base_price=100,
+            duration_hours=3,
+            max_capacity=10,
+            featured_image="x.jpg",
+            **fields,
+        )
+
+    def test_activating_beyond_the_service_limit_is_refused(self):
+        for _ in range(4):
+            self.add_service()
+        extra = self.add_service()  # internal saves never fail on the quota
+        with self.assertRaises(ValidationError):
+            TourService(
+                provider=self.provider, name="Another", is_active=True
+            ).check_service_quota()
+        extra.is_active = False
+        extra.save()
+        extra.is_active = True
+        with self.assertRaises(ValidationError):
+            extra.clean()
+
+    def test_booking_beyond_the_booking_limit_is_refused(self):
+        now = timezone.now()
+        Subscription.objects.create(
+            provider=self.provider,
+            monthly_price=0,
+            max_bookings_per_month=2,
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=30),
+            next_billing_date=now + timedelta(days=30),
+        )
+        tourist = User.objects.create(username="traveller", user_type="tourist")
+        book = partial(
+            create_booking,
+            self.service,
+            tourist,
+            DAY,
+            "09:00",
+            total_amount=100,
+            final_amount=100,
+        )
+        booking = book()
+        book()
+        with self.assertRaises(ValidationError):
+            book()
+        booking.status = BookingStatus.CONFIRMED
+        booking.save()  # existing bookings can still change
+        make_booking(self.service)  # and internal saves are not checked
 
-# Create your tests here.
+    def test_quota_reads_the_provider_without_loading_the_service(self):
+        booking = Booking(service=self.service)
+        with self.assertNumQueries(0):
+            self.assertEqual(booking.service_provider_id, self.provider.pk)
+        booking = Booking(service_id=self.service.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(booking.service_provider_id, self.provider.pk)
+        self.assertFalse(Booking.service.is_cached(booking))
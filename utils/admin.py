@@ -0,0 +1,235 @@
+"""
+Changelist performance for large tables, shared by every app's admin.
+
+LargeTableAdminMixin gives a ModelAdmin:
+
+- planner-estimated row counts on PostgreSQL once a table (or a filtered
+  changelist) is above ADMIN_ESTIMATED_COUNT_THRESHOLD rows, instead of an
+  exact COUNT(*) on every page load, and no second unfiltered count;
+- keyset pagination: a "Next" link carries the ordering values of the last
+  row shown, so page N costs an index range scan instead of OFFSET N * size.
+  It is used when the changelist is ordered by concrete, non-null fields
+  and the leading one is indexed;
+- select_related() derived from the foreign keys in list_display, on top of
+  any list_select_related lookups the admin declares (e.g. the relations
+  used by a related object's __str__);
+- deferral of TextField/JSONField/search vector columns the changelist does
+  not show;
+- reads from a replica (see utils.db) when the changelist is only viewed.
+
+Apply it before admin.ModelAdmin in the bases.
+"""
+
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import JSONField, Q, TextField
+from django.utils.functional import cached_property
+
+from .db import read_only
+
+CURSOR_VAR = "cursor"
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for `queryset` on PostgreSQL: pg_class.reltuples
+    for a whole table, the EXPLAIN estimate when filtered. None elsewhere, or
+    when the table has never been analysed.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    query = queryset.query
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct and not query.combinator:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting with the planner's estimate above the threshold"""
+
+    is_estimate = False
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if (
+            estimate is not None
+            and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+        ):
+            self.is_estimate = True
+            return estimate
+        return super().count
+
+
+def list_display_relations(model, list_display):
+    """select_related() lookups for the forward relations shown in list_display"""
+    lookups = []
+    for name in list_display:
+        if not isinstance(name, str):
+            continue
+        path, opts, related = [], model._meta, []
+        for part in name.split("__"):
+            try:
+                field = opts.get_field(part)
+            except FieldDoesNotExist:
+                break
+            if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                break
+            path.append(part)
+            related = path[:]
+            opts = field.related_model._meta
+        if related:
+            lookups.append("__".join(related))
+    return lookups
+
+
+def deferrable_fields(model, list_display):
+    """Large text/JSON/tsvector columns that `list_display` does not show"""
+    return [
+        field.name
+        for field in model._meta.concrete_fields
+        if isinstance(field, (TextField, JSONField, SearchVectorField))
+        and field.name not in list_display
+        and not field.primary_key
+    ]
+
+
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        deferred = deferrable_fields(self.model, self.list_display)
+        return queryset.defer(*deferred) if deferred else queryset
+
+    @cached_property
+    def keyset_fields(self):
+        """[(field, descending)] of the ordering, or None if keyset won't do"""
+        fields = []
+        for part in self.queryset.query.order_by:
+            if not isinstance(part, str):
+                return None
+            name = part.lstrip("-")
+            try:
+                field = self.opts.pk if name == "pk" else self.opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.null or "__" in name:
+                return None
+            fields.append((field, part.startswith("-")))
+        if not fields or not self._is_indexed(fields[0][0]):
+            return None
+        return fields
+
+    def _is_indexed(self, field):
+        if field.primary_key or field.unique or field.db_index:
+            return True
+        leading = [index.fields[0].lstrip("-") for index in self.opts.indexes]
+        leading += [fields[0] for fields in self.opts.unique_together]
+        return field.name in leading or field.attname in leading
+
+    def _encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field, _ in self.keyset_fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def _keyset_filter(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(self.keyset_fields, values, strict=True)
+            ]
+        except (ValueError, TypeError, ValidationError) as exc:
+            raise IncorrectLookupParameters(exc)
+
+        conditions, equal = [], {}
+        for (field, descending), value in zip(self.keyset_fields, values):
+            lookup = "lt" if descending else "gt"
+            conditions.append(Q(**equal, **{f"{field.attname}__{lookup}": value}))
+            equal[field.attname] = value
+        return reduce(or_, conditions)
+
+    def get_results(self, request):
+        super().get_results(request)
+        # Links built from params (sorting, filters) start again from page one
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+        self.cursor = request.GET.get(CURSOR_VAR) if self.keyset_fields else None
+        if self.cursor:
+            self.result_list = self.queryset.filter(self._keyset_filter(self.cursor))[
+                : self.list_per_page
+            ]
+            self.multi_page = True
+            self.can_show_all = False
+        self.count_is_estimate = getattr(self.paginator, "is_estimate", False)
+
+    @cached_property
+    def next_page_url(self):
+        """Keyset link to the page after the rows shown, if there may be one"""
+        if not self.keyset_fields or self.show_all:
+            return None
+        rows = self.result_list
+        if len(rows) < self.list_per_page:
+            return None
+        return self.get_query_string(
+            {CURSOR_VAR: self._encode_cursor(rows[len(rows) - 1])}, remove=[PAGE_VAR]
+        )
+
+    @cached_property
+    def first_page_url(self):
+        return self.get_query_string(remove=[PAGE_VAR])
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in ("GET", "HEAD"):
+            return super().changelist_view(request, extra_context)
+        with read_only():
+            response = super().changelist_view(request, extra_context)
+            # The rows are fetched while rendering
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+    def get_list_select_related(self, request):
+        declared = self.list_select_related
+        lookups = list_display_relations(self.model, self.get_list_display(request))
+        if isinstance(declared, (list, tuple)):
+            lookups += [lookup for lookup in declared if lookup not in lookups]
+        elif declared:
+            return True
+        return lookups or False
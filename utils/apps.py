@@ -0,0 +1,27 @@
+import os
+
+from django.apps import AppConfig
+from django.core import checks
+
+
+class UtilsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "utils"
+
+    def ready(self):
+        from django.core.signals import request_finished
+
+        from .pool import (
+            check_pools,
+            forget_inherited_connections,
+            pooled_aliases,
+            share_pool_stats,
+        )
+        from .tags import connect_signals
+
+        connect_signals()
+
+        checks.register(check_pools)
+        if pooled_aliases():
+            os.register_at_fork(after_in_child=forget_inherited_connections)
+            request_finished.connect(share_pool_stats, dispatch_uid="pool-stats")
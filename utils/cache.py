@@ -0,0 +1,202 @@
+"""
+Versioned read-through cache of catalog objects.
+
+Each cached model (CATALOG) is stored as the model instance itself, with the
+relations a page renders already loaded (select_related/prefetch_related),
+under "catalog:<model>:<pk>:<version>", where the version is that of the
+object's tag in utils.tags. The tag is bumped when the object changes and
+when anything it includes or aggregates does (see utils.tags.DEPENDENCIES):
+a provider rename, a new review, a booking or an inventory change all
+refresh the service. Old payloads are never read again and simply expire.
+
+Tags are bumped once the transaction commits, so a concurrent reader cannot
+cache pre-commit data under the new version. get_object() is two cache reads
+and no queries when warm; get_objects() serves a listing page with two
+get_many() calls and loads all misses in one query; from_catalog() does the
+same for the rows of a listing or search query, which then only selects
+primary keys (and annotations such as the search rank).
+
+Hits and misses are counted per model in each process and added to shared
+counters every CATALOG_CACHE_STATS_EVERY lookups; hit_rates() reports them.
+Rows written with QuerySet.update() send no signals: call invalidate() after
+such writes.
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .counters import add_to_counter
+from .tags import affected_tags, invalidate_tags, tag, tag_versions
+
+OBJECT_KEY = "catalog:{label}:{pk}:{version}"
+STATS_KEY = "catalog:stats:{label}:{outcome}"
+
+
+@dataclass(frozen=True)
+class CachedModel:
+    label: str
+    select_related: tuple = ()
+    prefetch_related: tuple = ()
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    def queryset(self):
+        queryset = self.model._default_manager.all()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+CATALOG = {
+    entry.label: entry
+    for entry in [
+        CachedModel(
+            "services.TourService",
+            select_related=("provider", "category", "destination", "stats"),
+            prefetch_related=("amenities",),
+        ),
+        CachedModel("destinations.Destination"),
+        CachedModel(
+            "bookings.Package",
+            select_related=("destination",),
+            prefetch_related=("packageservice_set__service",),
+        ),
+        CachedModel(
+            "services.ServiceProvider",
+            select_related=("user", "destination"),
+        ),
+    ]
+}
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label
+
+
+def _versions(label, pks):
+    """{pk: current version of the object's tag}"""
+    tags = {tag(label, pk): pk for pk in pks}
+    versions, _ = tag_versions(tags)
+    return {tags[name]: version for name, version in versions.items()}
+
+
+class _HitCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._lookups = 0
+
+    def record(self, label, hits, misses):
+        with self._lock:
+            self._pending[label, "hits"] += hits
+            self._pending[label, "misses"] += misses
+            self._lookups += hits + misses
+            if self._lookups < settings.CATALOG_CACHE_STATS_EVERY:
+                return
+            pending, self._pending, self._lookups = self._pending, Counter(), 0
+        for (label, outcome), count in pending.items():
+            if count:
+                add_to_counter(STATS_KEY.format(label=label, outcome=outcome), count)
+
+    def pending(self):
+        with self._lock:
+            return Counter(self._pending)
+
+
+_hits = _HitCounter()
+
+
+def get_objects(model, pks):
+    """{pk: instance} for the given primary keys (missing objects left out)"""
+    label = _label(model)
+    entry = CATALOG[label]
+    pks = list(dict.fromkeys(pks))
+    versions = _versions(label, pks)
+    keys = {
+        pk: OBJECT_KEY.format(label=label, pk=pk, version=versions[pk]) for pk in pks
+    }
+    found = cache.get_many(list(keys.values()))
+    objects = {pk: found[key] for pk, key in keys.items() if key in found}
+
+    missing = [pk for pk in pks if pk not in objects]
+    if missing:
+        # From the primary: a lagging replica would cache stale rows under the
+        # current version
+        queryset = entry.queryset().using(DEFAULT_DB_ALIAS).filter(pk__in=missing)
+        loaded = {obj.pk: obj for obj in queryset}
+        cache.set_many(
+            {keys[pk]: obj for pk, obj in loaded.items()}, settings.CATALOG_CACHE_TTL
+        )
+        objects.update(loaded)
+    _hits.record(label, len(pks) - len(missing), len(missing))
+    return {pk: objects[pk] for pk in pks if pk in objects}
+
+
+def get_object(model, pk):
+    """One cached instance; raises the model's DoesNotExist like .get()"""
+    obj = get_objects(model, [pk]).get(pk)
+    if obj is None:
+        model = CATALOG[_label(model)].model
+        raise model.DoesNotExist(f"{model._meta.object_name} {pk} does not exist")
+    return obj
+
+
+def from_catalog(queryset, *annotations):
+    """
+    The rows of `queryset`, in order, as cached objects. Only the primary keys
+    and the named `annotations` are selected; the annotations are set on each
+    object returned.
+    """
+    rows = list(queryset.values_list("pk", *annotations))
+    objects = get_objects(queryset.model, [row[0] for row in rows])
+    results = []
+    for pk, *values in rows:
+        obj = objects.get(pk)
+        if obj is not None:
+            for name, value in zip(annotations, values):
+                setattr(obj, name, value)
+            results.append(obj)
+    return results
+
+
+def invalidate(model, pks):
+    """
+    Refresh the objects, and everything that depends on them, once the
+    current transaction commits
+    """
+    pks = set(pks)
+    if pks:
+        invalidate_tags(affected_tags(model, pks))
+
+
+def hit_rates():
+    """{model label: {"hits", "misses", "hit_rate"}} across processes"""
+    keys = {
+        STATS_KEY.format(label=label, outcome=outcome): (label, outcome)
+        for label in CATALOG
+        for outcome in ("hits", "misses")
+    }
+    counts = Counter(
+        {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+    )
+    counts.update(_hits.pending())
+    rates = {}
+    for label in CATALOG:
+        hits, misses = counts[label, "hits"], counts[label, "misses"]
+        lookups = hits + misses
+        rates[label] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else None,
+        }
+    return rates
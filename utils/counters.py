@@ -0,0 +1,12 @@
+"""Counters in the shared cache, added to by every process"""
+
+from django.core.cache import cache
+
+
+def add_to_counter(key, amount):
+    """Add `amount` to the counter `key`, starting it when missing or evicted"""
+    if not cache.add(key, amount, None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, None)
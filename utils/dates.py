@@ -0,0 +1,28 @@
+"""Strict YYYY-MM-DD dates from query strings and command options"""
+
+from django.core.management.base import CommandError
+from django.utils.dateparse import parse_date
+
+
+def parse_day(value):
+    """
+    The day `value` names (None when empty). Raises ValueError when it is
+    malformed or not a real day (e.g. 2025-02-30) instead of returning None.
+    """
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:  # well formed but not a real day
+        day = None
+    if day is None:
+        raise ValueError(f"must be a valid date (YYYY-MM-DD), got {value!r}")
+    return day
+
+
+def date_option(options, name):
+    """The --<name> option of a management command as a date, or None"""
+    try:
+        return parse_day(options[name])
+    except ValueError as exc:
+        raise CommandError(f"--{name} {exc}")
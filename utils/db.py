@@ -0,0 +1,204 @@
+"""
+Read replicas with read-your-writes.
+
+DATABASE_REPLICAS names the DATABASES aliases that replicate "default".
+ReplicaRouter sends every write, and every read by default, to the primary.
+Work that only reads opts in to a replica:
+
+- read_only(), as a context manager or decorator, around code that is
+  evaluated inside it (report generation, admin changelists);
+- on_replica(queryset) for lazy querysets handed back to the caller
+  (catalog listings and search).
+
+A replica is used while its replay lag is at most DATABASE_REPLICA_MAX_LAG
+seconds, checked at most every DATABASE_REPLICA_CHECK_INTERVAL seconds per
+process; otherwise (or when the check fails) reads fall back to the primary.
+
+Once code has written, the rest of that request or task reads the primary,
+as do reads inside a transaction on it. PrimaryPinMiddleware also sets a
+cookie after a request that wrote, keeping the client on the primary for
+DATABASE_PRIMARY_PIN_SECONDS so the next page shows its own changes even
+from a lagging replica.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = "db_primary"
+
+LAG_SQL = {
+    "postgresql": """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(
+                EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+            )
+        END
+    """,
+}
+
+
+@dataclass
+class RoutingState:
+    pinned: bool = False  # the client wrote recently
+    wrote: bool = False  # this request or task wrote
+    read_only: int = 0  # depth of read_only() blocks
+
+    @property
+    def primary_only(self):
+        return (
+            self.pinned or self.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        )
+
+
+_routing = ContextVar("db_routing", default=None)
+
+
+def routing_state():
+    state = _routing.get()
+    if state is None:
+        state = RoutingState()
+        _routing.set(state)
+    return state
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """
+    Fresh routing state for one request or background task, so a write in
+    one does not keep the next on the primary
+    """
+    state = RoutingState(pinned=pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+# Replica health
+
+
+_checked = {}  # alias -> (monotonic time, healthy)
+_checked_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """Replay lag of the replica in seconds (0 where it cannot be measured)"""
+    connection = connections[alias]
+    sql = LAG_SQL.get(connection.vendor)
+    if sql is None:
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _checked_lock:
+        checked = _checked.get(alias)
+    if checked and now - checked[0] < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        healthy = replica_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG
+    except DatabaseError:
+        healthy = False
+    with _checked_lock:
+        _checked[alias] = (now, healthy)
+    return healthy
+
+
+def read_alias():
+    """A healthy replica when this code may read from one, else the primary"""
+    if routing_state().primary_only:
+        return DEFAULT_DB_ALIAS
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+# Opting in
+
+
+@contextmanager
+def _read_only():
+    state = routing_state()
+    state.read_only += 1
+    try:
+        yield
+    finally:
+        state.read_only -= 1
+
+
+def read_only(func=None):
+    """Read from a replica inside the block (or decorated function)"""
+    if func is None:
+        return _read_only()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _read_only():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def on_replica(queryset):
+    """`queryset` bound to a replica, chosen now, when one may be used"""
+    return queryset.using(read_alias())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = routing_state()
+        if state.primary_only:
+            return DEFAULT_DB_ALIAS
+        if state.read_only:
+            return read_alias()
+        return None  # the instance's database, or the primary
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != "sessions":
+            routing_state().wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    """Per-request routing state, pinned to the primary after recent writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_scope(pinned=PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
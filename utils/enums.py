@@ -30,6 +30,11 @@ class PaymentStatus(models.TextChoices):
     REFUNDED = "refunded", "Refunded"
 
 
+class PayoutLineKind(models.TextChoices):
+    PAYMENT = "payment", "Payment"
+    REFUND = "refund", "Refund"
+
+
 class PaymentMethod(models.TextChoices):
     CREDIT_CARD = "credit_card", "Credit Card"
     DEBIT_CARD = "debit_card", "Debit Card"
@@ -63,6 +68,12 @@ class MetricType(models.TextChoices):
     CONVERSION_RATE = "conversion_rate", "Conversion Rate"
 
 
+class RollupPeriod(models.TextChoices):
+    WEEK = "week", "Weekly"
+    MONTH = "month", "Monthly"
+    YEAR = "year", "Yearly"
+
+
 class Currency(models.TextChoices):
     USD = "USD", "US Dollar"
     EUR = "EUR", "Euro"
@@ -84,3 +95,9 @@ class SubscriptionStatus(models.TextChoices):
     EXPIRED = "expired", "Expired"
     CANCELLED = "cancelled", "Cancelled"
     SUSPENDED = "suspended", "Suspended"
+
+
+class ReservationStatus(models.TextChoices):
+    RESERVED = "reserved", "Reserved"
+    SOLD_OUT = "sold_out", "Sold Out"
+    UNAVAILABLE = "unavailable", "Not Available"
@@ -0,0 +1,22 @@
+"""Query expressions shared by models and their migrations"""
+
+from django.db.models import FloatField, Func
+from django.db.models.functions import Cast
+
+
+class DecimalDivide(Func):
+    """
+    dividend / divisor in numeric arithmetic. SQLite keeps whole-number
+    decimals as integers and would divide them as integers, so there (and
+    only there) the divisor is made REAL.
+    """
+
+    arg_joiner = " / "
+    template = "(%(expressions)s)"
+    arity = 2
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        dividend, divisor = self.get_source_expressions()
+        real = self.copy()
+        real.set_source_expressions([dividend, Cast(divisor, FloatField())])
+        return super(DecimalDivide, real).as_sql(compiler, connection, **extra_context)
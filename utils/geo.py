@@ -0,0 +1,208 @@
+"""
+Radius and nearest-k search over latitude/longitude columns, without PostGIS.
+
+Each located row stores a geocell: its latitude and longitude quantised to
+CELL_BITS bits each and bit-interleaved (a Z-order / Morton code, the integer
+form of a geohash) in an indexed BigIntegerField. Every coarser cell is then
+one contiguous range of geocells, so a search area becomes a handful of
+BETWEEN ranges on that index:
+
+1. cover the circle's bounding box with at most MAX_COVER_CELLS cells of the
+   finest level that allows it, merging neighbouring ranges;
+2. keep candidates in those ranges and inside the bounding box itself;
+3. compute the exact great-circle distance for the candidates in SQL, in
+   one pass over the set, and filter and order by it.
+
+Works the same on PostgreSQL and SQLite (Django registers the math functions
+there). nearest() widens the radius until it has k rows, which are then
+exactly the k nearest. Bulk writes bypass Model.save(); follow them with
+refresh_geocells() (or the rebuild_geocells command).
+"""
+
+import math
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_BITS = 26  # per axis: cells of ~0.3 m, codes fit a signed 64-bit column
+MAX_COVER_CELLS = 16
+NEAREST_START_KM = 5.0
+
+
+@dataclass(frozen=True)
+class GeoIndex:
+    latitude: str
+    longitude: str
+    cell: str = "geocell"
+
+
+def _spread(value):
+    """Bits of `value` moved to the even positions of a 64-bit word"""
+    value &= 0xFFFFFFFF
+    value = (value | value << 16) & 0x0000FFFF0000FFFF
+    value = (value | value << 8) & 0x00FF00FF00FF00FF
+    value = (value | value << 4) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value << 2) & 0x3333333333333333
+    return (value | value << 1) & 0x5555555555555555
+
+
+def _quantise(latitude, longitude):
+    top = (1 << CELL_BITS) - 1
+    x = int((float(longitude) + 180.0) / 360.0 * (1 << CELL_BITS))
+    y = int((float(latitude) + 90.0) / 180.0 * (1 << CELL_BITS))
+    return min(max(x, 0), top), min(max(y, 0), top)
+
+
+def _interleave(x, y):
+    return _spread(x) << 1 | _spread(y)
+
+
+def encode_geocell(latitude, longitude):
+    """The finest-level cell of a point, or None without coordinates"""
+    if latitude is None or longitude is None:
+        return None
+    return _interleave(*_quantise(latitude, longitude))
+
+
+def bounding_boxes(latitude, longitude, radius_km):
+    """
+    [(lat_min, lat_max, lon_min, lon_max)] enclosing the circle: one box, two
+    across the antimeridian, a full band of longitudes around a pole
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    if angle >= math.pi:
+        return [(-90.0, 90.0, -180.0, 180.0)]
+    spread = math.degrees(angle)
+    lat_min, lat_max = latitude - spread, latitude + spread
+    ratio = math.sin(angle) / math.cos(math.radians(latitude))
+    if lat_min <= -90.0 or lat_max >= 90.0 or ratio >= 1.0:
+        return [(max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0)]
+
+    width = math.degrees(math.asin(ratio))
+    lon_min, lon_max = longitude - width, longitude + width
+    if lon_min < -180.0:
+        return [
+            (lat_min, lat_max, lon_min + 360.0, 180.0),
+            (lat_min, lat_max, -180.0, lon_max),
+        ]
+    if lon_max > 180.0:
+        return [
+            (lat_min, lat_max, lon_min, 180.0),
+            (lat_min, lat_max, -180.0, lon_max - 360.0),
+        ]
+    return [(lat_min, lat_max, lon_min, lon_max)]
+
+
+def cover_ranges(boxes):
+    """Sorted, merged [(low, high)] geocell ranges covering the boxes"""
+    ranges = []
+    for lat_min, lat_max, lon_min, lon_max in boxes:
+        x_low, y_low = _quantise(lat_min, lon_min)
+        x_high, y_high = _quantise(lat_max, lon_max)
+        for level in range(CELL_BITS, -1, -1):
+            shift = CELL_BITS - level
+            columns = (x_high >> shift) - (x_low >> shift) + 1
+            rows = (y_high >> shift) - (y_low >> shift) + 1
+            if columns * rows <= MAX_COVER_CELLS:
+                break
+        size = 1 << 2 * shift
+        for x in range(x_low >> shift, (x_high >> shift) + 1):
+            for y in range(y_low >> shift, (y_high >> shift) + 1):
+                low = _interleave(x, y) << 2 * shift
+                ranges.append((low, low + size - 1))
+
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def distance_expression(index, latitude, longitude):
+    """Haversine distance in km from the point to each row, as SQL"""
+    origin = math.radians(latitude)
+    row_latitude = Radians(Cast(F(index.latitude), FloatField()))
+    row_longitude = Radians(Cast(F(index.longitude), FloatField()))
+    half_chord = Power(Sin((row_latitude - Value(origin)) * Value(0.5)), 2) + Value(
+        math.cos(origin)
+    ) * Cos(row_latitude) * Power(
+        Sin((row_longitude - Value(math.radians(longitude))) * Value(0.5)), 2
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(Least(half_chord, Value(1.0))))
+
+
+def within_radius(queryset, index, latitude, longitude, radius_km):
+    """
+    Rows of `queryset` within `radius_km` of the point, nearest first, each
+    annotated with `distance_km`
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    boxes = bounding_boxes(latitude, longitude, radius_km)
+    cells = reduce(
+        or_,
+        (
+            Q(**{f"{index.cell}__range": cell_range})
+            for cell_range in cover_ranges(boxes)
+        ),
+    )
+    # A micro-degree of slack so decimal rounding of the bounds loses nothing
+    in_box = reduce(
+        or_,
+        (
+            Q(
+                **{
+                    f"{index.latitude}__gte": lat_min - 1e-6,
+                    f"{index.latitude}__lte": lat_max + 1e-6,
+                    f"{index.longitude}__gte": lon_min - 1e-6,
+                    f"{index.longitude}__lte": lon_max + 1e-6,
+                }
+            )
+            for lat_min, lat_max, lon_min, lon_max in boxes
+        ),
+    )
+    return (
+        queryset.filter(cells, in_box)
+        .annotate(distance_km=distance_expression(index, latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+        .order_by("distance_km", "pk")
+    )
+
+
+def nearest(queryset, index, latitude, longitude, k=10, start_km=NEAREST_START_KM):
+    """
+    The `k` rows of `queryset` nearest the point (a list, nearest first, with
+    `distance_km`). The search radius grows fourfold until k rows fall inside.
+    """
+    radius = start_km
+    while True:
+        rows = list(within_radius(queryset, index, latitude, longitude, radius)[:k])
+        if len(rows) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+            return rows
+        radius *= 4
+
+
+def refresh_geocells(queryset, index, batch_size=2000):
+    """Recompute stored geocells after bulk writes; returns rows changed"""
+    fields = ("pk", index.latitude, index.longitude, index.cell)
+    changed = []
+    updated = 0
+    for pk, latitude, longitude, stored in queryset.values_list(*fields).iterator(
+        chunk_size=batch_size
+    ):
+        cell = encode_geocell(latitude, longitude)
+        if cell != stored:
+            changed.append(queryset.model(pk=pk, **{index.cell: cell}))
+        if len(changed) >= batch_size:
+            updated += len(changed)
+            queryset.model.objects.bulk_update(changed, [index.cell])
+            changed = []
+    if changed:
+        updated += len(changed)
+        queryset.model.objects.bulk_update(changed, [index.cell])
+    return updated
@@ -0,0 +1,217 @@
+"""
+Pooled PostgreSQL connections.
+
+A database with OPTIONS["pool"] (see core/settings/production.py) gets one
+psycopg 3 ConnectionPool per worker process: threads borrow a connection for
+a request and give it back, so a pod holds at most max_size connections per
+process instead of one per thread kept for CONN_MAX_AGE. Connections are
+checked when borrowed, and replaced when broken or past max_lifetime.
+
+Pools and connections must not cross a fork: the child would share the
+parent's sockets. After a fork the child forgets the inherited ones without
+closing them (that would end the parent's sessions too) and opens its own
+pool on first use.
+
+Each process adds its pool statistics (requests, time spent waiting for a
+connection, timeouts, connections opened and lost) to shared counters at
+most every DATABASE_POOL_STATS_INTERVAL seconds, when a request finishes,
+and publishes its current pool size; pool_stats() reads them back.
+"""
+
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import connections
+
+from .counters import add_to_counter
+
+COUNTER_KEY = "dbpool:{alias}:{stat}"
+PROCESS_KEY = "dbpool:{alias}:process:{process}"
+PROCESSES_KEY = "dbpool:{alias}:processes"
+
+COUNTERS = (
+    "requests_num",
+    "requests_queued",
+    "requests_wait_ms",
+    "requests_errors",
+    "returns_bad",
+    "usage_ms",
+    "connections_num",
+    "connections_errors",
+    "connections_lost",
+)
+GAUGES = ("pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting")
+
+
+def pooled_aliases():
+    return [
+        alias
+        for alias, database in settings.DATABASES.items()
+        if database.get("OPTIONS", {}).get("pool")
+    ]
+
+
+def _pool_registry(connection):
+    """
+    The {alias: pool} registry the PostgreSQL backend keeps per process, or
+    None for other backends. DatabaseWrapper._connection_pools is private to
+    Django (5.1+, checked against 5.2): re-check it when upgrading Django.
+    """
+    return getattr(connection, "_connection_pools", None)
+
+
+def _open_pools():
+    """{alias: pool} for the pools this process has created"""
+    pools = {}
+    for alias in pooled_aliases():
+        pool = (_pool_registry(connections[alias]) or {}).get(alias)
+        if pool is not None and not pool.closed:
+            pools[alias] = pool
+    return pools
+
+
+# Forks
+
+_inherited = []
+
+
+def forget_inherited_connections():
+    """In a forked child: drop the parent's pools and connections unclosed"""
+    for alias in pooled_aliases():
+        pools = _pool_registry(connections[alias])
+        if pools:
+            # Kept referenced so they are never finalised in this process
+            _inherited.append(dict(pools))
+            pools.clear()
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _inherited.append(connection.connection)
+            connection.connection = None
+
+
+# Statistics
+
+_last_shared = 0.0
+_shared_lock = threading.Lock()
+
+
+def _process():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def share_pool_stats(**kwargs):
+    """Add this process's pool statistics to the shared ones (throttled)"""
+    global _last_shared
+    interval = settings.DATABASE_POOL_STATS_INTERVAL
+    now = time.monotonic()
+    with _shared_lock:
+        if now - _last_shared < interval:
+            return
+        _last_shared = now
+
+    process = _process()
+    ttl = max(3 * interval, 60)  # a process that stops reporting drops out
+    for alias, pool in _open_pools().items():
+        stats = pool.pop_stats()
+        for stat in COUNTERS:
+            if stats.get(stat):
+                add_to_counter(COUNTER_KEY.format(alias=alias, stat=stat), stats[stat])
+        cache.set(
+            PROCESS_KEY.format(alias=alias, process=process),
+            {stat: stats.get(stat, 0) for stat in GAUGES},
+            ttl,
+        )
+        # Racing writers may drop a process; it is added back next time
+        seen = time.time()
+        processes = {
+            name: last
+            for name, last in (
+                cache.get(PROCESSES_KEY.format(alias=alias)) or {}
+            ).items()
+            if seen - last < ttl
+        }
+        processes[process] = seen
+        cache.set(PROCESSES_KEY.format(alias=alias), processes, None)
+
+
+def pool_stats():
+    """
+    {alias: counters, "average_wait_ms" and {process: current sizes}} for
+    every pooled database, across the processes that shared them
+    """
+    report = {}
+    for alias in pooled_aliases():
+        keys = {COUNTER_KEY.format(alias=alias, stat=stat): stat for stat in COUNTERS}
+        found = cache.get_many(list(keys))
+        totals = {stat: found.get(key, 0) for key, stat in keys.items()}
+        requests = totals["requests_num"]
+        totals["average_wait_ms"] = (
+            totals["requests_wait_ms"] / requests if requests else None
+        )
+
+        processes = sorted(cache.get(PROCESSES_KEY.format(alias=alias)) or {})
+        gauges = cache.get_many(
+            [PROCESS_KEY.format(alias=alias, process=name) for name in processes]
+        )
+        totals["processes"] = {
+            name: gauges[PROCESS_KEY.format(alias=alias, process=name)]
+            for name in processes
+            if PROCESS_KEY.format(alias=alias, process=name) in gauges
+        }
+        report[alias] = totals
+    return report
+
+
+# Checks
+
+
+def check_pools(app_configs=None, **kwargs):
+    errors = []
+    for alias in pooled_aliases():
+        database = settings.DATABASES[alias]
+        options = database["OPTIONS"]["pool"]
+        options = {} if options is True else options
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            errors.append(
+                checks.Error(
+                    f"Database '{alias}' is pooled but psycopg_pool is not installed.",
+                    hint="Install psycopg[pool] (psycopg 3).",
+                    id="utils.E001",
+                )
+            )
+        if database.get("CONN_MAX_AGE"):
+            errors.append(
+                checks.Error(
+                    f"Database '{alias}' is pooled and sets CONN_MAX_AGE.",
+                    hint="Pooled databases need CONN_MAX_AGE = 0.",
+                    id="utils.E002",
+                )
+            )
+        min_size = options.get("min_size", 4)
+        max_size = options.get("max_size") or min_size
+        if max_size < min_size:
+            errors.append(
+                checks.Error(
+                    f"Database '{alias}' pool max_size {max_size} is below "
+                    f"min_size {min_size}.",
+                    id="utils.E003",
+                )
+            )
+        if "check" not in options:
+            errors.append(
+                checks.Warning(
+                    f"Database '{alias}' pool does not check connections on "
+                    "checkout; a dropped connection fails the request using it.",
+                    hint="Set OPTIONS['pool']['check'] to "
+                    "ConnectionPool.check_connection.",
+                    id="utils.W001",
+                )
+            )
+    return errors
@@ -0,0 +1,209 @@
+"""
+Weighted full-text search over model "documents".
+
+A SearchDocument names the fields that feed a model's search_vector column,
+by weight: A (e.g. name) ranks above B (short description), C (description)
+and D (category, amenities, place names). Fields may follow one foreign key
+or many-to-many hop ("category__name", "amenities__name").
+
+On PostgreSQL a BEFORE INSERT/UPDATE trigger keeps search_vector current and
+a GIN index serves the @@ match, so a ranked search is an index scan plus a
+top-N sort. Each app's search_vector migration installs them with SQL frozen
+from search_vector_sql(document); a test checks the frozen SQL still matches
+the document. Changes to related rows are pushed with touch_search_vectors(),
+which re-fires the trigger.
+
+Other databases (SQLite in tests) have no search_vector contents; search()
+falls back to icontains matching with the same weights, words, "phrases" and
+-exclusions, so callers and results look the same either way.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import add, and_, or_
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.2, "D": 0.1}  # PostgreSQL's defaults
+VECTOR_FIELD = "search_vector"
+# A word or "quoted phrase", optionally -excluded
+TERM = re.compile(r'(-?)(?:"([^"]+)"|(\S+))')
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    model_label: str
+    weights: dict = field(default_factory=dict)  # weight -> field lookups
+
+    @property
+    def model(self):
+        from django.apps import apps
+
+        return apps.get_model(self.model_label)
+
+
+def _quote(name):
+    return f'"{name}"'
+
+
+def _field_sql(model, lookup):
+    """SQL for one document field of the NEW row inside the trigger"""
+    q = _quote
+    if "__" not in lookup:
+        column = model._meta.get_field(lookup).column
+        return f"NEW.{q(column)}"
+
+    relation, target = lookup.split("__", 1)
+    related = model._meta.get_field(relation)
+    remote = related.related_model._meta
+    column = q(remote.get_field(target).column)
+    if related.many_to_many:
+        through = related.remote_field.through._meta
+        source = q(related.m2m_column_name())
+        target_fk = q(related.m2m_reverse_name())
+        return (
+            f"(SELECT string_agg(r.{column}, ' ') FROM {q(remote.db_table)} r "
+            f"JOIN {q(through.db_table)} t ON t.{target_fk} = r.{q(remote.pk.column)} "
+            f"WHERE t.{source} = NEW.{q(model._meta.pk.column)})"
+        )
+    return (
+        f"(SELECT r.{column} FROM {q(remote.db_table)} r "
+        f"WHERE r.{q(remote.pk.column)} = NEW.{q(related.column)})"
+    )
+
+
+def search_vector_sql(document):
+    """
+    (install, uninstall) PostgreSQL statements for the document's trigger and
+    GIN index. Migrations freeze their output; a change to a document needs a
+    new migration with the regenerated statements.
+    """
+    model = document.model
+    table = model._meta.db_table
+    function, index = f"{table}_search_vector", f"{table}_search_gin"
+    config = settings.SEARCH_CONFIG
+    q = _quote
+
+    parts = []
+    for weight, lookups in sorted(document.weights.items()):
+        text = " || ' ' || ".join(
+            f"coalesce({_field_sql(model, lookup)}, '')" for lookup in lookups
+        )
+        parts.append(f"setweight(to_tsvector('{config}', {text}), '{weight}')")
+
+    # Recompute only when a source column changes, or when touched
+    columns = {VECTOR_FIELD}
+    for lookups in document.weights.values():
+        for lookup in lookups:
+            source = model._meta.get_field(lookup.split("__")[0])
+            if source.concrete and not source.many_to_many:
+                columns.add(source.column)
+
+    install = [
+        f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$ "
+        f"BEGIN NEW.{VECTOR_FIELD} := {' || '.join(parts)}; RETURN NEW; END "
+        f"$$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {function} ON {q(table)}",
+        f"CREATE TRIGGER {function} BEFORE INSERT OR UPDATE OF "
+        f"{', '.join(q(column) for column in sorted(columns))} ON {q(table)} "
+        f"FOR EACH ROW EXECUTE FUNCTION {function}()",
+        f"CREATE INDEX IF NOT EXISTS {index} ON {q(table)} USING gin ({VECTOR_FIELD})",
+        f"UPDATE {q(table)} SET {VECTOR_FIELD} = NULL",
+    ]
+    uninstall = [
+        f"DROP TRIGGER IF EXISTS {function} ON {q(table)}",
+        f"DROP FUNCTION IF EXISTS {function}()",
+        f"DROP INDEX IF EXISTS {index}",
+    ]
+    return install, uninstall
+
+
+def uses_search_vectors(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def touch_search_vectors(queryset):
+    """Re-fire the trigger for rows whose related text (category, ...) changed"""
+    if uses_search_vectors(queryset):
+        queryset.update(**{VECTOR_FIELD: None})
+
+
+def _fallback_match(document, term):
+    """Q matching `term` in any document field, and the rank it contributes"""
+    model = document.model
+    matches, rank = [], []
+    for weight, lookups in document.weights.items():
+        for lookup in lookups:
+            if "__" in lookup:
+                # Related text through a subquery, so m2m joins add no duplicates
+                match = Q(
+                    pk__in=model.objects.filter(
+                        **{f"{lookup}__icontains": term}
+                    ).values("pk")
+                )
+            else:
+                match = Q(**{f"{lookup}__icontains": term})
+            matches.append(match)
+            rank.append(
+                Case(
+                    When(match, then=Value(WEIGHTS[weight])),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            )
+    return reduce(or_, matches), reduce(add, rank)
+
+
+def _terms(query):
+    """(text, excluded) for each word and "quoted phrase" of a query"""
+    terms = []
+    for minus, phrase, word in TERM.findall(query):
+        if phrase:
+            text = " ".join(phrase.split())
+        else:
+            text = word.strip('"')
+            if minus and not text:  # a lone "-" is a word, not an exclusion
+                text, minus = minus, ""
+        if text:
+            terms.append((text, bool(minus)))
+    return terms
+
+
+def search(queryset, document, query, limit=20):
+    """
+    Rows of `queryset` matching `query` (web-search syntax on PostgreSQL:
+    words, "phrases", -exclusions), best first, each annotated with `rank`.
+    """
+    query = (query or "").strip()
+    if not query:
+        return queryset.none()
+
+    if uses_search_vectors(queryset):
+        search_query = SearchQuery(
+            query, search_type="websearch", config=settings.SEARCH_CONFIG
+        )
+        return (
+            queryset.filter(**{VECTOR_FIELD: search_query})
+            .annotate(rank=SearchRank(F(VECTOR_FIELD), search_query))
+            .order_by("-rank", "pk")[:limit]
+        )
+
+    filters, ranks = [], []
+    for term, excluded in _terms(query):
+        match, rank = _fallback_match(document, term)
+        if excluded:
+            filters.append(~match)
+            continue
+        filters.append(match)
+        ranks.append(rank)
+    if not ranks:
+        return queryset.none()
+    return (
+        queryset.filter(reduce(and_, filters))
+        .annotate(rank=reduce(add, ranks))
+        .order_by("-rank", "pk")[:limit]
+    )
@@ -0,0 +1,444 @@
+"""
+Tag-based cache invalidation shared by every app.
+
+A cached value declares the tags it depends on: tag(Model, pk) for one row,
+tag(Model) for "any row of this model was added, edited or removed". Each tag
+has a version token in the shared cache; a value is stored with the versions
+of its tags at the time it was computed and is only served while they are
+all current, so values can be cached for TAGGED_CACHE_TTL (hours) instead of
+the blanket default timeout.
+
+Model signals (post_save, pre_delete, m2m_changed) for every model named in
+DEPENDENCIES bump the tags of the changed rows, and of the rows that depend
+on them:
+
+- "includes": the target shows the source's fields (a service shows its
+  provider's name), so editing a provider bumps its services. One level.
+- "aggregates": the target summarises the source (ratings from reviews,
+  availability from inventory, provider and destination pages from their
+  services), so the bump travels on up: a review bumps its service, which
+  bumps the service's provider, destination and packages.
+
+Tags are bumped when the transaction commits. cached() also keeps values in
+a per-process cache for TAGGED_CACHE_LOCAL_TTL seconds; invalidations are
+published on the CACHE_INVALIDATION_BUS so every process drops its local
+copies at once: LocalInvalidationBus in-process (development, tests),
+RedisInvalidationBus over Redis pub/sub between pods.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.utils.module_loading import import_string
+
+TAG_KEY = "tag:{tag}"
+VALUE_KEY = "tagged:{key}"
+MISSING = object()
+
+# model -> fields whose saves don't change anything cached (login timestamps)
+QUIET_FIELDS = {
+    "accounts.User": {"last_login"},
+}
+
+# target model -> {"includes"|"aggregates": {source model: lookup to it}}
+DEPENDENCIES = {
+    "services.TourService": {
+        "includes": {
+            "services.ServiceProvider": "provider",
+            "destinations.Category": "category",
+            "destinations.Destination": "destination",
+            "destinations.Amenity": "amenities",
+        },
+        "aggregates": {
+            "bookings.Review": "reviews",
+            "bookings.Booking": "bookings",
+            "services.Inventory": "inventory",
+            "services.AvailabilitySchedule": "availabilities",
+            "analytics.Promotion": "promotions",
+        },
+    },
+    "services.ServiceProvider": {
+        "includes": {
+            "accounts.User": "user",
+            "destinations.Destination": "destination",
+        },
+        "aggregates": {
+            "services.TourService": "services",
+            "services.Subscription": "subscriptions",
+        },
+    },
+    "destinations.Destination": {
+        "aggregates": {
+            "services.TourService": "services",
+            "bookings.Package": "packages",
+            "analytics.AnalyticsData": "analytics",
+        },
+    },
+    "bookings.Package": {
+        "includes": {"destinations.Destination": "destination"},
+        "aggregates": {
+            "bookings.PackageService": "packageservice",
+            "services.TourService": "services",
+            "analytics.Promotion": "promotions",
+        },
+    },
+    "bookings.Booking": {
+        "aggregates": {
+            "bookings.Payment": "payment",
+            "bookings.Review": "review",
+        },
+    },
+}
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label
+
+
+def tag(model, pk=None):
+    """ "services.TourService:12" for one row, "services.TourService" for any"""
+    label = _label(model)
+    return label if pk is None else f"{label}:{pk}"
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def _tag_timeout():
+    """
+    Tag versions outlive the values stored against them: a value is never
+    served past its version, and an expired version restarts as a new one
+    that matches nothing stored before.
+    """
+    return 2 * settings.TAGGED_CACHE_TTL
+
+
+def tag_versions(tags, extra_keys=()):
+    """
+    {tag: current version}, starting a version for tags that have none, and
+    the values of any `extra_keys` read in the same round trip
+    """
+    keys = {TAG_KEY.format(tag=name): name for name in tags}
+    found = cache.get_many([*keys, *extra_keys])
+    versions = {keys[key]: found[key] for key in keys if key in found}
+    for key, name in keys.items():
+        if name not in versions:
+            version = _new_version()
+            if not cache.add(key, version, _tag_timeout()):
+                # Another process started the tag first: use its version
+                version = cache.get(key, version)
+            versions[name] = version
+    return versions, {key: found[key] for key in extra_keys if key in found}
+
+
+# Per-process copies
+
+
+class LocalTaggedCache:
+    """Bounded LRU of recently used values, indexed by tag"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = OrderedDict()  # key -> (expires, tags, value)
+        self._keys = {}  # tag -> keys
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._values.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, tags):
+        expires = time.monotonic() + settings.TAGGED_CACHE_LOCAL_TTL
+        with self._lock:
+            self._remove(key)
+            self._values[key] = (expires, tags, value)
+            for name in tags:
+                self._keys.setdefault(name, set()).add(key)
+            while len(self._values) > settings.TAGGED_CACHE_LOCAL_MAX_ENTRIES:
+                self._remove(next(iter(self._values)))
+
+    def _remove(self, key):
+        entry = self._values.pop(key, None)
+        if entry is not None:
+            for name in entry[1]:
+                keys = self._keys.get(name)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._keys[name]
+
+    def drop_tags(self, tags=None):
+        """Forget values depending on `tags` (everything with None)"""
+        with self._lock:
+            if tags is None:
+                self._values.clear()
+                self._keys.clear()
+                return
+            for name in tags:
+                for key in list(self._keys.get(name, ())):
+                    self._remove(key)
+
+
+_local = LocalTaggedCache()
+
+
+# Invalidation buses
+
+
+class LocalInvalidationBus:
+    """Delivers invalidations to subscribers in this process only"""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, tags):
+        for callback in self._subscribers:
+            callback(tags)
+
+
+class RedisInvalidationBus:
+    """
+    Redis pub/sub between pods. A background thread per process listens on
+    CHANNEL; after a dropped connection it tells subscribers to forget
+    everything, since messages sent meanwhile are lost.
+    """
+
+    CHANNEL = "cache-invalidation"
+    RECONNECT_SECONDS = 1
+
+    def __init__(self, url=None):
+        import redis
+
+        self._redis = redis.Redis.from_url(url or settings.CACHE_INVALIDATION_REDIS_URL)
+        self._connection_error = redis.ConnectionError
+        self._subscribers = []
+        self._thread = None
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, daemon=True)
+            self._thread.start()
+
+    def publish(self, tags):
+        self._redis.publish(self.CHANNEL, json.dumps(sorted(tags)))
+
+    def _deliver(self, tags):
+        for callback in self._subscribers:
+            callback(tags)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    self._deliver(json.loads(message["data"]))
+            except self._connection_error:
+                self._deliver(None)
+                time.sleep(self.RECONNECT_SECONDS)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                bus = import_string(settings.CACHE_INVALIDATION_BUS)()
+                bus.subscribe(_local.drop_tags)
+                _bus = bus
+    return _bus
+
+
+# Reading and invalidating
+
+
+def cached(key, compute, tags, timeout=None):
+    """
+    The value cached under `key`, or compute() stored with the current
+    versions of `tags`. Served from this process's copy while it is fresh.
+    """
+    value = _local.get(key)
+    if value is not MISSING:
+        return value
+
+    tags = sorted(set(tags))
+    value_key = VALUE_KEY.format(key=key)
+    versions, found = tag_versions(tags, [value_key])
+    stored = found.get(value_key)
+    if stored is not None and stored[0] == versions:
+        value = stored[1]
+    else:
+        value = compute()
+        cache.set(value_key, (versions, value), timeout or settings.TAGGED_CACHE_TTL)
+    get_bus()
+    _local.set(key, value, tags)
+    return value
+
+
+def invalidate_tags(tags):
+    """Give the tags new versions, everywhere, once the transaction commits"""
+    tags = set(tags)
+    if not tags:
+        return
+
+    def bump():
+        cache.set_many(
+            {TAG_KEY.format(tag=name): _new_version() for name in tags},
+            _tag_timeout(),
+        )
+        _local.drop_tags(tags)
+        get_bus().publish(tags)
+
+    transaction.on_commit(bump)
+
+
+# Dependencies between models
+
+
+def _related(target, source, lookup, pks, instances=()):
+    """Primary keys of `target` rows related to the `source` rows `pks`, and
+    the target objects themselves when the source instances have them loaded"""
+    relation = apps.get_model(target)._meta.get_field(lookup)
+    foreign_key = getattr(relation, "field", None)
+    if (
+        instances
+        and relation.auto_created
+        and not relation.many_to_many
+        and foreign_key.model._meta.label == source
+    ):
+        # The changed rows carry the key themselves: no query needed
+        related = {getattr(obj, foreign_key.attname) for obj in instances} - {None}
+        loaded = {
+            obj.pk: obj
+            for obj in (
+                foreign_key.get_cached_value(instance)
+                for instance in instances
+                if foreign_key.is_cached(instance)
+            )
+            if obj is not None
+        }
+        # Pass the objects on only if every one of them is loaded
+        return related, list(loaded.values()) if set(loaded) == related else []
+    related = set(
+        apps.get_model(target)
+        ._default_manager.filter(**{f"{lookup}__in": pks})
+        .values_list("pk", flat=True)
+        .order_by()
+        .distinct()
+    )
+    return related, []
+
+
+def affected_tags(model, pks, instances=()):
+    """Tags to bump when the given rows of `model` change"""
+    label = _label(model)
+    pks = set(pks)
+    tags = {tag(label)} | {tag(label, pk) for pk in pks}
+
+    for target, rules in DEPENDENCIES.items():
+        lookup = rules.get("includes", {}).get(label)
+        if lookup:
+            related, _ = _related(target, label, lookup, pks, instances)
+            tags |= {tag(target, pk) for pk in related}
+
+    seen = {(label, pk) for pk in pks}
+    frontier = [(label, pks, instances)]
+    while frontier:
+        source, source_pks, source_instances = frontier.pop()
+        for target, rules in DEPENDENCIES.items():
+            lookup = rules.get("aggregates", {}).get(source)
+            if not lookup:
+                continue
+            related, loaded = _related(
+                target, source, lookup, source_pks, source_instances
+            )
+            related = {pk for pk in related if (target, pk) not in seen}
+            if related:
+                seen.update((target, pk) for pk in related)
+                # Only the summarising rows change, not "any row of the model"
+                tags |= {tag(target, pk) for pk in related}
+                loaded = [obj for obj in loaded if obj.pk in related]
+                frontier.append((target, related, loaded))
+    return tags
+
+
+def _saved(sender, instance, update_fields=None, **kwargs):
+    quiet = QUIET_FIELDS.get(sender._meta.label)
+    if update_fields and quiet and set(update_fields) <= quiet:
+        return
+    invalidate_tags(affected_tags(sender, [instance.pk], [instance]))
+
+
+def _before_delete(sender, instance, **kwargs):
+    # Dependents are found now, while the rows still point at the instance
+    invalidate_tags(affected_tags(sender, [instance.pk], [instance]))
+
+
+def _m2m_changed(owner, sender, instance, action, reverse, pk_set, **kwargs):
+    """`owner` declares the many-to-many field whose links changed"""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        pks = [instance.pk]
+    elif action == "pre_clear":
+        # related.things.clear(): the objects linked to it are about to unlink
+        field = next(
+            f for f in owner._meta.many_to_many if f.remote_field.through is sender
+        )
+        pks = owner._default_manager.filter(**{field.name: instance.pk}).values_list(
+            "pk", flat=True
+        )
+    else:
+        pks = pk_set
+    invalidate_tags(affected_tags(owner, pks))
+
+
+def connect_signals():
+    labels = set(DEPENDENCIES)
+    for rules in DEPENDENCIES.values():
+        for sources in rules.values():
+            labels.update(sources)
+    for label in sorted(labels):
+        model = apps.get_model(label)
+        post_save.connect(_saved, sender=model, dispatch_uid=f"tags-save-{label}")
+        pre_delete.connect(
+            _before_delete, sender=model, dispatch_uid=f"tags-delete-{label}"
+        )
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(
+                _M2MReceiver(model),
+                sender=field.remote_field.through,
+                weak=False,
+                dispatch_uid=f"tags-m2m-{label}-{field.name}",
+            )
+
+
+class _M2MReceiver:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def __call__(self, **kwargs):
+        _m2m_changed(self.owner, **kwargs)
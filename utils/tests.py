@@ -0,0 +1,442 @@
+import re
+from copy import deepcopy
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
+
+from django.contrib.admin import site
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse_lazy
+from django.utils import timezone
+
+from accounts.models import User
+from bookings.models import Booking
+from bookings.search import PACKAGE_DOCUMENT
+from destinations.models import Destination
+from destinations.search import DESTINATION_DOCUMENT
+from services.models import TourService
+from services.search import SERVICE_DOCUMENT, search_services
+from services.tests import DAY, make_booking, make_service
+
+from . import db
+from .counters import add_to_counter
+from .db import PIN_COOKIE, PrimaryPinMiddleware, read_only, routing_scope
+from .geo import (
+    CELL_BITS,
+    GeoIndex,
+    bounding_boxes,
+    cover_ranges,
+    encode_geocell,
+    nearest,
+    within_radius,
+)
+from .pool import _pool_registry
+from .search import search, search_vector_sql
+from .tags import TAG_KEY, affected_tags, invalidate_tags, tag, tag_versions
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "utils-tests",
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.service = make_service()
+
+    def test_search_results_come_from_the_catalog_cache(self):
+        [found] = search_services("game")
+        self.assertEqual(found, self.service)
+        self.assertGreater(found.rank, 0)
+
+        # Warm: only the ranked primary keys are queried
+        with self.assertNumQueries(1):
+            [found] = search_services("game")
+            self.assertEqual(found.provider.company_name, "Safari Co")
+            self.assertEqual(found.destination.name, "Nairobi")
+
+    def test_changes_refresh_cached_results(self):
+        search_services("game")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.name = "Game drive at dawn"
+            self.service.save()
+            self.service.provider.company_name = "Dawn Safaris"
+            self.service.provider.save()
+
+        [found] = search_services("game")
+        self.assertEqual(found.name, "Game drive at dawn")
+        self.assertEqual(found.provider.company_name, "Dawn Safaris")
+
+    def test_tag_started_elsewhere_keeps_its_version(self):
+        cache = caches["default"]
+        cache.set(TAG_KEY.format(tag="services.TourService"), "theirs", None)
+        # The version was missing when read, then another process added it
+        with mock.patch.object(cache, "get_many", return_value={}):
+            versions, _ = tag_versions(["services.TourService"])
+        self.assertEqual(versions, {"services.TourService": "theirs"})
+
+    @override_settings(TAGGED_CACHE_TTL=60)
+    def test_tag_versions_expire_after_the_values(self):
+        with mock.patch.object(caches["default"], "add") as add:
+            tag_versions(["services.TourService"])
+        self.assertEqual(add.call_args.args[2], 120)
+        with mock.patch.object(caches["default"], "set_many") as set_many:
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_tags(["services.TourService"])
+        self.assertEqual(set_many.call_args.args[1], 120)
+
+    def test_aggregated_changes_bump_only_the_rows_they_reach(self):
+        booking = make_booking(self.service)
+        service = self.service
+        # The loaded service carries its provider and destination keys
+        with self.assertNumQueries(1):  # the packages offering the service
+            tags = affected_tags(booking._meta.model, [booking.pk], [booking])
+        self.assertLessEqual(
+            {
+                tag(service, service.pk),
+                tag(service.provider, service.provider_id),
+                tag(service.destination, service.destination_id),
+            },
+            tags,
+        )
+        self.assertFalse(
+            {tag(service), tag(service.provider), tag(service.destination)} & tags
+        )
+
+    def test_creating_a_booking_stays_cheap(self):
+        tourist = User.objects.create(username="visitor", user_type="tourist")
+        with self.captureOnCommitCallbacks(execute=True):
+            # insert, both stats rows, the report days and the package tags
+            with self.assertNumQueries(5):
+                Booking.objects.create(
+                    tourist=tourist,
+                    service=self.service,
+                    service_date=DAY,
+                    service_time="09:00",
+                    total_amount=100,
+                    final_amount=100,
+                )
+
+    def test_logins_leave_the_cache_alone(self):
+        user = self.service.provider.user
+        with mock.patch("utils.tags.invalidate_tags") as invalidate:
+            user.last_login = timezone.now()
+            user.save(update_fields=["last_login"])
+            invalidate.assert_not_called()
+            user.save()
+            invalidate.assert_called_once()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.game_drive = make_service()
+        self.reserve = TourService.objects.create(
+            provider=self.game_drive.provider,
+            destination=self.game_drive.destination,
+            name="Drive to the game reserve",
+            description="Transfer",
+            service_type="tour",
+            base_price=80,
+            duration_hours=2,
+            max_capacity=10,
+        )
+
+    def names(self, query):
+        found = search(TourService.objects.all(), SERVICE_DOCUMENT, query)
+        return [service.name for service in found]
+
+    def test_words_match_anywhere(self):
+        self.assertEqual(
+            self.names("drive game"), ["Game drive", "Drive to the game reserve"]
+        )
+
+    def test_phrases_match_as_written(self):
+        self.assertEqual(self.names('"game  drive"'), ["Game drive"])
+        self.assertEqual(self.names('"drive game"'), [])
+
+    def test_excluded_phrases_drop_their_rows(self):
+        self.assertEqual(
+            self.names('drive -"game drive"'), ["Drive to the game reserve"]
+        )
+        self.assertEqual(self.names("-drive"), [])
+
+    def test_migrations_match_the_generated_sql(self):
+        def normalised(statements):
+            return [
+                re.sub(r"\s*([()])\s*", r"\1", " ".join(sql.split()))
+                for sql in statements
+            ]
+
+        for migration, document in [
+            ("services.migrations.0006_search_vector", SERVICE_DOCUMENT),
+            ("destinations.migrations.0002_search_vector", DESTINATION_DOCUMENT),
+            ("bookings.migrations.0005_search_vector", PACKAGE_DOCUMENT),
+        ]:
+            frozen = import_module(migration)
+            install, uninstall = search_vector_sql(document)
+            with self.subTest(migration):
+                self.assertEqual(normalised(frozen.INSTALL), normalised(install))
+                self.assertEqual(normalised(frozen.UNINSTALL), normalised(uninstall))
+
+
+class GeocellTests(SimpleTestCase):
+    def test_longitude_takes_the_odd_bits_and_latitude_the_even(self):
+        step_x, step_y = 360 / 2**CELL_BITS, 180 / 2**CELL_BITS
+        self.assertEqual(encode_geocell(-90, -180), 0)
+        self.assertEqual(encode_geocell(-90, -180 + 1.5 * step_x), 0b10)
+        self.assertEqual(encode_geocell(-90 + 1.5 * step_y, -180), 0b01)
+        # x = 0b11, y = 0b01
+        self.assertEqual(
+            encode_geocell(-90 + 1.5 * step_y, -180 + 3.5 * step_x), 0b1011
+        )
+        self.assertEqual(encode_geocell(90, 180), (1 << 2 * CELL_BITS) - 1)
+        self.assertIsNone(encode_geocell(None, 36.8))
+
+    def test_cover_ranges_hold_every_point_of_the_boxes(self):
+        for latitude, longitude, radius in (
+            (-1.2921, 36.8219, 50),
+            (-18.1416, 179.9, 300),  # across the antimeridian
+            (89.5, 10.0, 200),  # around the pole
+        ):
+            boxes = bounding_boxes(latitude, longitude, radius)
+            ranges = cover_ranges(boxes)
+            self.assertEqual(ranges, sorted(ranges))
+            for (_, high), (low, _) in zip(ranges, ranges[1:]):
+                self.assertGreater(low, high + 1)  # merged
+            for lat_min, lat_max, lon_min, lon_max in boxes:
+                for lat in (lat_min, (lat_min + lat_max) / 2, lat_max):
+                    for lon in (lon_min, (lon_min + lon_max) / 2, lon_max):
+                        cell = encode_geocell(lat, lon)
+                        self.assertTrue(
+                            any(low <= cell <= high for low, high in ranges),
+                            (latitude, longitude, lat, lon),
+                        )
+
+    def test_boxes_split_at_the_antimeridian_and_widen_at_the_poles(self):
+        self.assertEqual(len(bounding_boxes(-18.1, 179.9, 100)), 2)
+        [(lat_min, lat_max, lon_min, lon_max)] = bounding_boxes(89.9, 0, 50)
+        self.assertEqual((lat_max, lon_min, lon_max), (90.0, -180.0, 180.0))
+
+
+class GeoSearchTests(TestCase):
+    places = {
+        "Nairobi": (-1.2921, 36.8219),
+        "Mombasa": (-4.0435, 39.6682),
+        "Suva": (-18.1416, 178.4419),
+        "Apia": (-13.8333, -171.7667),
+        "Alert": (82.5018, -62.3481),
+        "Pole camp": (89.9, 120.0),
+        "Pole station": (89.9, -60.0),
+    }
+
+    def setUp(self):
+        dmo = User.objects.create(username="dmo", user_type="dmo")
+        for name, (latitude, longitude) in self.places.items():
+            Destination.objects.create(
+                name=name,
+                description="d",
+                country="x",
+                city=name,
+                latitude=latitude,
+                longitude=longitude,
+                featured_image="x.jpg",
+                created_by=dmo,
+            )
+        self.index = GeoIndex("latitude", "longitude")
+
+    def near(self, name, radius_km):
+        found = within_radius(
+            Destination.objects.all(), self.index, *self.places[name], radius_km
+        )
+        return [destination.name for destination in found]
+
+    def test_within_radius_orders_by_distance(self):
+        self.assertEqual(self.near("Nairobi", 100), ["Nairobi"])
+        self.assertEqual(self.near("Nairobi", 500), ["Nairobi", "Mombasa"])
+
+    def test_within_radius_reaches_across_the_antimeridian(self):
+        self.assertEqual(self.near("Suva", 1000), ["Suva"])
+        self.assertEqual(self.near("Suva", 1200), ["Suva", "Apia"])
+        self.assertEqual(self.near("Apia", 1200), ["Apia", "Suva"])
+
+    def test_within_radius_reaches_over_the_pole(self):
+        # 0.2 degrees of latitude apart through the pole, on opposite sides
+        self.assertEqual(self.near("Pole camp", 30), ["Pole camp", "Pole station"])
+        self.assertEqual(self.near("Pole camp", 10), ["Pole camp"])
+
+    def test_nearest_widens_until_it_has_k_rows(self):
+        found = nearest(
+            Destination.objects.all(), self.index, *self.places["Alert"], k=3
+        )
+        self.assertEqual(
+            [destination.name for destination in found],
+            ["Alert", "Pole station", "Pole camp"],
+        )
+        self.assertLess(found[1].distance_km, found[2].distance_km)
+
+
+class ChangelistTests(TestCase):
+    url = reverse_lazy("admin:bookings_booking_changelist")
+
+    def setUp(self):
+        admin = User.objects.create(username="root", is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        self.booking_admin = site._registry[Booking]
+        service = make_service()
+        bookings = [make_booking(service) for _ in range(5)]
+        # Two share a booking date, so the pk has to break the tie
+        start = timezone.now() - timedelta(days=10)
+        for offset, booking in zip([0, 1, 1, 2, 3], bookings):
+            Booking.objects.filter(pk=booking.pk).update(
+                booking_date=start + timedelta(days=offset)
+            )
+        self.expected = list(
+            Booking.objects.order_by("-booking_date", "-pk").values_list(
+                "confirmation_code", flat=True
+            )
+        )
+
+    def changelist(self, query=""):
+        response = self.client.get(f"{self.url}{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.context["cl"]
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        with mock.patch.object(self.booking_admin, "list_per_page", 2):
+            cl = self.changelist()
+            self.assertEqual(
+                [field.name for field, _ in cl.keyset_fields], ["booking_date", "id"]
+            )
+            seen, pages = [], 0
+            while True:
+                seen += [booking.confirmation_code for booking in cl.result_list]
+                pages += 1
+                if not cl.next_page_url:
+                    break
+                cl = self.changelist(cl.next_page_url)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_malformed_cursor_is_refused(self):
+        response = self.client.get(f"{self.url}?cursor=bm90LWpzb24")
+        self.assertRedirects(response, f"{self.url}?e=1", fetch_redirect_response=False)
+
+    def test_nullable_ordering_falls_back_to_pages(self):
+        with mock.patch.object(self.booking_admin, "ordering", ["-cancelled_at"]):
+            with mock.patch.object(self.booking_admin, "list_per_page", 2):
+                cl = self.changelist()
+                self.assertIsNone(cl.keyset_fields)
+                self.assertIsNone(cl.next_page_url)
+                self.assertTrue(cl.multi_page)
+                self.assertEqual(len(self.changelist("?p=3").result_list), 1)
+
+    def test_counts_are_estimated_above_the_threshold(self):
+        with mock.patch("utils.admin.estimated_count", return_value=250_000):
+            cl = self.changelist()
+        self.assertTrue(cl.count_is_estimate)
+        self.assertEqual(cl.result_count, 250_000)
+
+        with mock.patch("utils.admin.estimated_count", return_value=50):
+            cl = self.changelist()
+        self.assertFalse(cl.count_is_estimate)
+        self.assertEqual(cl.result_count, 5)
+
+    def test_relations_are_joined_and_large_columns_deferred(self):
+        cl = self.changelist()
+        self.assertEqual(
+            set(cl.list_select_related), {"tourist", "service", "service__provider"}
+        )
+        self.assertLessEqual(
+            {"guest_names", "special_requests"},
+            cl.result_list[0].get_deferred_fields(),
+        )
+        with self.assertNumQueries(0):
+            [str(booking.service.provider) for booking in cl.result_list]
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        db._checked.clear()
+        self.addCleanup(db._checked.clear)
+
+    def test_read_only_reads_the_replica(self):
+        User.objects.create(username="guide")
+        with routing_scope(), read_only():
+            users = User.objects.all()
+            self.assertEqual(users.db, "replica")
+            self.assertEqual([user.username for user in users], ["guide"])
+        with routing_scope():
+            self.assertEqual(User.objects.all().db, "default")
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        with routing_scope(), read_only():
+            User.objects.create(username="guide")
+            self.assertEqual(User.objects.all().db, "default")
+
+        def write(request):
+            User.objects.create(username="driver")
+            return HttpResponse()
+
+        def read(request):
+            with read_only():
+                return HttpResponse(User.objects.all().db)
+
+        factory = RequestFactory()
+        response = PrimaryPinMiddleware(write)(factory.post("/"))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = factory.get("/")
+        self.assertEqual(PrimaryPinMiddleware(read)(request).content, b"replica")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.assertEqual(PrimaryPinMiddleware(read)(request).content, b"default")
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(db, "replica_lag", return_value=60.0):
+            with routing_scope(), read_only():
+                self.assertEqual(User.objects.all().db, "default")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CounterTests(SimpleTestCase):
+    def test_counters_start_and_add_up(self):
+        cache = caches["default"]
+        cache.clear()
+        add_to_counter("counter", 2)
+        add_to_counter("counter", 3)
+        self.assertEqual(cache.get("counter"), 5)
+
+
+@skipUnless(connection.vendor == "postgresql", "pools need PostgreSQL")
+class PoolTests(TestCase):
+    def test_pool_serves_queries_and_counts_them(self):
+        alias = "pool-test"
+        database = deepcopy(connection.settings_dict)
+        database.setdefault("OPTIONS", {})["pool"] = {"min_size": 1, "max_size": 2}
+        database["CONN_MAX_AGE"] = 0
+        pooled = type(connection)(database, alias)
+        self.addCleanup(pooled.close_pool)
+
+        with pooled.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone(), (1,))
+        pooled.close()
+
+        pool = _pool_registry(pooled)[alias]
+        self.assertIs(pool, pooled.pool)
+        self.assertGreaterEqual(pool.get_stats()["requests_num"], 1)